@@ -8,6 +8,10 @@
 
 #include <generated/csr.h>
 #include "sdram_bist.h"
+#include "sdram_pattern.h"
+#include "sdram_traffic.h"
+#include "membench.h"
+#include "netboot.h"
 
 static char *readstr(void)
 {
@@ -73,9 +77,23 @@ static void help(void)
 	puts("Available commands:");
 	puts("help                            - this command");
 	puts("reboot                          - reboot CPU");
+#ifdef CSR_TIMER0_BASE
+	puts("membench [min] [max] [stride]   - CPU main RAM bandwidth per working set size");
+#endif
 	puts("");
 #ifdef CSR_SDRAM_GENERATOR_BASE
 	puts("sdram_bist burst_length [random]- stress & test SDRAM from HW");
+	puts("sdram_bist_stream burst_length [random] [period] - same, binary records");
+#endif
+#ifdef CSR_SDRAM_PATTERN_BASE
+	puts("sdram_pattern test [offset] [length] - march_cm, walking_ones/zeros, address, checkerboard");
+#endif
+#ifdef CSR_SDRAM_TRAFFIC_BASE
+	puts("sdram_traffic [mode] [offset] [length] [load] - crossbar scaling (mode 1: wr, 2: rd, 3: both)");
+	puts("                                  load 1: CPU copies, 2: UDP frames through the MAC, 3: both");
+#endif
+#ifdef CSR_ETHMAC_BASE
+	puts("image                           - show netboot image length/crc32");
 #endif
 }
 
@@ -96,6 +114,17 @@ static void console_service(void)
 		help();
 	else if(strcmp(token, "reboot") == 0)
 		reboot();
+#ifdef CSR_TIMER0_BASE
+	else if(strcmp(token, "membench") == 0) {
+		unsigned int min_size;
+		unsigned int max_size;
+		unsigned int stride;
+		min_size = strtoul(get_token(&str), NULL, 0);
+		max_size = strtoul(get_token(&str), NULL, 0);
+		stride = strtoul(get_token(&str), NULL, 0);
+		membench(min_size, max_size, stride);
+	}
+#endif
 #ifdef CSR_SDRAM_GENERATOR_BASE
 	else if(strcmp(token, "sdram_bist") == 0) {
 		unsigned int burst_length;
@@ -107,12 +136,57 @@ static void console_service(void)
 		printf("Executing SDRAM BIST with burst_length=%d and random=%d\n", burst_length, random);
 		sdram_bist(burst_length, random);
 	}
+	else if(strcmp(token, "sdram_bist_stream") == 0) {
+		unsigned int burst_length;
+		unsigned int random;
+		unsigned int period;
+		burst_length = atoi(get_token(&str));
+		random = atoi(get_token(&str));
+		period = atoi(get_token(&str));
+		if (burst_length == 0)
+			burst_length = 128;
+		if (period == 0)
+			period = 10;
+		sdram_bist_stream(burst_length, random, period);
+	}
+#endif
+#ifdef CSR_SDRAM_PATTERN_BASE
+	else if(strcmp(token, "sdram_pattern") == 0) {
+		char *test;
+		unsigned int offset;
+		unsigned int length;
+		test = get_token(&str);
+		offset = strtoul(get_token(&str), NULL, 0);
+		length = strtoul(get_token(&str), NULL, 0);
+		sdram_pattern(test, offset, length);
+	}
+#endif
+#ifdef CSR_SDRAM_TRAFFIC_BASE
+	else if(strcmp(token, "sdram_traffic") == 0) {
+		unsigned int mode;
+		unsigned int offset;
+		unsigned int length;
+		unsigned int load;
+		mode = atoi(get_token(&str));
+		offset = strtoul(get_token(&str), NULL, 0);
+		length = strtoul(get_token(&str), NULL, 0);
+		load = atoi(get_token(&str));
+		sdram_traffic(mode, offset, length, load);
+	}
+#endif
+#ifdef CSR_ETHMAC_BASE
+	else if(strcmp(token, "image") == 0)
+		netboot_info();
 #endif
 	prompt();
 }
 
 int main(void)
 {
+#ifdef CSR_ETHMAC_BASE
+	/* before anything is written to .data */
+	netboot_init();
+#endif
 	irq_setmask(0);
 	irq_setie(1);
 	uart_init();
@@ -122,6 +196,9 @@ int main(void)
 
 	while(1) {
 		console_service();
+#ifdef CSR_ETHMAC_BASE
+		netboot_service();
+#endif
 	}
 
 	return 0;
@@ -0,0 +1,186 @@
+#include <generated/csr.h>
+#ifdef CSR_TIMER0_BASE
+#include "membench.h"
+
+#include <stdio.h>
+#include <system.h>
+#include <generated/mem.h>
+
+/*
+ * CPU view of main RAM: read, write and copy loops over working sets from min_size to max_size,
+ * each repeated until MEMBENCH_BYTES are accessed, timed with timer0. The working set starts
+ * cold (L1 and L2 flushed), sizes that fit in the caches are then served from them.
+ */
+
+#define MEMBENCH_BASE  (MAIN_RAM_BASE + 0x00800000)
+#define MEMBENCH_BYTES (4*1024*1024)
+/* copy: source and destination of size bytes each from MEMBENCH_BASE */
+#define MEMBENCH_MAX_SIZE ((MAIN_RAM_SIZE - 0x00800000)/2)
+
+/* read results, keeps the read loops */
+volatile unsigned int membench_sink;
+
+static void timer_start(void)
+{
+	timer0_en_write(0);
+	timer0_reload_write(0);
+	timer0_load_write(0xffffffff);
+	timer0_en_write(1);
+}
+
+static unsigned int timer_ticks(void)
+{
+	timer0_update_value_write(1);
+	return 0xffffffff - timer0_value_read();
+}
+
+static void flush_caches(void)
+{
+	flush_cpu_dcache();
+#ifdef L2_SIZE
+	flush_l2_cache();
+#endif
+}
+
+/* sequential loops unrolled by 4 (size: multiple of 16 bytes) */
+
+static unsigned int read_seq(volatile unsigned int *p, unsigned int words)
+{
+	unsigned int i;
+	unsigned int sum;
+
+	sum = 0;
+	for(i=0; i<words; i+=4)
+		sum += p[i] + p[i+1] + p[i+2] + p[i+3];
+	return sum;
+}
+
+static void write_seq(volatile unsigned int *p, unsigned int words)
+{
+	unsigned int i;
+
+	for(i=0; i<words; i+=4) {
+		p[i]   = i;
+		p[i+1] = i;
+		p[i+2] = i;
+		p[i+3] = i;
+	}
+}
+
+static void copy_seq(volatile unsigned int *dst, volatile unsigned int *src, unsigned int words)
+{
+	unsigned int i;
+
+	for(i=0; i<words; i+=4) {
+		dst[i]   = src[i];
+		dst[i+1] = src[i+1];
+		dst[i+2] = src[i+2];
+		dst[i+3] = src[i+3];
+	}
+}
+
+/* strided: one word every stride bytes, all of them visited (stride/4 passes over the set) */
+
+static unsigned int read_strided(volatile unsigned int *p, unsigned int words, unsigned int step)
+{
+	unsigned int i, j;
+	unsigned int sum;
+
+	sum = 0;
+	for(j=0; j<step; j++)
+		for(i=j; i<words; i+=step)
+			sum += p[i];
+	return sum;
+}
+
+static void write_strided(volatile unsigned int *p, unsigned int words, unsigned int step)
+{
+	unsigned int i, j;
+
+	for(j=0; j<step; j++)
+		for(i=j; i<words; i+=step)
+			p[i] = i;
+}
+
+enum {
+	TEST_READ,
+	TEST_WRITE,
+	TEST_COPY,
+	TEST_READ_STRIDED,
+	TEST_WRITE_STRIDED,
+	TEST_COUNT
+};
+
+static unsigned int run(int test, unsigned int size, unsigned int stride)
+{
+	volatile unsigned int *buf = (volatile unsigned int *)MEMBENCH_BASE;
+	unsigned int words;
+	unsigned int passes;
+	unsigned int bytes;
+	unsigned int ticks;
+	unsigned int i;
+
+	words = size/4;
+	passes = size < MEMBENCH_BYTES ? MEMBENCH_BYTES/size : 1;
+	flush_caches();
+	timer_start();
+	for(i=0; i<passes; i++) {
+		switch(test) {
+			case TEST_READ:
+				membench_sink = read_seq(buf, words);
+				break;
+			case TEST_WRITE:
+				write_seq(buf, words);
+				break;
+			case TEST_COPY:
+				copy_seq(buf + words, buf, words);
+				break;
+			case TEST_READ_STRIDED:
+				membench_sink = read_strided(buf, words, stride/4);
+				break;
+			case TEST_WRITE_STRIDED:
+				write_strided(buf, words, stride/4);
+				break;
+		}
+	}
+	ticks = timer_ticks();
+	/* copy: bytes read + bytes written */
+	bytes = passes*size*(test == TEST_COPY ? 2 : 1);
+	return ((unsigned long long)bytes*SYSTEM_CLOCK_FREQUENCY)/((unsigned long long)ticks*1000000);
+}
+
+void membench(unsigned int min_size, unsigned int max_size, unsigned int stride)
+{
+	unsigned int size;
+	int test;
+
+	if(min_size < 16)
+		min_size = 1024;
+	if(max_size < min_size)
+		max_size = 4*1024*1024;
+	if(stride < 4)
+		stride = 64;
+	if((min_size & (min_size - 1)) != 0 || (max_size & (max_size - 1)) != 0) {
+		printf("membench: sizes must be powers of two\n");
+		return;
+	}
+	if(max_size > MEMBENCH_MAX_SIZE)
+		max_size = MEMBENCH_MAX_SIZE;
+	if(min_size > max_size) {
+		printf("membench: min size above %d bytes\n", MEMBENCH_MAX_SIZE);
+		return;
+	}
+#ifdef L2_SIZE
+	printf("L2: %d bytes, ", L2_SIZE);
+#endif
+	printf("stride: %d bytes, MB/s:\n", stride);
+	printf("     size       read      write       copy  rd_stride  wr_stride\n");
+	for(size=min_size; size<=max_size; size*=2) {
+		printf("%9d", size);
+		for(test=0; test<TEST_COUNT; test++)
+			printf(" %10d", run(test, size, stride));
+		printf("\n");
+	}
+}
+
+#endif
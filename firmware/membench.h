@@ -0,0 +1,6 @@
+#ifndef __MEMBENCH_H
+#define __MEMBENCH_H
+
+void membench(unsigned int min_size, unsigned int max_size, unsigned int stride);
+
+#endif /* __MEMBENCH_H */
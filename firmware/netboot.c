@@ -0,0 +1,95 @@
+#include <generated/csr.h>
+#ifdef CSR_ETHMAC_BASE
+#include "netboot.h"
+
+#include <stdio.h>
+#include <string.h>
+#include <crc.h>
+#include <net/microudp.h>
+
+/*
+ * Answers the host netboot.py on NETBOOT_PORT:
+ *   "NBTI" -> "NBTI" + image length + image crc32 (big endian)
+ *   "NBTR" -> reboot, the BIOS then fetches boot.bin over TFTP
+ * The image crc is computed at startup over .text/.rodata/.data as loaded, which is firmware.bin.
+ */
+
+#ifndef LOCALIP1
+#define LOCALIP1 192
+#define LOCALIP2 168
+#define LOCALIP3 1
+#define LOCALIP4 50
+#endif
+
+#define NETBOOT_PORT 6069
+
+extern unsigned int _ftext, _edata;
+
+static const unsigned char macadr[6] = {0x10, 0xe2, 0xd5, 0x00, 0x00, 0x00};
+
+static unsigned int image_length;
+static unsigned int image_crc;
+
+static unsigned int pending_ip;
+static unsigned short pending_port;
+static char pending_cmd;
+
+static void rx_callback(unsigned int src_ip, unsigned short src_port,
+	unsigned short dst_port, void *data, unsigned int length)
+{
+	/* replies go out from netboot_service, outside of the rx path */
+	if(dst_port != NETBOOT_PORT) return;
+	if(length < 4) return;
+	if(memcmp(data, "NBT", 3) != 0) return;
+	pending_ip = src_ip;
+	pending_port = src_port;
+	pending_cmd = ((char *)data)[3];
+}
+
+static void put_be32(unsigned char *p, unsigned int v)
+{
+	p[0] = v >> 24;
+	p[1] = v >> 16;
+	p[2] = v >> 8;
+	p[3] = v;
+}
+
+void netboot_init(void)
+{
+	image_length = (unsigned int)&_edata - (unsigned int)&_ftext;
+	image_crc = crc32((unsigned char *)&_ftext, image_length);
+	microudp_start(macadr, IPTOINT(LOCALIP1, LOCALIP2, LOCALIP3, LOCALIP4));
+	microudp_set_callback(rx_callback);
+}
+
+void netboot_service(void)
+{
+	unsigned char *tx;
+	char cmd;
+
+	microudp_service();
+	cmd = pending_cmd;
+	pending_cmd = 0;
+	switch(cmd) {
+		case 'I':
+			if(!microudp_arp_resolve(pending_ip))
+				break;
+			tx = microudp_get_tx_buffer();
+			memcpy(tx, "NBTI", 4);
+			put_be32(tx + 4, image_length);
+			put_be32(tx + 8, image_crc);
+			microudp_send(NETBOOT_PORT, pending_port, 12);
+			break;
+		case 'R':
+			puts("netboot: reboot requested");
+			ctrl_reset_write(1);
+			break;
+	}
+}
+
+void netboot_info(void)
+{
+	printf("image: %d bytes, crc32 0x%08x\n", image_length, image_crc);
+}
+
+#endif
@@ -0,0 +1,8 @@
+#ifndef __NETBOOT_H
+#define __NETBOOT_H
+
+void netboot_init(void);
+void netboot_service(void);
+void netboot_info(void);
+
+#endif /* __NETBOOT_H */
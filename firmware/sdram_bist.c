@@ -1,4 +1,5 @@
 #include <generated/csr.h>
+#include <generated/mem.h>
 #ifdef CSR_SDRAM_GENERATOR_BASE
 #include "sdram_bist.h"
 
@@ -151,6 +152,124 @@ void sdram_bist(unsigned int burst_length, unsigned int random)
 		}
 		i++;
 	}
+#ifdef CSR_SDRAM_ERRORS_BASE
+	/* mismatches captured by the checker snooper (SDRAM_ERRORS_STRIDE words per record) */
+	printf("%u mismatches captured at 0x%08x\n", sdram_errors_count_read(), SDRAM_ERRORS_BASE);
+#endif
+}
+
+/*
+ * Binary telemetry: one fixed-size little-endian record every period loops instead of the text
+ * table (decoded by test/bist_stream.py). A first record with loop = BIST_RECORD_HEADER carries
+ * the system clock frequency, burst length and addressing mode in the ticks/length fields, a last
+ * one with loop = BIST_RECORD_END the loops run, bytes tested and errors of the whole stream.
+ *
+ * The records share the UART with the console. The runtime is polled from main() (console and
+ * netboot services, the UART ISR only moves bytes), so nothing else prints while the stream runs:
+ * the text around the records is a start line before the header and an end line after the last
+ * record, and the key that stops the stream is consumed so the console does not echo it.
+ */
+
+#define BIST_RECORD_SYNC   0x54534942 /* "BIST" */
+#define BIST_RECORD_HEADER 0xffffffff
+#define BIST_RECORD_END    0xfffffffe
+
+struct bist_record {
+	unsigned int sync;
+	unsigned int loop;
+	unsigned long long wr_ticks;
+	unsigned long long rd_ticks;
+	unsigned long long length;
+	unsigned int errors;
+	unsigned int checksum;
+};
+
+static void put_le(unsigned long long v, int n)
+{
+	int i;
+	for(i=0; i<n; i++) {
+		uart_write(v & 0xff);
+		v >>= 8;
+	}
+}
+
+static void emit_record(struct bist_record *r)
+{
+	/* checksum: sum of the 32-bit words before it */
+	r->checksum = r->sync + r->loop +
+		(unsigned int)r->wr_ticks + (unsigned int)(r->wr_ticks >> 32) +
+		(unsigned int)r->rd_ticks + (unsigned int)(r->rd_ticks >> 32) +
+		(unsigned int)r->length + (unsigned int)(r->length >> 32) +
+		r->errors;
+	put_le(r->sync, 4);
+	put_le(r->loop, 4);
+	put_le(r->wr_ticks, 8);
+	put_le(r->rd_ticks, 8);
+	put_le(r->length, 8);
+	put_le(r->errors, 4);
+	put_le(r->checksum, 4);
+}
+
+void sdram_bist_stream(unsigned int burst_length, unsigned int random, unsigned int period)
+{
+	unsigned int i;
+	unsigned long long total_length;
+	unsigned long long total_errors;
+	struct bist_record r;
+
+	printf("sdram_bist_stream: binary records until a key is pressed\n");
+	uart_sync();
+
+	r.sync = BIST_RECORD_SYNC;
+	r.loop = BIST_RECORD_HEADER;
+	r.wr_ticks = SYSTEM_CLOCK_FREQUENCY;
+	r.rd_ticks = burst_length;
+	r.length = random;
+	r.errors = 0;
+	emit_record(&r);
+
+	wr_length = 0;
+	wr_ticks = 0;
+	rd_length = 0;
+	rd_ticks = 0;
+	r.errors = 0;
+	total_length = 0;
+	total_errors = 0;
+	for(i=0;; i++) {
+		/* exit on key pressed */
+		if (readchar_nonblock()) {
+			readchar();
+			break;
+		}
+
+		sdram_bist_loop(i, burst_length, random);
+		r.errors += rd_errors;
+
+		if (i%period == period-1) {
+			r.loop = i;
+			r.wr_ticks = wr_ticks;
+			r.rd_ticks = rd_ticks;
+			r.length = wr_length;
+			emit_record(&r);
+			total_length += wr_length;
+			total_errors += r.errors;
+			wr_length = 0;
+			wr_ticks = 0;
+			rd_length = 0;
+			rd_ticks = 0;
+			r.errors = 0;
+		}
+	}
+
+	/* totals of the reported records */
+	r.loop = BIST_RECORD_END;
+	r.wr_ticks = i - i%period;
+	r.rd_ticks = 0;
+	r.length = total_length;
+	r.errors = total_errors;
+	emit_record(&r);
+	uart_sync();
+	printf("\nsdram_bist_stream: end\n");
 }
 
 #endif
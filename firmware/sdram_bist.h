@@ -3,5 +3,6 @@
 
 void sdram_bist_loop(unsigned int loop, unsigned int burst_length, unsigned int random);
 void sdram_bist(unsigned int burst_length, unsigned int random);
+void sdram_bist_stream(unsigned int burst_length, unsigned int random, unsigned int period);
 
 #endif /* __SDRAM_BIST_H */
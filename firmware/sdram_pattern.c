@@ -0,0 +1,126 @@
+#include <generated/csr.h>
+#ifdef CSR_SDRAM_PATTERN_BASE
+#include "sdram_pattern.h"
+
+#include <stdio.h>
+#include <string.h>
+#include <generated/mem.h>
+
+/* PatternEngine modes and March elements, see test/patterns.py */
+
+#define MODE_SOLID        0
+#define MODE_WALKING      1
+#define MODE_ADDRESS      2
+#define MODE_CHECKERBOARD 3
+
+#define NONE   0
+#define NORMAL 1
+#define INVERT 3
+
+#define PORT_BYTES (SDRAM_PATTERN_DATA_WIDTH/8)
+
+/* the firmware runs from main_ram (.text/.rodata/.data at offset 0): tests start past it */
+#define IMAGE_ALIGN 0x10000
+
+extern unsigned int _edata;
+
+static unsigned int image_end(void)
+{
+	unsigned int end;
+
+	end = (unsigned int)&_edata - MAIN_RAM_BASE;
+	return (end + IMAGE_ALIGN - 1) & ~(IMAGE_ALIGN - 1);
+}
+
+struct element {
+	unsigned char descending;
+	unsigned char read;
+	unsigned char write;
+};
+
+static const struct element march_cm[] = {
+	{0, NONE,   NORMAL},
+	{0, NORMAL, INVERT},
+	{0, INVERT, NORMAL},
+	{1, NORMAL, INVERT},
+	{1, INVERT, NORMAL},
+	{0, NORMAL, NONE},
+};
+
+static const struct element write_read[] = {
+	{0, NONE,   NORMAL},
+	{0, NORMAL, NONE},
+	{0, NONE,   INVERT},
+	{0, INVERT, NONE},
+};
+
+static unsigned int run_element(unsigned int mode, unsigned int phase,
+	unsigned int offset, unsigned int length, const struct element *e)
+{
+	sdram_pattern_mode_write(mode);
+	sdram_pattern_phase_write(phase);
+	sdram_pattern_base_write(offset/PORT_BYTES);
+	sdram_pattern_length_write(length/PORT_BYTES);
+	sdram_pattern_descending_write(e->descending);
+	sdram_pattern_read_write(e->read);
+	sdram_pattern_write_write(e->write);
+	sdram_pattern_start_write(1);
+	while(sdram_pattern_done_read() == 0);
+	return sdram_pattern_errors_read();
+}
+
+static unsigned int run_elements(unsigned int mode, unsigned int phase,
+	unsigned int offset, unsigned int length, const struct element *e, int n)
+{
+	int i;
+	unsigned int errors;
+
+	errors = 0;
+	for(i=0; i<n; i++)
+		errors += run_element(mode, phase, offset, length, &e[i]);
+	return errors;
+}
+
+/* walking ones/zeros: one write/read pair per bit position so every bit of every word is walked */
+static unsigned int run_walking(unsigned int offset, unsigned int length, const struct element *e)
+{
+	unsigned int phase;
+	unsigned int errors;
+
+	errors = 0;
+	for(phase=0; phase<SDRAM_PATTERN_DATA_WIDTH; phase++)
+		errors += run_elements(MODE_WALKING, phase, offset, length, e, 2);
+	return errors;
+}
+
+void sdram_pattern(char *test, unsigned int offset, unsigned int length)
+{
+	unsigned int errors;
+
+	if(offset == 0)
+		offset = image_end();
+	if(length == 0)
+		length = MAIN_RAM_SIZE - offset;
+	if(offset < image_end() || offset > MAIN_RAM_SIZE || length > MAIN_RAM_SIZE - offset) {
+		printf("0x%08x-0x%08x overlaps the firmware (0x00000000-0x%08x) or is outside main_ram\n",
+			offset, offset + length - 1, image_end() - 1);
+		return;
+	}
+	if(strcmp(test, "march_cm") == 0)
+		errors = run_elements(MODE_SOLID, 0, offset, length, march_cm, 6);
+	else if(strcmp(test, "walking_ones") == 0)
+		errors = run_walking(offset, length, write_read);
+	else if(strcmp(test, "walking_zeros") == 0)
+		errors = run_walking(offset, length, &write_read[2]);
+	else if(strcmp(test, "address") == 0)
+		errors = run_elements(MODE_ADDRESS, 0, offset, length, write_read, 4);
+	else if(strcmp(test, "checkerboard") == 0)
+		errors = run_elements(MODE_CHECKERBOARD, 0, offset, length, write_read, 4);
+	else {
+		printf("unknown test %s\n", test);
+		return;
+	}
+	printf("%s: 0x%08x-0x%08x %d errors\n", test, offset, offset + length - 1, errors);
+}
+
+#endif
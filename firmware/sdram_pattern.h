@@ -0,0 +1,6 @@
+#ifndef __SDRAM_PATTERN_H
+#define __SDRAM_PATTERN_H
+
+void sdram_pattern(char *test, unsigned int offset, unsigned int length);
+
+#endif /* __SDRAM_PATTERN_H */
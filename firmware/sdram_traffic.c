@@ -0,0 +1,140 @@
+#include <generated/csr.h>
+#include <generated/mem.h>
+#ifdef CSR_SDRAM_TRAFFIC_BASE
+#include "sdram_traffic.h"
+
+#include <stdio.h>
+#include <string.h>
+#ifdef CSR_ETHMAC_BASE
+#include <net/microudp.h>
+#endif
+
+/* SDRAMTraffic pairs (crossbar scaling), see test/traffic.py */
+
+#define MODE_WRITE 1
+#define MODE_READ  2
+
+#define PORT_BYTES (SDRAM_TRAFFIC_DATA_WIDTH/8)
+
+/* Loads run by the CPU while the pairs run (load argument, bit mask):
+ * - LOAD_CPU: copies between two main_ram buffers larger than the L2 cache, placed right after
+ *   the last pair region
+ * - LOAD_ETH: UDP frames to the discard port of REMOTEIP, their payload copied from the first
+ *   buffer: main_ram reads of the CPU and MAC buffer writes on the bus shared with the MAC
+ *   (EthernetSoC builds). The MAC buffers frames in its own SRAM, it is not an SDRAM master. */
+#define LOAD_CPU 1
+#define LOAD_ETH 2
+
+#define CPU_BUFFER_BYTES (64*1024)
+
+static unsigned int *cpu_src;
+static unsigned int *cpu_dst;
+
+#ifdef CSR_ETHMAC_BASE
+#define ETH_LOAD_PORT   9
+#define ETH_FRAME_BYTES 1024
+
+static unsigned int eth_offset;
+static unsigned int eth_frames;
+
+static void eth_load(void)
+{
+	memcpy(microudp_get_tx_buffer(), (unsigned char *)cpu_src + eth_offset, ETH_FRAME_BYTES);
+	eth_offset = (eth_offset + ETH_FRAME_BYTES) % CPU_BUFFER_BYTES;
+	microudp_send(ETH_LOAD_PORT, ETH_LOAD_PORT, ETH_FRAME_BYTES);
+	eth_frames++;
+}
+#endif
+
+static unsigned int compute_speed(unsigned long long length, unsigned int ticks)
+{
+	if(ticks == 0)
+		return 0;
+	return (8*length*SYSTEM_CLOCK_FREQUENCY)/(1000000ULL*ticks);
+}
+
+static unsigned int run(unsigned int pairs, unsigned int mode, unsigned int offset,
+	unsigned int length, unsigned int load)
+{
+	unsigned int i;
+	unsigned int errors;
+	unsigned int words;
+	unsigned int accesses;
+
+	sdram_traffic_pairs_write(pairs);
+	sdram_traffic_mode_write(mode);
+	sdram_traffic_base_write(offset/PORT_BYTES);
+	sdram_traffic_stride_write(length/PORT_BYTES);
+	sdram_traffic_length_write(length/PORT_BYTES);
+#ifdef CSR_ETHMAC_BASE
+	eth_frames = 0;
+#endif
+	sdram_traffic_start_write(1);
+	while(sdram_traffic_done_read() == 0) {
+		if(load & LOAD_CPU)
+			memcpy(cpu_dst, cpu_src, CPU_BUFFER_BYTES);
+#ifdef CSR_ETHMAC_BASE
+		if(load & LOAD_ETH)
+			eth_load();
+#endif
+	}
+
+	errors = 0;
+	words = length/PORT_BYTES;
+	for(i=0; i<pairs; i++) {
+		sdram_traffic_sel_write(i);
+		printf("%5d %4d %12d %12d %10d %10d %8d\n", pairs, i,
+			(mode & MODE_WRITE) ? compute_speed(length, sdram_traffic_wr_ticks_read()) : 0,
+			(mode & MODE_READ) ? compute_speed(length, sdram_traffic_rd_ticks_read()) : 0,
+			(mode & MODE_READ) ? sdram_traffic_latency_sum_read()/words : 0,
+			sdram_traffic_latency_max_read(),
+			sdram_traffic_errors_read());
+		errors += sdram_traffic_errors_read();
+	}
+	accesses = ((mode & MODE_WRITE) != 0) + ((mode & MODE_READ) != 0);
+	printf("%5d  all aggregate %d Mbps\n", pairs,
+		compute_speed((unsigned long long)pairs*length*accesses, sdram_traffic_ticks_read()));
+#ifdef CSR_ETHMAC_BASE
+	if(load & LOAD_ETH)
+		printf("%5d  eth %d frames, %d Mbps\n", pairs, eth_frames,
+			compute_speed((unsigned long long)eth_frames*ETH_FRAME_BYTES, sdram_traffic_ticks_read()));
+#endif
+	return errors;
+}
+
+void sdram_traffic(unsigned int mode, unsigned int offset, unsigned int length, unsigned int load)
+{
+	unsigned int pairs;
+	unsigned int errors;
+
+	if(mode == 0)
+		mode = MODE_WRITE | MODE_READ;
+	if(offset == 0)
+		offset = 0x00100000;
+	if(length == 0)
+		length = 0x00100000;
+	cpu_src = (unsigned int *)(MAIN_RAM_BASE + offset + SDRAM_TRAFFIC_PAIRS*length);
+	cpu_dst = (unsigned int *)(MAIN_RAM_BASE + offset + SDRAM_TRAFFIC_PAIRS*length + CPU_BUFFER_BYTES);
+	if(offset + SDRAM_TRAFFIC_PAIRS*length + (load ? 2*CPU_BUFFER_BYTES : 0) > MAIN_RAM_SIZE) {
+		printf("sdram_traffic: regions exceed main_ram\n");
+		return;
+	}
+#ifdef CSR_ETHMAC_BASE
+	if((load & LOAD_ETH) && !microudp_arp_resolve(IPTOINT(REMOTEIP1, REMOTEIP2, REMOTEIP3, REMOTEIP4))) {
+		printf("sdram_traffic: no ARP reply from the remote IP, Ethernet load off\n");
+		load &= ~LOAD_ETH;
+	}
+#else
+	if(load & LOAD_ETH) {
+		printf("sdram_traffic: no Ethernet MAC, Ethernet load off\n");
+		load &= ~LOAD_ETH;
+	}
+#endif
+	printf("pairs pair     WR(Mbps)     RD(Mbps)    LAT_AVG    LAT_MAX   ERRORS\n");
+	errors = 0;
+	for(pairs=1; pairs<=SDRAM_TRAFFIC_PAIRS; pairs++)
+		errors += run(pairs, mode, offset, length, load);
+	printf("%d errors\n", errors);
+}
+
+#endif
@@ -0,0 +1,6 @@
+#ifndef __SDRAM_TRAFFIC_H
+#define __SDRAM_TRAFFIC_H
+
+void sdram_traffic(unsigned int mode, unsigned int offset, unsigned int length, unsigned int load);
+
+#endif /* __SDRAM_TRAFFIC_H */
@@ -1,5 +1,219 @@
 #!/usr/bin/env python3
 
 import os
+import sys
+import time
+import socket
+import argparse
+import subprocess
 
-os.system("openocd -f openocd/ecp5-versa5g.cfg -c \"transport select jtag; init; svf build/gateware/top.svf; exit\"")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "test"))
+from bridge_args import add_bridge_args
+
+# Identifier ---------------------------------------------------------------------------------------
+
+# versa_ecp5.py writes the identifier of each build (ident + build date) next to the bitstream in
+# top.ident: when the board answers with the same identifier over the bridge, its SRAM already runs
+# it. This says nothing about the flash, flash updates rely on the sector readback instead.
+
+def read_ident(filename):
+    # None (always load) when the build has no identifier
+    ident = os.path.splitext(filename)[0] + ".ident"
+    if not os.path.exists(ident):
+        return None
+    with open(ident) as f:
+        return f.read().strip() or None
+
+def board_ident(args):
+    # the bridge stack (litex, numpy) is only needed here
+    try:
+        from bridge import get_bridge, get_identifier
+    except ImportError:
+        return None
+    try:
+        wb = get_bridge(args)
+        wb.open()
+        try:
+            return get_identifier(wb).strip()
+        finally:
+            wb.close()
+    except (OSError, KeyError, AttributeError):
+        return None
+
+# OpenOCD ------------------------------------------------------------------------------------------
+
+def openocd_args(args, commands):
+    commands = ["transport select jtag"] + (["ftdi_serial " + args.serial] if args.serial else []) + commands
+    return ["openocd", "-f", args.config, "-c", "; ".join(commands)]
+
+class OpenOCD:
+    # openocd started in the background, driven through its Tcl RPC port
+    def __init__(self, args, tcl_port=6666):
+        self.proc = subprocess.Popen(openocd_args(args, ["tcl_port {}".format(tcl_port),
+            "telnet_port disabled", "gdb_port disabled", "init"]),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for i in range(50):
+            try:
+                self.sock = socket.create_connection(("localhost", tcl_port))
+                break
+            except OSError:
+                if self.proc.poll() is not None:
+                    raise OSError("openocd failed to start")
+                time.sleep(0.1)
+        else:
+            raise OSError("openocd Tcl port not reachable")
+
+    def run(self, command):
+        self.sock.sendall(command.encode() + b"\x1a")
+        data = b""
+        while not data.endswith(b"\x1a"):
+            data += self.sock.recv(65536)
+        return data[:-1].decode()
+
+    def close(self):
+        self.run("shutdown")
+        self.sock.close()
+        self.proc.wait()
+
+# ECP5 SPI Flash -----------------------------------------------------------------------------------
+
+# SPI background programming: with the SRAM configuration erased and LSC_PROG_SPI loaded, each DR
+# scan is one SPI transfer (CS low in Shift-DR), bytes shifted MSB first. Sectors are read back
+# and only the ones that differ from the new image are erased and programmed.
+
+ISC_ENABLE   = 0xc6
+ISC_ERASE    = 0x0e
+ISC_DISABLE  = 0x26
+LSC_PROG_SPI = 0x3a
+LSC_REFRESH  = 0x79
+
+SPI_WREN = 0x06
+SPI_RDSR = 0x05
+SPI_READ = 0x03
+SPI_PP   = 0x02
+SPI_SE   = 0xd8
+
+SECTOR_SIZE = 65536
+PAGE_SIZE   = 256
+READ_CHUNK  = 4096
+
+REVERSE = bytes(int("{:08b}".format(i)[::-1], 2) for i in range(256))
+
+class ECP5SPIFlash:
+    def __init__(self, ocd, tap="ecp5.tap"):
+        self.ocd = ocd
+        self.tap = tap
+
+    def ir(self, instruction, dr=None):
+        self.ocd.run("irscan {} 0x{:02x}".format(self.tap, instruction))
+        if dr is not None:
+            self.ocd.run("drscan {} 8 0x{:02x}".format(self.tap, dr))
+        self.ocd.run("runtest 100")
+
+    def enter(self):
+        # erasing the SRAM configuration releases the SPI pins: the running bitstream is lost even
+        # when no sector changes, exit() reboots the FPGA from the flash
+        self.ir(ISC_ENABLE, 0)
+        self.ir(ISC_ERASE, 0)
+        self.ir(ISC_DISABLE)
+        self.ir(LSC_PROG_SPI)
+        self.ocd.run("drscan {} 16 0x68fe".format(self.tap))
+
+    def exit(self):
+        self.ir(LSC_REFRESH)
+
+    def spi(self, data, nread=0):
+        out = bytes(data) + bytes(nread)
+        value = int.from_bytes(out.translate(REVERSE), "little")
+        r = self.ocd.run("drscan {} {:d} 0x{:x}".format(self.tap, 8*len(out), value))
+        return int(r, 16).to_bytes(len(out), "little").translate(REVERSE)[len(data):]
+
+    def wait(self):
+        while self.spi([SPI_RDSR], 1)[0] & 0x01:
+            pass
+
+    def read(self, addr, length):
+        data = b""
+        for offset in range(0, length, READ_CHUNK):
+            a = addr + offset
+            data += self.spi([SPI_READ, (a >> 16) & 0xff, (a >> 8) & 0xff, a & 0xff],
+                min(READ_CHUNK, length - offset))
+        return data
+
+    def erase_sector(self, addr):
+        self.spi([SPI_WREN])
+        self.spi([SPI_SE, (addr >> 16) & 0xff, (addr >> 8) & 0xff, addr & 0xff])
+        self.wait()
+
+    def program_page(self, addr, data):
+        self.spi([SPI_WREN])
+        self.spi([SPI_PP, (addr >> 16) & 0xff, (addr >> 8) & 0xff, addr & 0xff] + list(data))
+        self.wait()
+
+    def update(self, image, addr=0):
+        # returns (changed, total) sectors
+        image += b"\xff"*(-len(image) % SECTOR_SIZE)
+        changed = 0
+        for offset in range(0, len(image), SECTOR_SIZE):
+            sector = image[offset:offset + SECTOR_SIZE]
+            if self.read(addr + offset, SECTOR_SIZE) == sector:
+                continue
+            changed += 1
+            print("sector 0x{:06x}: erase/program".format(addr + offset))
+            self.erase_sector(addr + offset)
+            for page in range(0, SECTOR_SIZE, PAGE_SIZE):
+                data = sector[page:page + PAGE_SIZE]
+                if data != b"\xff"*PAGE_SIZE:
+                    self.program_page(addr + offset + page, data)
+            if self.read(addr + offset, SECTOR_SIZE) != sector:
+                raise IOError("verify failed at 0x{:06x}".format(addr + offset))
+        return changed, len(image)//SECTOR_SIZE
+
+# Load ---------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a bitstream over JTAG (SRAM or SPI flash)")
+    parser.add_argument("bitstream", nargs="?", default=None,
+        help="top.svf (SRAM) or top.bit (--flash), compressed bitstreams are loaded as is")
+    parser.add_argument("--flash", action="store_true",
+        help="program the SPI flash (changed sectors only), the running SRAM configuration is erased "
+             "and the FPGA reboots from the flash afterwards")
+    parser.add_argument("--flash-addr", default=0, type=lambda s: int(s, 0), help="flash offset")
+    parser.add_argument("--force", action="store_true", help="load even if the board runs this bitstream (SRAM)")
+    parser.add_argument("--config", default="openocd/ecp5-versa5g.cfg", help="openocd configuration")
+    parser.add_argument("--serial", default=None, help="FTDI serial number of the board")
+    add_bridge_args(parser)
+    parser.set_defaults(csr_csv="test/csr.csv")
+    args = parser.parse_args()
+
+    if args.bitstream is None:
+        args.bitstream = "build/gateware/top.bit" if args.flash else "build/gateware/top.svf"
+
+    ident = read_ident(args.bitstream)
+    if not args.flash and not args.force and ident is not None:
+        current = board_ident(args)
+        if current == ident:
+            print("board already runs {} ({}), skipping".format(args.bitstream, ident))
+            return
+        print("board runs {}".format(current if current is not None else "an unknown bitstream"))
+
+    start = time.time()
+    if args.flash:
+        with open(args.bitstream, "rb") as f:
+            image = f.read()
+        ocd = OpenOCD(args)
+        flash = ECP5SPIFlash(ocd)
+        try:
+            flash.enter()
+            changed, total = flash.update(image, args.flash_addr)
+        finally:
+            flash.exit()
+            ocd.close()
+        print("{:d}/{:d} sectors written, FPGA rebooted from flash".format(changed, total))
+    else:
+        if subprocess.call(openocd_args(args, ["init", "svf " + args.bitstream, "exit"])) != 0:
+            exit(1)
+    print("loaded {} in {:.1f}s".format(args.bitstream, time.time() - start))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import zlib
+import time
+import socket
+import struct
+import argparse
+import threading
+
+# Netboot ------------------------------------------------------------------------------------------
+
+# The BIOS netboot fetches boot.bin over TFTP from REMOTEIP into main_ram and jumps to it. The
+# runtime firmware (firmware/netboot.c) answers info requests on NETBOOT_PORT with the length and
+# crc32 of the image it runs and reboots to the BIOS on request: unchanged images are not sent.
+
+NETBOOT_PORT = 6069
+
+TFTP_RRQ   = 1
+TFTP_DATA  = 3
+TFTP_ACK   = 4
+TFTP_ERROR = 5
+
+TFTP_BLOCK = 512
+
+def image_info(image):
+    return len(image), zlib.crc32(image) & 0xffffffff
+
+def query(target, port=NETBOOT_PORT, timeout=0.5, retries=4):
+    # (length, crc32) of the image the target runs, None when the runtime does not answer
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.settimeout(timeout)
+    try:
+        for i in range(retries):
+            s.sendto(b"NBTI", (target, port))
+            try:
+                data, addr = s.recvfrom(64)
+            except socket.timeout:
+                continue
+            if data[:4] == b"NBTI" and len(data) >= 12:
+                return struct.unpack(">II", data[4:12])
+        return None
+    finally:
+        s.close()
+
+def reboot(target, port=NETBOOT_PORT):
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.sendto(b"NBTR", (target, port))
+    s.close()
+
+# TFTP Server --------------------------------------------------------------------------------------
+
+class TFTPServer:
+    # read-only, octet mode, 512-byte blocks (what the BIOS requests), one transfer at a time
+    def __init__(self, image, host="", port=69, filename="boot.bin", timeout=0.5, retries=10):
+        self.image = image
+        self.host = host
+        self.filename = filename
+        self.timeout = timeout
+        self.retries = retries
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.port = self.sock.getsockname()[1]
+
+    def close(self):
+        self.sock.close()
+
+    def serve(self, timeout=None):
+        # sends the image to the first client requesting it, returns its address (None on timeout)
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            self.sock.settimeout(None if deadline is None else max(deadline - time.time(), 1e-3))
+            try:
+                data, client = self.sock.recvfrom(1024)
+            except socket.timeout:
+                return None
+            if len(data) < 4 or struct.unpack(">H", data[:2])[0] != TFTP_RRQ:
+                continue
+            filename = data[2:].split(b"\0")[0].decode(errors="replace")
+            if filename != self.filename:
+                self.sock.sendto(struct.pack(">HH", TFTP_ERROR, 1) + b"file not found\0", client)
+                continue
+            if self.transfer(client):
+                return client
+
+    def transfer(self, client):
+        # new port for the transfer (TID), a final short (possibly empty) block ends it
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.bind((self.host, 0))
+        try:
+            for n in range(len(self.image)//TFTP_BLOCK + 1):
+                block = (n + 1) & 0xffff
+                packet = struct.pack(">HH", TFTP_DATA, block) + self.image[TFTP_BLOCK*n:TFTP_BLOCK*(n + 1)]
+                for retry in range(self.retries):
+                    s.sendto(packet, client)
+                    if self.wait_ack(s, client, block):
+                        break
+                else:
+                    return False
+            return True
+        finally:
+            s.close()
+
+    def wait_ack(self, s, client, block):
+        deadline = time.time() + self.timeout
+        while True:
+            s.settimeout(max(deadline - time.time(), 1e-3))
+            try:
+                data, addr = s.recvfrom(1024)
+            except socket.timeout:
+                return False
+            if addr == client and len(data) >= 4 and struct.unpack(">HH", data[:4]) == (TFTP_ACK, block):
+                return True
+
+def tftp_get(server, filename="boot.bin", timeout=1.0):
+    # BIOS-like client
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.settimeout(timeout)
+    s.sendto(struct.pack(">H", TFTP_RRQ) + filename.encode() + b"\0octet\0", server)
+    image = b""
+    block = 1
+    try:
+        while True:
+            data, addr = s.recvfrom(4 + TFTP_BLOCK)
+            opcode, n = struct.unpack(">HH", data[:4])
+            if opcode == TFTP_ERROR:
+                raise IOError(data[4:].rstrip(b"\0").decode())
+            if opcode != TFTP_DATA:
+                continue
+            s.sendto(struct.pack(">HH", TFTP_ACK, n), addr)
+            if n == block & 0xffff:
+                image += data[4:]
+                block += 1
+                if len(data) < 4 + TFTP_BLOCK:
+                    return image
+    finally:
+        s.close()
+
+# Loopback Target ----------------------------------------------------------------------------------
+
+class FakeTarget(threading.Thread):
+    # runtime firmware stand-in on localhost: answers info requests, netboots on reboot requests
+    def __init__(self, tftp, host="127.0.0.1", port=0, image=b""):
+        threading.Thread.__init__(self, daemon=True)
+        self.tftp = tftp
+        self.image = image
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.port = self.sock.getsockname()[1]
+
+    def run(self):
+        while True:
+            data, addr = self.sock.recvfrom(64)
+            if data == b"NBTI":
+                self.sock.sendto(b"NBTI" + struct.pack(">II", *image_info(self.image)), addr)
+            elif data == b"NBTR":
+                self.image = tftp_get(self.tftp)
+
+# Load ---------------------------------------------------------------------------------------------
+
+def load(image, args):
+    length, crc = image_info(image)
+    print("image: {:d} bytes, crc32 0x{:08x}".format(length, crc))
+
+    info = None if args.force else query(args.target, args.port)
+    if info == (length, crc):
+        print("target already runs this image, skipping upload")
+        return True
+
+    server = TFTPServer(image, args.bind, args.tftp_port)
+    if info is not None:
+        print("target runs {:d} bytes, crc32 0x{:08x}: rebooting it".format(*info))
+        reboot(args.target, args.port)
+    else:
+        print("no answer from the runtime, waiting for the BIOS netboot request")
+    start = time.time()
+    client = server.serve(args.timeout)
+    server.close()
+    if client is None:
+        print("timeout: no TFTP request for {}".format(server.filename))
+        return False
+    duration = time.time() - start
+    print("sent to {}:{:d} in {:.2f}s".format(*client, duration))
+
+    info = query(args.target, args.port, retries=int(args.boot_timeout/0.5))
+    if info != (length, crc):
+        print("target does not report the new image ({})".format(
+            "no answer" if info is None else "{:d} bytes, crc32 0x{:08x}".format(*info)))
+        return False
+    print("target booted the new image")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the firmware over Ethernet (BIOS netboot)")
+    parser.add_argument("--image", default="firmware/firmware.bin", help="image to load")
+    parser.add_argument("--no-build", action="store_true", help="do not rebuild the firmware")
+    parser.add_argument("--target", default="192.168.1.50", help="target IP (LOCALIP)")
+    parser.add_argument("--port", default=NETBOOT_PORT, type=int, help="runtime netboot port")
+    parser.add_argument("--bind", default="", help="TFTP server address (REMOTEIP, default: all)")
+    parser.add_argument("--tftp-port", default=69, type=int, help="TFTP server port")
+    parser.add_argument("--timeout", default=30.0, type=float, help="time to wait for the TFTP request (s)")
+    parser.add_argument("--boot-timeout", default=5.0, type=float, help="time to wait for the new runtime (s)")
+    parser.add_argument("--force", action="store_true", help="upload even if the target runs the image")
+    parser.add_argument("--loopback", action="store_true", help="load twice into a local stand-in target")
+    args = parser.parse_args()
+
+    if args.loopback:
+        args.target = "127.0.0.1"
+        args.tftp_port = 6969 if args.tftp_port == 69 else args.tftp_port
+        target = FakeTarget((args.target, args.tftp_port))
+        target.start()
+        args.port = target.port
+    elif not args.no_build:
+        os.system("cd firmware && make clean all")
+
+    if args.loopback and not os.path.exists(args.image):
+        image = os.urandom(100*1024)
+    else:
+        image = open(args.image, "rb").read()
+
+    ok = load(image, args)
+    if args.loopback:
+        ok = ok and load(image, args) and target.image == image
+    exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
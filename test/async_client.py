@@ -0,0 +1,162 @@
+import socket
+import struct
+import asyncio
+import threading
+from collections import deque
+
+from csr_fast import FastCSRBuilder
+
+from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord
+from litex.tools.remote.etherbone import EtherboneReads, EtherboneWrites
+from litex.tools.remote.etherbone import etherbone_packet_header_length, etherbone_record_header_length
+
+# Async Remote Client ------------------------------------------------------------------------------
+
+# litex_server protocol (Etherbone packets over TCP, one record per packet, only reads are answered)
+# with up to window reads in flight. The server answers in order, so replies are matched to the
+# oldest pending read.
+
+class AsyncRemoteClient:
+    def __init__(self, host="localhost", port=1234, base_address=0, window=16):
+        self.host = host
+        self.port = port
+        self.base_address = base_address
+        self.window = window
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.slots = asyncio.Semaphore(self.window)
+        self.pending = deque()
+        self.receiver = asyncio.ensure_future(self.receive())
+
+    async def close(self):
+        self.receiver.cancel()
+        self.writer.close()
+
+    def send(self, record):
+        packet = EtherbonePacket()
+        packet.records = [record]
+        packet.encode()
+        self.writer.write(packet.bytes)
+
+    async def receive(self):
+        header_length = etherbone_packet_header_length + etherbone_record_header_length
+        while True:
+            header = await self.reader.readexactly(header_length)
+            wcount, rcount = struct.unpack(">BB", header[-2:])
+            payload = await self.reader.readexactly(4*(wcount + rcount + 1))
+            packet = EtherbonePacket(header + payload)
+            packet.decode()
+            self.pending.popleft().set_result(packet.records.pop().writes.get_datas())
+
+    async def read_addrs(self, addrs):
+        async with self.slots:
+            future = asyncio.get_event_loop().create_future()
+            record = EtherboneRecord()
+            record.reads = EtherboneReads(addrs=[self.base_address + addr for addr in addrs])
+            record.rcount = len(record.reads)
+            self.pending.append(future)
+            self.send(record)
+            return await future
+
+    async def write_read_addrs(self, addr, datas, addrs):
+        # a write then a read sent together once a slot is free, so the read sees this write and
+        # not the one of a later record
+        async with self.slots:
+            future = asyncio.get_event_loop().create_future()
+            record = EtherboneRecord()
+            record.writes = EtherboneWrites(base_addr=self.base_address + addr, datas=list(datas))
+            record.wcount = len(record.writes)
+            self.send(record)
+            record = EtherboneRecord()
+            record.reads = EtherboneReads(addrs=[self.base_address + a for a in addrs])
+            record.rcount = len(record.reads)
+            self.pending.append(future)
+            self.send(record)
+            return await future
+
+    async def read(self, addr, length=None):
+        length_int = 1 if length is None else length
+        datas = await self.read_addrs([addr + 4*j for j in range(length_int)])
+        return datas[0] if length is None else datas
+
+    async def write(self, addr, datas):
+        datas = datas if isinstance(datas, list) else [datas]
+        record = EtherboneRecord()
+        record.writes = EtherboneWrites(base_addr=self.base_address + addr, datas=datas)
+        record.wcount = len(record.writes)
+        self.send(record)
+        await self.writer.drain()
+
+    async def gather(self, reads):
+        # reads: list of address lists, results in the same order
+        return await asyncio.gather(*[self.read_addrs(addrs) for addrs in reads])
+
+    async def gather_write_reads(self, records):
+        # records: list of (addr, datas, addrs), results in the same order
+        return await asyncio.gather(*[self.write_read_addrs(*record) for record in records])
+
+    async def gather_writes(self, writes):
+        # writes: list of (addr, datas), not acknowledged by the server: sent back to back
+        for addr, datas in writes:
+            record = EtherboneRecord()
+            record.writes = EtherboneWrites(base_addr=self.base_address + addr, datas=list(datas))
+            record.wcount = len(record.writes)
+            self.send(record)
+        await self.writer.drain()
+
+# Pipelined Remote Client --------------------------------------------------------------------------
+
+# Drop-in for litex.RemoteClient (regs/mems/constants, blocking read/write) running the async client
+# in a background event loop. bulk.py uses gather/gather_writes when present, so bulk transfers and
+# check_pattern keep several bursts in flight without changes.
+
+class PipelinedRemoteClient(FastCSRBuilder):
+    def __init__(self, host="localhost", port=1234, base_address=0, csr_csv="csr.csv",
+                 csr_data_width=None, window=16, debug=False):
+        FastCSRBuilder.__init__(self, self, csr_csv, csr_data_width)
+        self.client = AsyncRemoteClient(host, port, base_address, window)
+        self.debug = debug
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def open(self):
+        if hasattr(self, "loop"):
+            return
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.run(self.client.open())
+
+    def close(self):
+        if not hasattr(self, "loop"):
+            return
+        self.run(self.client.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        del self.loop
+
+    def read(self, addr, length=None):
+        datas = self.run(self.client.read(addr, length))
+        if self.debug:
+            for i, data in enumerate([datas] if length is None else datas):
+                print("read 0x{:08x} @ 0x{:08x}".format(data, addr + 4*i))
+        return datas
+
+    def write(self, addr, datas):
+        self.run(self.client.write(addr, datas))
+
+    def read_addrs(self, addrs):
+        return self.run(self.client.read_addrs(addrs))
+
+    def gather(self, reads):
+        return self.run(self.client.gather(reads))
+
+    def gather_writes(self, writes):
+        self.run(self.client.gather_writes(writes))
+
+    def write_reads(self, records):
+        return self.run(self.client.gather_write_reads(records))
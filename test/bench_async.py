@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import argparse
+import tempfile
+
+from bulk import *
+from bridge import BatchRemoteClient
+from async_client import PipelinedRemoteClient
+from fake_bridge import FakeBridge, write_csr_csv
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+def bench(wb, reads, length):
+    base = wb.mems.main_ram.base
+    results = []
+
+    # latency: reads one after the other
+    start = time.time()
+    for i in range(16):
+        wb.read(base)
+    results.append(1e3*(time.time() - start)/16)
+
+    # independent single-word reads
+    start = time.time()
+    if hasattr(wb, "gather"):
+        wb.gather([[base + 4*i] for i in range(reads)])
+    else:
+        for i in range(reads):
+            wb.read(base + 4*i)
+    results.append(reads/(time.time() - start))
+
+    start = time.time()
+    bulk_read(wb, base, length)
+    results.append(length/(time.time() - start))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Synchronous vs pipelined client against a delayed local server")
+    parser.add_argument("--port", default=1260, type=int, help="local port to use")
+    parser.add_argument("--latency", default=1e-3, type=float, help="server round-trip delay (s)")
+    parser.add_argument("--windows", default="1,4,16,64", help="comma separated pipelined windows")
+    parser.add_argument("--reads", default=256, type=int, help="number of single-word reads")
+    parser.add_argument("--length", default=16384, type=int, help="number of 32-bit words for bulk reads")
+    args = parser.parse_args()
+
+    csr_csv = os.path.join(tempfile.mkdtemp(), "csr.csv")
+    write_csr_csv(csr_csv)
+
+    server = FakeBridge(port=args.port, latency=args.latency, pipelined=True)
+    server.start()
+
+    clients = [("sync", "-", BatchRemoteClient(port=args.port, csr_csv=csr_csv, csr_data_width=32))]
+    for window in [int(w) for w in args.windows.split(",")]:
+        clients.append(("pipelined", str(window),
+            PipelinedRemoteClient(port=args.port, csr_csv=csr_csv, csr_data_width=32, window=window)))
+    print("{:<10s} {:>6s} {:>12s} {:>12s} {:>16s}".format("", "window", "latency(ms)", "reads/s", "read words/s"))
+    for name, window, wb in clients:
+        wb.open()
+        print("{:<10s} {:>6s} {:12.3f} {:12.1f} {:16.1f}".format(name, window, *bench(wb, args.reads, args.length)))
+        wb.close()
+
+    server.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import argparse
+import tempfile
+
+from bulk import *
+from bridge import BatchRemoteClient
+from fake_bridge import FakeBridge, write_csr_csv
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+def bench(name, length, fn):
+    start = time.time()
+    fn()
+    duration = time.time() - start
+    print("{:<16s} {:8d} words {:8.3f} s {:12.1f} words/s".format(name, length, duration, length/duration))
+
+def main():
+    parser = argparse.ArgumentParser(description="Word vs bulk transfers against a fake bridge")
+    parser.add_argument("--port", default=1240, type=int, help="fake bridge port")
+    parser.add_argument("--baudrate", default=115200, type=int, help="modelled UART baudrate (0: unthrottled)")
+    parser.add_argument("--latency", default=0.0, type=float, help="extra latency per transaction (s)")
+    parser.add_argument("--length", default=1024, type=int, help="number of 32-bit words")
+    args = parser.parse_args()
+
+    bridge = FakeBridge(port=args.port, baudrate=args.baudrate or None, latency=args.latency)
+    bridge.start()
+
+    csr_csv = os.path.join(tempfile.mkdtemp(), "csr.csv")
+    write_csr_csv(csr_csv)
+    wb = BatchRemoteClient(port=args.port, csr_csv=csr_csv, csr_data_width=32)
+    wb.open()
+
+    base = wb.mems.main_ram.base
+    length = args.length
+    expected = seed_to_data(np.arange(length))
+
+    def word_write():
+        for i in range(length):
+            wb.write(base + 4*i, int(expected[i]))
+        # writes are posted: a read waits for them to be applied
+        wb.read(base)
+
+    def word_read():
+        for i in range(length):
+            wb.read(base + 4*i)
+
+    def bulk_check():
+        addresses, lanes = compare(base, bulk_read(wb, base, length), expected)
+        assert len(addresses) == 0
+
+    bench("word write", length, word_write)
+    bench("word read", length, word_read)
+    bench("bulk write", length, lambda: (bulk_write(wb, base, expected), wb.read(base)))
+    bench("bulk read", length, lambda: bulk_read(wb, base, length))
+    bench("bulk check", length, bulk_check)
+
+    wb.close()
+    bridge.close()
+
+if __name__ == "__main__":
+    main()
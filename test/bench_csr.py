@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import argparse
+import tempfile
+
+from litex.tools.remote.csr_builder import CSRBuilder
+
+import csr_fast
+
+# Compares the CSRBuilder map (csv parsed on each start, generic register accessors) with the
+# generated module of csr_fast.py: start-up time and host-side cost per register access against a
+# null bus (Python overhead only), and batched reads against a bus with a round-trip latency.
+
+# Null bus -----------------------------------------------------------------------------------------
+
+class NullBus(csr_fast.FastCSRBuilder):
+    def __init__(self, csr_csv=None, latency=0.0):
+        csr_fast.FastCSRBuilder.__init__(self, self, csr_csv)
+        self.latency = latency
+
+    def wait(self):
+        if self.latency:
+            end = time.perf_counter() + self.latency
+            while time.perf_counter() < end:
+                pass
+
+    def read(self, addr, length=None):
+        self.wait()
+        return 0 if length is None else [0]*length
+
+    def write(self, addr, datas):
+        pass
+
+    def read_addrs(self, addrs):
+        self.wait()
+        return [0]*len(addrs)
+
+def write_bench_csv(filename, csr_data_width, ncsrs=24, nregs=16):
+    # a map of the size of the bist_test SoC: ncsrs banks of nregs registers of 1 to 64 bits
+    nwords = lambda nbits: (nbits + csr_data_width - 1)//csr_data_width
+    with open(filename, "w") as f:
+        f.write("constant,config_csr_data_width,{:d},,\n".format(csr_data_width))
+        f.write("constant,system_clock_frequency,75000000,,\n")
+        f.write("memory_region,main_ram,0x40000000,268435456,cached\n")
+        for i in range(ncsrs):
+            base = 0x82000000 + 0x800*i
+            f.write("csr_base,csr{:d},0x{:08x},,\n".format(i, base))
+            addr = base
+            for j in range(nregs):
+                length = nwords([1, 8, 16, 32, 64][j % 5])
+                f.write("csr_register,csr{:d}_reg{:d},0x{:08x},{:d},rw\n".format(i, j, addr, length))
+                addr += 4*length
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+def timed(fn, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn()
+    return (time.perf_counter() - start)/n
+
+def main():
+    parser = argparse.ArgumentParser(description="CSRBuilder vs generated CSR accessors")
+    parser.add_argument("--csr-csv", default=None, help="CSR map (default: synthetic bist_test-sized map)")
+    parser.add_argument("--csr-data-width", default=8, type=int, help="synthetic map CSR data width")
+    parser.add_argument("--starts", default=100, type=int, help="start-ups timed")
+    parser.add_argument("--accesses", default=100000, type=int, help="register accesses timed")
+    parser.add_argument("--latency", default=100e-6, type=float, help="bus round trip of the batched reads (s)")
+    args = parser.parse_args()
+
+    csr_csv = args.csr_csv
+    if csr_csv is None:
+        csr_csv = os.path.join(tempfile.mkdtemp(), "csr.csv")
+        write_bench_csv(csr_csv, args.csr_data_width)
+    bus = NullBus()
+
+    def builder_start():
+        CSRBuilder(bus, csr_csv)
+
+    def fast_start():
+        # cached module dropped: measures the (bytecode cached) import, as a new process would
+        csr_fast._modules.clear()
+        NullBus(csr_csv)
+
+    csr_fast.load(csr_csv)
+    print("{:<24s} {:>12s} {:>12s} {:>8s}".format("", "CSRBuilder", "csr_fast", "speedup"))
+    t0 = timed(builder_start, args.starts)
+    t1 = timed(fast_start, args.starts)
+    print("{:<24s} {:10.3f}ms {:10.3f}ms {:7.1f}x".format("start-up", 1e3*t0, 1e3*t1, t0/t1))
+
+    slow = CSRBuilder(bus, csr_csv)
+    fast = NullBus(csr_csv)
+    names = sorted(fast.csr.regs, key=lambda n: fast.csr.regs[n][1])
+    for name in [names[0], names[-1]]:
+        length = fast.csr.regs[name][1]
+        for kind in ["read", "write"]:
+            if kind == "read":
+                s, f = getattr(slow.regs, name).read, getattr(fast.regs, name).read
+            else:
+                s = lambda r=getattr(slow.regs, name): r.write(0x12345678)
+                f = lambda r=getattr(fast.regs, name): r.write(0x12345678)
+            t0 = timed(s, args.accesses)
+            t1 = timed(f, args.accesses)
+            print("{:<24s} {:10.3f}us {:10.3f}us {:7.1f}x".format("{} ({:d} word{})".format(
+                kind, length, "s" if length > 1 else ""), 1e6*t0, 1e6*t1, t0/t1))
+
+    bus.latency = fast.latency = args.latency
+    batch = names[-8:]
+    n = max(args.accesses//1000, 10)
+    t0 = timed(lambda: [getattr(slow.regs, name).read() for name in batch], n)
+    t1 = timed(lambda: csr_fast.read_regs(fast, batch), n)
+    print("{:<24s} {:10.3f}us {:10.3f}us {:7.1f}x".format("{:d} registers, batched".format(len(batch)),
+        1e6*t0, 1e6*t1, t0/t1))
+
+if __name__ == "__main__":
+    main()
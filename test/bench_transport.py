@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import argparse
+import tempfile
+
+from bulk import *
+from bridge import BatchRemoteClient, EtherboneUDP
+from fake_bridge import FakeBridge, FakeEtherboneUDP, write_csr_csv
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+def bench(wb, length):
+    base = wb.mems.main_ram.base
+    datas = seed_to_data(np.arange(length))
+    results = []
+
+    start = time.time()
+    for i in range(256):
+        wb.read(base)
+    results.append(256/(time.time() - start))
+
+    start = time.time()
+    bulk_write(wb, base, datas)
+    wb.read(base)
+    results.append(length/(time.time() - start))
+
+    start = time.time()
+    bulk_read(wb, base, length)
+    results.append(length/(time.time() - start))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="UART vs Etherbone/UDP throughput against local stand-ins")
+    parser.add_argument("--port", default=1250, type=int, help="first local port to use")
+    parser.add_argument("--baudrate", default=115200, type=int, help="modelled UART baudrate")
+    parser.add_argument("--uart-latency", default=0.0, type=float, help="extra latency per UART transaction (s)")
+    parser.add_argument("--udp-latency", default=0.0, type=float, help="extra latency per UDP transaction (s)")
+    parser.add_argument("--length", default=4096, type=int, help="number of 32-bit words")
+    args = parser.parse_args()
+
+    csr_csv = os.path.join(tempfile.mkdtemp(), "csr.csv")
+    write_csr_csv(csr_csv)
+
+    uart = FakeBridge(port=args.port, baudrate=args.baudrate, latency=args.uart_latency)
+    uart.start()
+    udp = FakeEtherboneUDP(host="127.0.0.1", port=args.port + 1, latency=args.udp_latency)
+    udp.start()
+
+    clients = [
+        ("uart", BatchRemoteClient(port=args.port, csr_csv=csr_csv, csr_data_width=32)),
+        ("udp",  EtherboneUDP("127.0.0.1", args.port + 1, local_port=0, csr_csv=csr_csv, csr_data_width=32)),
+    ]
+    print("{:<8s} {:>14s} {:>16s} {:>16s}".format("", "reads/s", "write words/s", "read words/s"))
+    for name, wb in clients:
+        wb.open()
+        print("{:<8s} {:14.1f} {:16.1f} {:16.1f}".format(name, *bench(wb, args.length)))
+        wb.close()
+
+    uart.close()
+    udp.close()
+
+if __name__ == "__main__":
+    main()
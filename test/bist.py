@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import time
+import argparse
+
+from bridge import add_bridge_args, get_bridge
+from sdram_cores import SDRAMCore, bandwidth_mbps, bist_base, TEST_DATA_BYTES
+
+# Host-driven SDRAM BIST: drives the LiteDRAMBISTGenerator/Checker of the bist_test SoC directly
+# through CSRs, with the same write/read overlap as sdram_bist_loop in firmware/sdram_bist.c.
+
+# BIST ---------------------------------------------------------------------------------------------
+
+class BISTModule(SDRAMCore):
+    def configure(self, base, length, random=1):
+        self.reg("reset").write(1)
+        self.reg("reset").write(0)
+        self.reg("random").write(random)
+        self.reg("base").write(base)
+        self.reg("length").write(length)
+
+    def ticks(self):
+        return self.reg("ticks").read()
+
+    def errors(self):
+        return self.reg("errors").read()
+
+
+class SDRAMBIST:
+    def __init__(self, wb, clk_freq):
+        self.generator = BISTModule(wb, "sdram_generator")
+        self.checker = BISTModule(wb, "sdram_checker")
+        self.clk_freq = clk_freq
+
+    def loop(self, loop, burst_length, random):
+        length = burst_length*TEST_DATA_BYTES
+        wr_ticks = 0
+        rd_ticks = 0
+        errors = 0
+        for i in range(128):
+            if i == 0:
+                # prepare first write
+                self.generator.configure(bist_base(i + loop, random), length)
+            # start write
+            self.generator.start()
+            # prepare next read
+            self.checker.configure(bist_base(i + loop, random), length)
+            # wait write
+            self.generator.wait()
+            wr_ticks += self.generator.ticks()
+            # start read
+            self.checker.start()
+            if i != 127:
+                # prepare next write
+                self.generator.configure(bist_base(i + 1 + loop, random), length)
+            # wait read
+            self.checker.wait()
+            rd_ticks += self.checker.ticks()
+            errors += self.checker.errors()
+        return 128*length, wr_ticks, rd_ticks, errors
+
+    def speed(self, length, ticks):
+        return bandwidth_mbps(length, ticks, self.clk_freq)
+
+    def run(self, burst_length, random, loops=1):
+        length = 0
+        wr_ticks = 0
+        rd_ticks = 0
+        errors = 0
+        start = time.time()
+        for i in range(loops):
+            r = self.loop(i, burst_length, random)
+            length += r[0]
+            wr_ticks += r[1]
+            rd_ticks += r[2]
+            errors += r[3]
+        return {
+            "burst_length": burst_length,
+            "random":       int(random),
+            "loops":        loops,
+            "tested_bytes": length,
+            "wr_mbps":      self.speed(length, wr_ticks),
+            "rd_mbps":      self.speed(length, rd_ticks),
+            "errors":       errors,
+            "duration":     time.time() - start,
+        }
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Host-driven SDRAM BIST")
+    add_bridge_args(parser)
+    parser.add_argument("--burst-lengths", default="16,32,64,128,256", help="comma separated burst lengths")
+    parser.add_argument("--addressing", default="linear,random", help="linear, random or both")
+    parser.add_argument("--loops", default=1, type=int, help="128-burst loops per point")
+    parser.add_argument("--sys-clk-freq", default=None, type=float, help="override the CSR map clock frequency")
+    parser.add_argument("--format", default="csv", choices=["csv", "json"], help="output format")
+    args = parser.parse_args()
+
+    wb = get_bridge(args)
+    wb.open()
+
+    clk_freq = args.sys_clk_freq
+    if clk_freq is None:
+        clk_freq = wb.constants.system_clock_frequency
+    bist = SDRAMBIST(wb, clk_freq)
+
+    results = []
+    for addressing in args.addressing.split(","):
+        for burst_length in [int(n) for n in args.burst_lengths.split(",")]:
+            results.append(bist.run(burst_length, addressing == "random", args.loops))
+            r = results[-1]
+            print("burst_length={:4d} random={:d} WR_SPEED(Mbps)={:.1f} RD_SPEED(Mbps)={:.1f} ERRORS={:d}".format(
+                r["burst_length"], r["random"], r["wr_mbps"], r["rd_mbps"], r["errors"]), file=sys.stderr)
+
+    if args.format == "json":
+        print(json.dumps(results, indent=4))
+    else:
+        keys = list(results[0].keys())
+        print(",".join(keys))
+        for r in results:
+            print(",".join(str(r[k]) for k in keys))
+
+    wb.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import argparse
+
+import numpy as np
+
+from bulk import bulk_read
+from bist import SDRAMBIST
+from bridge import add_bridge_args, get_bridge
+
+# Runs the host-driven BIST with the checker error capture of the bist_test SoC cleared, then
+# drains the captured mismatches (address, expected, actual) in bulk and maps them on the
+# bank/row/column and DQ bits.
+
+# Drain --------------------------------------------------------------------------------------------
+
+def drain_errors(wb):
+    depth = wb.constants.sdram_errors_depth
+    stride = wb.constants.sdram_errors_stride
+    dw = wb.constants.sdram_errors_data_width
+    dwords = (dw + 31)//32
+    count = wb.regs.sdram_errors_count.read()
+    n = min(count, depth)
+    words = bulk_read(wb, wb.mems.sdram_errors.base, n*stride).reshape(n, stride)
+    return {
+        "count":    count,
+        "address":  words[:, 0],
+        "expected": words[:, 1:1+dwords],
+        "actual":   words[:, 1+dwords:1+2*dwords],
+        "width":    dw,
+    }
+
+# Analysis -----------------------------------------------------------------------------------------
+
+def split_address(address, rowbits, colbits, bankbits, burst_length):
+    # ROW_BANK_COL mapping of the crossbar: one port word is a full burst
+    cshift = int(np.log2(burst_length))
+    address = address.astype(np.int64)
+    col = (address & (2**(colbits - cshift) - 1)) << cshift
+    bank = (address >> (colbits - cshift)) & (2**bankbits - 1)
+    row = address >> (colbits - cshift + bankbits)
+    return bank, row, col
+
+def error_bits(errors):
+    # (mismatches, width) array of the failing bits, bit i of a port word is DQ i % dqs of beat i//dqs
+    xor = np.ascontiguousarray(errors["expected"] ^ errors["actual"])
+    bits = np.unpackbits(xor.view(np.uint8), axis=1, bitorder="little")
+    return bits[:, :errors["width"]]
+
+def analyze(errors, rowbits, colbits, bankbits, burst_length, dqs, row_buckets=16, col_buckets=16):
+    bank, row, col = split_address(errors["address"], rowbits, colbits, bankbits, burst_length)
+    bank_row = np.zeros((2**bankbits, row_buckets), dtype=int)
+    bank_col = np.zeros((2**bankbits, col_buckets), dtype=int)
+    np.add.at(bank_row, (bank, row*row_buckets >> rowbits), 1)
+    np.add.at(bank_col, (bank, col*col_buckets >> colbits), 1)
+    bits = error_bits(errors).reshape(len(bank), -1, dqs)
+    return {
+        "count":    int(errors["count"]),
+        "captured": len(bank),
+        # records without a failing bit: the capture is out of step with the checker
+        "invalid":  int((bits.sum(axis=(1, 2)) == 0).sum()),
+        "bank_row": bank_row,
+        "bank_col": bank_col,
+        "dq":       bits.sum(axis=(0, 1)),
+        "beat":     bits.sum(axis=(0, 2)),
+        "records":  [{"bank": int(b), "row": int(r), "col": int(c),
+                      "expected": [int(w) for w in e], "actual": [int(w) for w in a]}
+                     for b, r, c, e, a in zip(bank, row, col, errors["expected"], errors["actual"])],
+    }
+
+# Report -------------------------------------------------------------------------------------------
+
+SHADES = " .:-=+*#%@"
+
+def print_heatmap(title, grid, xlabel):
+    print("{} ({} buckets)".format(title, xlabel))
+    peak = max(grid.max(), 1)
+    for n, line in enumerate(grid):
+        print("  bank {:d} |{}| {:d}".format(n,
+            "".join(SHADES[(len(SHADES) - 1)*v//peak if v else 0] for v in line), line.sum()))
+
+def print_bars(title, label, counts, width=40):
+    print(title)
+    peak = max(counts.max(), 1)
+    for n, v in enumerate(counts):
+        print("  {}{:<3d} {:6d} {}".format(label, n, v, "#"*(width*v//peak)))
+
+def report(r):
+    print("{:d} mismatches, {:d} captured".format(r["count"], r["captured"]))
+    if not r["captured"]:
+        return
+    if r["invalid"]:
+        print("warning: {:d} records have no failing bit, the capture does not match the checker".format(
+            r["invalid"]))
+    print_heatmap("bank x row", r["bank_row"], "row")
+    print_heatmap("bank x column", r["bank_col"], "column")
+    print_bars("per DQ bit", "DQ", r["dq"])
+    print_bars("per beat", "beat", r["beat"])
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="SDRAM BIST error capture and heatmaps")
+    add_bridge_args(parser)
+    parser.add_argument("--burst-length", default=128, type=int, help="BIST burst length")
+    parser.add_argument("--addressing", default="random", choices=["linear", "random"])
+    parser.add_argument("--loops", default=1, type=int, help="128-burst loops")
+    parser.add_argument("--no-run", action="store_true", help="only drain the errors of the last run")
+    parser.add_argument("--rowbits", default=13, type=int, help="MT41K64M16 geometry")
+    parser.add_argument("--colbits", default=10, type=int)
+    parser.add_argument("--bankbits", default=3, type=int)
+    parser.add_argument("--dram-burst-length", default=8, type=int)
+    parser.add_argument("--dqs", default=16, type=int, help="DQ bits")
+    parser.add_argument("--json", default=None, help="also write the results to a JSON file")
+    args = parser.parse_args()
+
+    wb = get_bridge(args)
+    wb.open()
+
+    if not args.no_run:
+        wb.regs.sdram_errors_clear.write(1)
+        bist = SDRAMBIST(wb, wb.constants.system_clock_frequency)
+        r = bist.run(args.burst_length, args.addressing == "random", args.loops)
+        print("tested {:d} bytes, {:d} errors".format(r["tested_bytes"], r["errors"]), file=sys.stderr)
+
+    r = analyze(drain_errors(wb), args.rowbits, args.colbits, args.bankbits,
+        args.dram_burst_length, args.dqs)
+    report(r)
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump({k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in r.items()}, f, indent=4)
+
+    wb.close()
+
+if __name__ == "__main__":
+    main()
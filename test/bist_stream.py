@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import argparse
+
+import numpy as np
+
+# Receiver for the binary records of the firmware sdram_bist_stream command (firmware/sdram_bist.c):
+# decodes the UART stream (or a recorded file) with NumPy and prints rolling bandwidth/errors until
+# the end record sent when the firmware stops.
+
+# Records ------------------------------------------------------------------------------------------
+
+RECORD_SYNC   = 0x54534942 # "BIST"
+RECORD_HEADER = 0xffffffff
+RECORD_END    = 0xfffffffe
+
+record_dtype = np.dtype([
+    ("sync",     "<u4"),
+    ("loop",     "<u4"),
+    ("wr_ticks", "<u8"),
+    ("rd_ticks", "<u8"),
+    ("length",   "<u8"),
+    ("errors",   "<u4"),
+    ("checksum", "<u4"),
+])
+
+def checksum(words):
+    # sum of the 32-bit words before the checksum, words: (n, 10) uint32
+    return words[:, :9].sum(axis=1, dtype=np.uint64).astype(np.uint32)
+
+def decode(data):
+    # returns (records, consumed bytes): records are found at every sync word with a valid
+    # checksum, text and damaged records in between are skipped
+    buf = np.frombuffer(data, dtype=np.uint8)
+    size = record_dtype.itemsize
+    if len(buf) < size:
+        return np.zeros(0, dtype=record_dtype), 0
+    sync = np.frombuffer(np.uint32(RECORD_SYNC).tobytes(), dtype=np.uint8)
+    candidates = np.flatnonzero(
+        (buf[:-3] == sync[0]) & (buf[1:-2] == sync[1]) & (buf[2:-1] == sync[2]) & (buf[3:] == sync[3]))
+    complete = candidates[candidates + size <= len(buf)]
+    rows = np.stack([buf[c:c + size] for c in complete]) if len(complete) else np.zeros((0, size), np.uint8)
+    words = rows.view("<u4").reshape(-1, size//4)
+    valid = checksum(words) == words[:, 9]
+    # overlapping matches (sync bytes inside a valid record) are dropped
+    keep = []
+    end = 0
+    for c, v in zip(complete, valid):
+        if v and c >= end:
+            keep.append(c)
+            end = c + size
+    records = np.frombuffer(b"".join(buf[c:c + size].tobytes() for c in keep), dtype=record_dtype)
+    # keep the tail that may hold a partial record
+    incomplete = candidates[candidates + size > len(buf)]
+    consumed = max(end, len(buf) - 3) if not len(incomplete) else max(end, int(incomplete[0]))
+    return records, consumed
+
+def encode(records):
+    # records: list of (loop, wr_ticks, rd_ticks, length, errors), for recorded-stream tests
+    raw = np.zeros(len(records), dtype=record_dtype)
+    raw["sync"] = RECORD_SYNC
+    for i, name in enumerate(["loop", "wr_ticks", "rd_ticks", "length", "errors"]):
+        raw[name] = [r[i] for r in records]
+    raw["checksum"] = checksum(raw.view("<u4").reshape(-1, 10))
+    return raw.tobytes()
+
+# Statistics ---------------------------------------------------------------------------------------
+
+class Stats:
+    def __init__(self, clk_freq=None, window=10):
+        self.clk_freq = clk_freq
+        self.window = window
+        self.records = np.zeros(0, dtype=record_dtype)
+        self.total_length = 0
+        self.total_errors = 0
+        self.ended = False
+
+    def add(self, records):
+        header = records[records["loop"] == RECORD_HEADER]
+        if len(header):
+            if self.clk_freq is None:
+                self.clk_freq = int(header["wr_ticks"][-1])
+            print("burst_length={:d} random={:d} clk={:.1f}MHz".format(int(header["rd_ticks"][-1]),
+                int(header["length"][-1]), self.clk_freq/1e6), file=sys.stderr)
+        end = records[records["loop"] == RECORD_END]
+        if len(end):
+            # totals of the firmware: loops run, bytes tested and errors of all the records sent
+            self.ended = True
+            print("end of stream: {:d} loops, {:.1f}MB tested, {:d} errors".format(int(end["wr_ticks"][-1]),
+                int(end["length"][-1])/(1024*1024), int(end["errors"][-1])), file=sys.stderr)
+        records = records[(records["loop"] != RECORD_HEADER) & (records["loop"] != RECORD_END)]
+        self.records = np.concatenate([self.records, records])[-self.window:]
+        self.total_length += int(records["length"].sum())
+        self.total_errors += int(records["errors"].sum())
+        return records
+
+    def rolling(self):
+        r = self.records
+        length = float(r["length"].sum())
+        return {
+            "loop":       int(r["loop"][-1]),
+            "wr_mbps":    8*length*self.clk_freq/(1e6*max(float(r["wr_ticks"].sum()), 1)),
+            "rd_mbps":    8*length*self.clk_freq/(1e6*max(float(r["rd_ticks"].sum()), 1)),
+            "errors":     int(r["errors"].sum()),
+            "tested_mb":  self.total_length/(1024*1024),
+            "total_errors": self.total_errors,
+        }
+
+# Sources ------------------------------------------------------------------------------------------
+
+def file_source(filename, chunk=4096):
+    with open(filename, "rb") as f:
+        while True:
+            data = f.read(chunk)
+            if not data:
+                return
+            yield data
+
+def serial_source(port, baudrate, command, record=None):
+    import serial
+    uart = serial.Serial(port, baudrate, timeout=0.1)
+    uart.write(command.encode() + b"\n")
+    f = open(record, "wb") if record is not None else None
+    try:
+        while True:
+            data = uart.read(4096)
+            if f is not None:
+                f.write(data)
+            yield data
+    finally:
+        # any key stops the firmware loop
+        uart.write(b"\n")
+        uart.close()
+        if f is not None:
+            f.close()
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Binary SDRAM BIST telemetry receiver")
+    parser.add_argument("--port", default=None, help="firmware UART (e.g. /dev/ttyUSB1)")
+    parser.add_argument("--baudrate", default=115200, type=int)
+    parser.add_argument("--burst-length", default=128, type=int)
+    parser.add_argument("--random", action="store_true", help="random addressing")
+    parser.add_argument("--period", default=10, type=int, help="BIST loops per record")
+    parser.add_argument("--record", default=None, help="also record the raw stream to this file")
+    parser.add_argument("--file", default=None, help="decode a recorded stream instead of the UART")
+    parser.add_argument("--sys-clk-freq", default=None, type=float, help="override the header clock frequency")
+    parser.add_argument("--window", default=10, type=int, help="records in the rolling statistics")
+    parser.add_argument("--duration", default=None, type=float, help="stop after this many seconds")
+    args = parser.parse_args()
+
+    if args.file is not None:
+        source = file_source(args.file)
+    elif args.port is not None:
+        command = "sdram_bist_stream {:d} {:d} {:d}".format(args.burst_length, int(args.random), args.period)
+        source = serial_source(args.port, args.baudrate, command, args.record)
+    else:
+        print("--port or --file required")
+        exit(1)
+
+    stats = Stats(None if args.sys_clk_freq is None else int(args.sys_clk_freq), args.window)
+    print("{:>10s} {:>14s} {:>14s} {:>8s} {:>12s} {:>12s}".format(
+        "loop", "WR_SPEED(Mbps)", "RD_SPEED(Mbps)", "ERRORS", "TESTED(MB)", "TOTAL_ERRORS"))
+    buf = b""
+    start = time.time()
+    try:
+        for data in source:
+            buf += data
+            records, consumed = decode(buf)
+            buf = buf[consumed:]
+            if len(stats.add(records)) and stats.clk_freq is not None:
+                r = stats.rolling()
+                print("{:10d} {:14.1f} {:14.1f} {:8d} {:12.1f} {:12d}".format(r["loop"], r["wr_mbps"],
+                    r["rd_mbps"], r["errors"], r["tested_mb"], r["total_errors"]))
+            if stats.ended:
+                break
+            if args.duration is not None and time.time() - start > args.duration:
+                break
+    except KeyboardInterrupt:
+        pass
+    source.close()
+
+if __name__ == "__main__":
+    main()
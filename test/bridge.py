@@ -0,0 +1,196 @@
+import socket
+
+from bulk import bulk_read, write_read_packets
+from csr_fast import FastCSRBuilder
+from async_client import PipelinedRemoteClient
+from bridge_args import add_bridge_args, get_board_name
+
+from litex import RemoteClient
+from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord
+from litex.tools.remote.etherbone import EtherboneReads, EtherboneWrites
+
+# Etherbone UDP ------------------------------------------------------------------------------------
+
+# Direct Etherbone client for the EtherboneTestSoC (no litex_server in between). The gateware
+# answers on its own UDP port, so the client listens on the same port number by default.
+
+class EtherboneUDP(FastCSRBuilder):
+    def __init__(self, ip="192.168.1.50", port=1234, local_port=None, csr_csv="csr.csv",
+                 csr_data_width=None, debug=False, timeout=1.0, retries=3):
+        FastCSRBuilder.__init__(self, self, csr_csv, csr_data_width)
+        self.ip = ip
+        self.port = port
+        self.local_port = port if local_port is None else local_port
+        self.debug = debug
+        self.timeout = timeout
+        self.retries = retries
+
+    def open(self):
+        if hasattr(self, "socket"):
+            return
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # several clients (one per board) can share the local port: replies are demultiplexed
+        # on the board address by connecting the socket
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.socket.bind(("", self.local_port))
+        self.socket.connect((self.ip, self.port))
+        self.socket.settimeout(self.timeout)
+
+    def close(self):
+        if not hasattr(self, "socket"):
+            return
+        self.socket.close()
+        del self.socket
+
+    def drain(self):
+        # drops the late replies of a timed out exchange
+        self.socket.settimeout(self.timeout/10)
+        try:
+            while True:
+                self.socket.recv(8192)
+        except socket.timeout:
+            pass
+        finally:
+            self.socket.settimeout(self.timeout)
+
+    def transact(self, packets, nreplies):
+        # sends the packets and returns the read datas of the nreplies replies; a lost request or
+        # reply times out: the exchange is sent again (reads, strobes then reads) up to retries times
+        for attempt in range(self.retries + 1):
+            try:
+                for packet in packets:
+                    self.socket.send(packet.bytes)
+                replies = []
+                for i in range(nreplies):
+                    packet = EtherbonePacket(self.socket.recv(8192))
+                    packet.decode()
+                    replies.append(packet.records.pop().writes.get_datas())
+                return replies
+            except socket.timeout:
+                self.drain()
+        raise IOError("No Etherbone reply from {}:{} after {} retries".format(self.ip, self.port, self.retries))
+
+    def read(self, addr, length=None):
+        length_int = 1 if length is None else length
+        datas = self.read_addrs([addr + 4*j for j in range(length_int)])
+        return datas[0] if length is None else datas
+
+    def read_addrs(self, addrs):
+        record = EtherboneRecord()
+        record.reads = EtherboneReads(addrs=addrs)
+        record.rcount = len(record.reads)
+
+        packet = EtherbonePacket()
+        packet.records = [record]
+        packet.encode()
+        datas = self.transact([packet], 1)[0]
+        if self.debug:
+            for addr, data in zip(addrs, datas):
+                print("read 0x{:08x} @ 0x{:08x}".format(data, addr))
+        return datas
+
+    def write_reads(self, records, window=16):
+        # records: list of (addr, datas, addrs) sent as write and read packets, window of them in
+        # flight: the core answers in order
+        results = []
+        for i in range(0, len(records), window):
+            chunk = records[i:i+window]
+            packets = [packet for addr, datas, addrs in chunk
+                for packet in write_read_packets(0, addr, datas, addrs)]
+            results += self.transact(packets, len(chunk))
+        return results
+
+    def write(self, addr, datas):
+        datas = datas if isinstance(datas, list) else [datas]
+        record = EtherboneRecord()
+        record.writes = EtherboneWrites(base_addr=addr, datas=datas)
+        record.wcount = len(record.writes)
+
+        packet = EtherbonePacket()
+        packet.records = [record]
+        packet.encode()
+        self.socket.send(packet.bytes)
+        if self.debug:
+            for i, data in enumerate(datas):
+                print("write 0x{:08x} @ 0x{:08x}".format(data, addr + 4*i))
+
+# Batch Remote Client ------------------------------------------------------------------------------
+
+# litex.RemoteClient (litex_server over TCP) with the batched transfers of bulk.py. Written against the
+# RemoteClient of litex mid-2019: EtherboneIPC + CSRBuilder, the socket made by open() and
+# send_packet/receive_packet(socket), no banner from the server. Only this class touches them.
+# litex_server handles the packets in order and does not acknowledge writes, so a batch is handed to
+# the socket at once and only the read replies are waited for.
+
+class BatchRemoteClient(FastCSRBuilder, RemoteClient):
+    def __init__(self, host="localhost", port=1234, base_address=0, csr_csv="csr.csv",
+                 csr_data_width=None, debug=False):
+        RemoteClient.__init__(self, host, port, base_address, csr_csv=None, debug=debug)
+        FastCSRBuilder.__init__(self, self, csr_csv, csr_data_width)
+
+    def receive_datas(self):
+        packet = EtherbonePacket(self.receive_packet(self.socket))
+        packet.decode()
+        return packet.records.pop().writes.get_datas()
+
+    def read_addrs(self, addrs):
+        record = EtherboneRecord()
+        record.reads = EtherboneReads(addrs=[self.base_address + addr for addr in addrs])
+        record.rcount = len(record.reads)
+
+        packet = EtherbonePacket()
+        packet.records = [record]
+        packet.encode()
+        self.send_packet(self.socket, packet)
+        return self.receive_datas()
+
+    def gather_writes(self, writes):
+        # writes: list of (addr, datas) records
+        data = bytearray()
+        for addr, datas in writes:
+            record = EtherboneRecord()
+            record.writes = EtherboneWrites(base_addr=self.base_address + addr, datas=list(datas))
+            record.wcount = len(record.writes)
+            packet = EtherbonePacket()
+            packet.records = [record]
+            packet.encode()
+            data += packet.bytes
+        self.socket.sendall(data)
+
+    def write_reads(self, records, window=64):
+        # records: list of (addr, datas, addrs), window of them handed to the socket at once, then
+        # their replies
+        results = []
+        for i in range(0, len(records), window):
+            chunk = records[i:i+window]
+            data = bytearray()
+            for addr, datas, addrs in chunk:
+                for packet in write_read_packets(self.base_address, addr, datas, addrs):
+                    data += packet.bytes
+            self.socket.sendall(data)
+            results += [self.receive_datas() for record in chunk]
+        return results
+
+# Transport selection ------------------------------------------------------------------------------
+
+def get_bridge(args, debug=False):
+    # the CSR map comes from the generated module of csr_fast.py instead of CSRBuilder
+    if args.transport == "udp":
+        return EtherboneUDP(args.ip, args.port, csr_csv=args.csr_csv, debug=debug)
+    elif args.window:
+        return PipelinedRemoteClient(args.host, args.port, csr_csv=args.csr_csv, window=args.window, debug=debug)
+    return BatchRemoteClient(args.host, args.port, csr_csv=args.csr_csv, debug=debug)
+
+# Identifier ---------------------------------------------------------------------------------------
+
+def get_identifier(wb):
+    fpga_id = ""
+    for i in range(0, 256, 32):
+        for data in bulk_read(wb, wb.bases.identifier_mem + 4*i, 32):
+            c = chr(data & 0xff)
+            if c == "\0":
+                return fpga_id
+            fpga_id += c
+    return fpga_id
@@ -0,0 +1,23 @@
+# Bridge arguments ---------------------------------------------------------------------------------
+
+# Command line options of the bridge (bridge.py), kept free of litex imports so that scripts that
+# only sometimes open the bridge (load_fpga.py) start without it.
+
+def add_bridge_args(parser):
+    parser.add_argument("--transport", default="uart", choices=["uart", "udp"],
+        help="uart: litex_server on --host:--port, udp: Etherbone to the board at --ip")
+    parser.add_argument("--host", default="localhost", help="litex_server host")
+    parser.add_argument("--port", default=1234, type=int, help="litex_server/Etherbone port")
+    parser.add_argument("--ip", default="192.168.1.50", help="board IP address")
+    parser.add_argument("--csr-csv", default="csr.csv", help="CSR map of the loaded bitstream")
+    parser.add_argument("--board", default=None, help="board name (default: bridge endpoint)")
+    parser.add_argument("--window", default=0, type=int,
+        help="uart: reads kept in flight by the pipelined client (0: synchronous RemoteClient)")
+
+def get_board_name(args):
+    if args.board is not None:
+        return args.board
+    elif args.transport == "udp":
+        return args.ip
+    else:
+        return "{}:{}".format(args.host, args.port)
@@ -0,0 +1,111 @@
+import numpy as np
+
+from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord
+from litex.tools.remote.etherbone import EtherboneReads, EtherboneWrites
+
+# Patterns -----------------------------------------------------------------------------------------
+
+def seed_to_data(seed, random=True):
+    seed = np.asarray(seed, dtype=np.uint32)
+    if random:
+        return seed*np.uint32(1664525) + np.uint32(1013904223)
+    else:
+        return seed
+
+# Bulk transfers -----------------------------------------------------------------------------------
+
+# Etherbone records carry 8-bit write/read counts, so a single transaction moves at most 255 words.
+MAX_BURST = 255
+
+# Clients with gather/gather_writes (async_client.PipelinedRemoteClient) get all the records of a
+# transfer at once and keep several of them in flight, bridge.BatchRemoteClient hands them to the
+# socket at once. Other clients go through their read/write.
+
+def send_writes(wb, writes):
+    # writes: list of (addr, datas) records
+    if hasattr(wb, "gather_writes"):
+        wb.gather_writes(writes)
+    else:
+        for addr, datas in writes:
+            wb.write(addr, datas)
+
+def bulk_write(wb, addr, datas):
+    datas = np.asarray(datas, dtype=np.uint32).tolist()
+    send_writes(wb, [(addr + 4*i, datas[i:i+MAX_BURST]) for i in range(0, len(datas), MAX_BURST)])
+
+def bulk_read(wb, addr, length):
+    if hasattr(wb, "gather"):
+        return read_addrs(wb, [addr + 4*i for i in range(length)])
+    datas = np.empty(length, dtype=np.uint32)
+    for i in range(0, length, MAX_BURST):
+        n = min(MAX_BURST, length - i)
+        datas[i:i+n] = wb.read(addr + 4*i, length=n)
+    return datas
+
+def read_addrs(wb, addrs):
+    # reads an arbitrary address list (repeated FIFO registers, scattered CSRs) with one record per
+    # MAX_BURST addresses instead of one transaction per address
+    if hasattr(wb, "gather"):
+        chunks = wb.gather([list(addrs[i:i+MAX_BURST]) for i in range(0, len(addrs), MAX_BURST)])
+        return np.array([data for chunk in chunks for data in chunk], dtype=np.uint32)
+    datas = np.empty(len(addrs), dtype=np.uint32)
+    for i in range(0, len(addrs), MAX_BURST):
+        chunk = list(addrs[i:i+MAX_BURST])
+        if hasattr(wb, "read_addrs"):
+            datas[i:i+len(chunk)] = wb.read_addrs(chunk)
+        else:
+            datas[i:i+len(chunk)] = [wb.read(addr) for addr in chunk]
+    return datas
+
+def write_reads(wb, records):
+    # records: list of (addr, datas, addrs), a write then reads of which the reads must see the
+    # effect (strobe then sample). Sent as a write packet and a read packet back to back (litex_server
+    # frames a record as writes or reads, not both), handled in order by the server or the core.
+    # Returns the datas read by each record.
+    if hasattr(wb, "write_reads"):
+        return wb.write_reads(records)
+    results = []
+    for addr, datas, addrs in records:
+        wb.write(addr, datas)
+        results.append(read_addrs(wb, addrs))
+    return results
+
+def write_read_packets(base_address, addr, datas, addrs):
+    write = EtherboneRecord()
+    write.writes = EtherboneWrites(base_addr=base_address + addr, datas=list(datas))
+    write.wcount = len(write.writes)
+    read = EtherboneRecord()
+    read.reads = EtherboneReads(addrs=[base_address + a for a in addrs])
+    read.rcount = len(read.reads)
+    packets = []
+    for record in [write, read]:
+        packet = EtherbonePacket()
+        packet.records = [record]
+        packet.encode()
+        packets.append(packet)
+    return packets
+
+# Compare ------------------------------------------------------------------------------------------
+
+def compare(base, datas, expected):
+    # returns the addresses of the mismatching words and the number of errors seen on each byte lane
+    errors = np.flatnonzero(datas != expected)
+    xor = datas[errors] ^ expected[errors]
+    lanes = np.array([np.count_nonzero((xor >> (8*i)) & 0xff) for i in range(4)])
+    return base + 4*errors, lanes
+
+# Pattern test -------------------------------------------------------------------------------------
+
+def write_pattern(wb, base, length):
+    bulk_write(wb, base, seed_to_data(np.arange(length)))
+
+def check_pattern(wb, base, length, debug=False):
+    datas = bulk_read(wb, base, length)
+    expected = seed_to_data(np.arange(length))
+    addresses, lanes = compare(base, datas, expected)
+    if debug:
+        for i in range(length):
+            print("{}: 0x{:08x}, 0x{:08x} {}".format(i, datas[i], expected[i],
+                "OK" if datas[i] == expected[i] else "KO"))
+        print("byte lane errors: " + " ".join("{:d}".format(n) for n in lanes))
+    return len(addresses)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+import sys
+import argparse
+
+import numpy as np
+
+from bulk import read_addrs
+from bridge import add_bridge_args, get_bridge
+
+from litescope.software.driver.analyzer import LiteScopeAnalyzerDriver
+
+# Decode -------------------------------------------------------------------------------------------
+
+def extract(words, offset, width):
+    # words: (samples, n) uint32 array, least significant word first
+    if width > 32:
+        lo = extract(words, offset, 32)
+        hi = extract(words, offset + 32, width - 32)
+        return lo | (hi << np.uint64(32))
+    i, shift = divmod(offset, 32)
+    value = words[:, i].astype(np.uint64)
+    if i + 1 < words.shape[1]:
+        value |= words[:, i + 1].astype(np.uint64) << np.uint64(32)
+    return (value >> np.uint64(shift)) & np.uint64(2**width - 1)
+
+def decode(words, layout):
+    signals = {}
+    offset = 0
+    for name, width in layout:
+        signals[name] = extract(words, offset, width)
+        offset += width
+    return signals
+
+# Upload -------------------------------------------------------------------------------------------
+
+def upload(wb, analyzer):
+    # mem_data is read once per sample, the storage FIFO advances on each read: the reads of the
+    # whole level go out as repeated addresses in MAX_BURST records.
+    nwords = (analyzer.data_width + 31)//32
+    level = analyzer.storage_mem_level.read()
+    addrs = [analyzer.storage_mem_data.addr + 4*k for k in range(nwords)]*level
+    words = read_addrs(wb, addrs).reshape(level, nwords)
+    # CSRs wider than the bus are laid out most significant word first
+    return words[:, ::-1]
+
+# Writers ------------------------------------------------------------------------------------------
+
+class VCDWriter:
+    # captures are appended one after the other, separated by a gap of one capture length
+    def __init__(self, filename, layout, samplerate):
+        self.f = open(filename, "w")
+        self.layout = layout
+        self.period = int(round(1e12/samplerate))
+        self.time = 0
+        self.codes = [self.code(i) for i in range(len(layout) + 1)]
+        self.f.write("$timescale 1ps $end\n")
+        self.f.write("$scope module analyzer $end\n")
+        self.f.write("$var wire 32 {} capture $end\n".format(self.codes[0]))
+        for (name, width), code in zip(layout, self.codes[1:]):
+            self.f.write("$var wire {} {} {} $end\n".format(width, code, name))
+        self.f.write("$upscope $end\n")
+        self.f.write("$enddefinitions $end\n")
+
+    @staticmethod
+    def code(n):
+        code = ""
+        while True:
+            code += chr(33 + n % 94)
+            n //= 94
+            if n == 0:
+                return code
+
+    def write(self, n, signals):
+        length = len(next(iter(signals.values())))
+        times = [np.array([0])]
+        indexes = [np.array([0])]
+        values = [np.array([n], dtype=np.uint64)]
+        for i, (name, width) in enumerate(self.layout):
+            v = signals[name]
+            changes = np.concatenate(([0], np.flatnonzero(np.diff(v)) + 1))
+            times.append(changes)
+            indexes.append(np.full(len(changes), i + 1))
+            values.append(v[changes])
+        times = np.concatenate(times)
+        indexes = np.concatenate(indexes)
+        values = np.concatenate(values)
+        order = np.argsort(times, kind="stable")
+        last = None
+        lines = []
+        for t, i, v in zip(times[order], indexes[order], values[order]):
+            if t != last:
+                lines.append("#{:d}".format(self.time + int(t)*self.period))
+                last = t
+            width = 32 if i == 0 else self.layout[i - 1][1]
+            if width == 1:
+                lines.append("{:d}{}".format(int(v), self.codes[i]))
+            else:
+                lines.append("b{:b} {}".format(int(v), self.codes[i]))
+        self.f.write("\n".join(lines) + "\n")
+        self.f.flush()
+        self.time += 2*length*self.period
+
+    def close(self):
+        self.f.write("#{:d}\n".format(self.time))
+        self.f.close()
+
+class CSVWriter:
+    def __init__(self, filename, layout, samplerate):
+        self.f = open(filename, "w")
+        self.layout = layout
+        self.f.write(",".join(["capture", "sample"] + [name for name, width in layout]) + "\n")
+
+    def write(self, n, signals):
+        length = len(next(iter(signals.values())))
+        columns = [np.full(length, n, dtype=np.uint64), np.arange(length, dtype=np.uint64)]
+        columns += [signals[name] for name, width in self.layout]
+        np.savetxt(self.f, np.column_stack(columns), fmt="%d", delimiter=",")
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+writers = {
+    "vcd": VCDWriter,
+    "csv": CSVWriter,
+}
+
+# Capture ------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Repeated LiteScope captures streamed to VCD/CSV")
+    add_bridge_args(parser)
+    parser.add_argument("--analyzer-csv", default="analyzer.csv", help="analyzer layout of the loaded bitstream")
+    parser.add_argument("--trigger", action="append", default=[],
+        help="trigger condition signal=value (0x/0b values may contain x), repeat to AND conditions")
+    parser.add_argument("--offset", default=32, type=int, help="samples kept before the trigger")
+    parser.add_argument("--length", default=None, type=int, help="samples per capture (default: depth)")
+    parser.add_argument("--captures", default=1, type=int, help="number of captures (0: until interrupted)")
+    parser.add_argument("--samplerate", default=None, type=float, help="sample rate (default: system clock)")
+    parser.add_argument("--output", default="dump.vcd", help="output file (.vcd or .csv)")
+    args = parser.parse_args()
+
+    ext = args.output.rsplit(".", 1)[-1]
+    if ext not in writers:
+        print("unsupported output format .{}, supported: ({})".format(ext, ", ".join(writers.keys())))
+        exit(1)
+
+    wb = get_bridge(args)
+    wb.open()
+
+    analyzer = LiteScopeAnalyzerDriver(wb.regs, "analyzer", config_csv=args.analyzer_csv)
+    cond = dict(t.split("=", 1) for t in args.trigger)
+    if not cond:
+        cond = {"ecp5ddrphy_dfi_p0_rddata_valid": "1"}
+    samplerate = args.samplerate or wb.constants.system_clock_frequency
+    layout = analyzer.layouts[0]
+    writer = writers[ext](args.output, layout, samplerate)
+
+    n = 0
+    try:
+        while args.captures == 0 or n < args.captures:
+            analyzer.clear()
+            analyzer.configure_trigger(cond=cond)
+            analyzer.run(offset=args.offset, length=args.length)
+            analyzer.wait_done()
+            writer.write(n, decode(upload(wb, analyzer), layout))
+            n += 1
+            sys.stderr.write("capture {:d}\r".format(n))
+    except KeyboardInterrupt:
+        pass
+    sys.stderr.write("\n{:d} captures written to {}\n".format(n, args.output))
+    writer.close()
+
+    wb.close()
+
+if __name__ == "__main__":
+    main()
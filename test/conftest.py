@@ -0,0 +1,9 @@
+import os
+import sys
+
+# the tools at the top of the repository (netboot.py...) are tested from here too
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pytest: the other test_*.py scripts of this directory (test_sdram.py...) drive a board through the
+# bridge, they are not unit tests.
+collect_ignore = ["test_sdram.py", "test_analyzer.py", "test_identifier.py"]
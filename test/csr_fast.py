@@ -0,0 +1,203 @@
+import os
+import sys
+import csv
+import functools
+import py_compile
+import importlib.util
+
+from bulk import read_addrs
+
+from litex.tools.remote.csr_builder import CSRElements, CSRMemoryRegion
+
+# Fast CSR access ----------------------------------------------------------------------------------
+
+# csr.csv is turned into a Python module (csr_map.py next to it, written by versa_ecp5.py builds and
+# regenerated here when missing or older than the csv): the map as literals, flat address constants
+# and read/write functions specialised per register size (word split of csr_data_width unrolled).
+# The module is byte-compiled when written, so loading it skips the csv parsing and CSRBuilder.
+
+def parse_csr_csv(filename, csr_data_width=None):
+    csr_map = {"bases": {}, "regs": {}, "constants": {}, "mems": {}}
+    with open(filename) as f:
+        for row in csv.reader(l for l in f if not l.startswith("#")):
+            row += [""]*(5 - len(row))
+            group, name = row[0], row[1]
+            if group == "csr_base":
+                csr_map["bases"][name] = int(row[2], 16)
+            elif group == "csr_register":
+                csr_map["regs"][name] = (int(row[2], 16), int(row[3]), row[4])
+            elif group == "constant":
+                try:
+                    csr_map["constants"][name] = int(row[2])
+                except ValueError:
+                    csr_map["constants"][name] = row[2]
+            elif group == "memory_region":
+                csr_map["mems"][name] = (int(row[2], 16), int(row[3]), row[4])
+    if csr_data_width is None:
+        csr_data_width = csr_map["constants"].get("config_csr_data_width",
+            csr_map["constants"].get("csr_data_width", 8))
+    csr_map["csr_data_width"] = csr_data_width
+    return csr_map
+
+def module_filename(csr_csv):
+    return os.path.splitext(csr_csv)[0] + "_map.py"
+
+def generate(csr_map):
+    dw = csr_map["csr_data_width"]
+    mask = 2**dw - 1
+    lengths = sorted(set(length for addr, length, mode in csr_map["regs"].values()))
+    lines = [
+        "# Generated from csr.csv by test/csr_fast.py, do not edit.",
+        "",
+        "csr_data_width = {:d}".format(dw),
+        "",
+    ]
+    lines.append("bases = {")
+    lines += ["    {!r}: 0x{:08x},".format(n, a) for n, a in sorted(csr_map["bases"].items())]
+    lines.append("}")
+    lines.append("constants = {")
+    lines += ["    {!r}: {!r},".format(n, v) for n, v in sorted(csr_map["constants"].items())]
+    lines.append("}")
+    lines.append("mems = {")
+    lines += ["    {!r}: (0x{:08x}, {:d}, {!r}),".format(n, *m) for n, m in sorted(csr_map["mems"].items())]
+    lines.append("}")
+    lines.append("# name: (address, words, mode)")
+    lines.append("regs = {")
+    lines += ["    {!r}: (0x{:08x}, {:d}, {!r}),".format(n, *r) for n, r in sorted(csr_map["regs"].items())]
+    lines.append("}")
+    lines.append("")
+    lines += ["{} = 0x{:08x}".format(n.upper(), r[0]) for n, r in sorted(csr_map["regs"].items())]
+
+    # one reader/writer per register size, words combined MSB first
+    for length in lengths:
+        lines.append("")
+        lines.append("def read_{:d}(wb, addr):".format(length))
+        if length == 1:
+            lines.append("    return wb.read(addr)")
+        else:
+            lines.append("    d = wb.read(addr, {:d})".format(length))
+            lines.append("    return " + " | ".join("(d[{:d}] << {:d})".format(i, dw*(length - 1 - i))
+                if i != length - 1 else "d[{:d}]".format(i) for i in range(length)))
+        lines.append("def write_{:d}(wb, addr, value):".format(length))
+        lines.append("    wb.write(addr, [{}])".format(", ".join(
+            "(value >> {:d}) & 0x{:x}".format(dw*(length - 1 - i), mask) if i != length - 1 else
+            "value & 0x{:x}".format(mask) for i in range(length))))
+    lines.append("")
+    lines.append("readers = {{{}}}".format(", ".join("{0:d}: read_{0:d}".format(n) for n in lengths)))
+    lines.append("writers = {{{}}}".format(", ".join("{0:d}: write_{0:d}".format(n) for n in lengths)))
+    lines += [
+        "",
+        "def __getattr__(name):",
+        "    # <register>_read(wb) / <register>_write(wb, value), made on first use",
+        "    reg, sep, kind = name.rpartition(\"_\")",
+        "    if reg not in regs or kind not in [\"read\", \"write\"]:",
+        "        raise AttributeError(name)",
+        "    addr, length, mode = regs[reg]",
+        "    if kind == \"read\":",
+        "        fn = lambda wb, f=readers[length], a=addr: f(wb, a)",
+        "    else:",
+        "        fn = lambda wb, value, f=writers[length], a=addr: f(wb, a, value)",
+        "    globals()[name] = fn",
+        "    return fn",
+    ]
+    return "\n".join(lines) + "\n"
+
+def write_module(csr_csv, filename=None, csr_data_width=None):
+    filename = module_filename(csr_csv) if filename is None else filename
+    with open(filename, "w") as f:
+        f.write(generate(parse_csr_csv(csr_csv, csr_data_width)))
+    # compiled now (__pycache__), whether or not the scripts may write bytecode
+    py_compile.compile(filename, doraise=True)
+    return filename
+
+_modules = {}
+
+def load(csr_csv):
+    # generated module of csr_csv, (re)generated when stale, cached per process
+    filename = module_filename(csr_csv)
+    if not os.path.exists(filename) or os.path.getmtime(filename) < os.path.getmtime(csr_csv):
+        write_module(csr_csv)
+    key = (os.path.abspath(filename), os.path.getmtime(filename))
+    if key not in _modules:
+        spec = importlib.util.spec_from_file_location("csr_map", filename)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[key] = module
+    return _modules[key]
+
+# Registers ----------------------------------------------------------------------------------------
+
+class FastRegister:
+    # same attributes as litex CSRRegister (CSRShadow, profilers), read/write bound to the
+    # generated functions
+    __slots__ = ["name", "addr", "length", "data_width", "mode", "read", "write"]
+
+    def __init__(self, wb, module, name, addr, length, mode):
+        self.name = name
+        self.addr = addr
+        self.length = length
+        self.data_width = module.csr_data_width
+        self.mode = mode
+        self.read = functools.partial(module.readers[length], wb, addr) if mode in ["rw", "ro"] else self.denied
+        self.write = functools.partial(module.writers[length], wb, addr) if mode in ["rw", "wo"] else self.denied
+
+    def denied(self, *args):
+        raise KeyError(self.name + " register not " + ("readable" if not args else "writable"))
+
+class FastRegs:
+    # registers made on first access (most scripts use a few of them), d has all of them, as the
+    # CSRElements of CSRBuilder
+    def __init__(self, wb, module):
+        self._wb = wb
+        self._module = module
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name not in self._module.regs:
+            raise AttributeError("No such element " + name)
+        reg = FastRegister(self._wb, self._module, name, *self._module.regs[name])
+        self.__dict__[name] = reg
+        return reg
+
+    @property
+    def d(self):
+        return {name: getattr(self, name) for name in self._module.regs}
+
+class FastCSRBuilder:
+    # stands in for litex CSRBuilder in the clients (bridge.py, async_client.py): regs, bases,
+    # constants and mems from the generated module, csr is the module itself for hot loops:
+    # wb.csr.sdram_dfii_control_write(wb, value)
+    def __init__(self, comm, csr_csv, csr_data_width=None):
+        if csr_csv is None:
+            return
+        module = load(csr_csv)
+        if csr_data_width is not None and csr_data_width != module.csr_data_width:
+            raise KeyError("csr_data_width of {} provided but {} found in {}".format(
+                csr_data_width, module.csr_data_width, csr_csv))
+        self.csr = module
+        self.csr_data_width = module.csr_data_width
+        self.bases = CSRElements(dict(module.bases))
+        self.constants = CSRElements(dict(module.constants))
+        self.mems = CSRElements({n: CSRMemoryRegion(*m) for n, m in module.mems.items()})
+        self.regs = FastRegs(comm, module)
+
+def read_regs(wb, names):
+    # several registers in one batched transaction, returns {name: value}
+    regs = [(name,) + wb.csr.regs[name] for name in names]
+    addrs = [addr + 4*i for name, addr, length, mode in regs for i in range(length)]
+    datas = wb.read_addrs(addrs) if hasattr(wb, "read_addrs") else read_addrs(wb, addrs)
+    dw = wb.csr.csr_data_width
+    values = {}
+    n = 0
+    for name, addr, length, mode in regs:
+        value = 0
+        for i in range(length):
+            value = (value << dw) | int(datas[n + i])
+        values[name] = value
+        n += length
+    return values
+
+# Generate -----------------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    for csr_csv in sys.argv[1:] or ["csr.csv"]:
+        print(write_module(csr_csv))
@@ -0,0 +1,142 @@
+import fnmatch
+import functools
+import contextlib
+from collections import OrderedDict
+
+from bulk import read_addrs, send_writes, write_reads
+
+from litex.tools.remote.csr_builder import CSRElements, CSRRegister
+
+# CSR Shadow ---------------------------------------------------------------------------------------
+
+# Storage registers whose last written value can be trusted: writing the same value again is a
+# no-op in the gateware. Pulse CSRs (*_inc, *_rst, *_issue, *_strobe...) must never be dropped.
+SHADOWED_REGS = [
+    "ddrphy_dly_sel",
+    "ddrphy_wlevel_en",
+    "sdram_dfii_control",
+    "sdram_dfii_pi*_address",
+    "sdram_dfii_pi*_baddress",
+    "sdram_dfii_pi*_command",
+    "sdram_dfii_pi*_wrdata",
+    "sdram_generator_base",
+    "sdram_generator_length",
+    "sdram_generator_random",
+    "sdram_checker_base",
+    "sdram_checker_length",
+    "sdram_checker_random",
+]
+
+class CSRShadow:
+    def __init__(self, wb, shadowed=SHADOWED_REGS, batch=64):
+        self.wb = wb
+        self.batch = batch
+        self.queue = []
+        self.shadow = {}
+        self.scopes = ["other"]
+        self.stats = OrderedDict()
+
+        self.bases = wb.bases
+        self.mems = wb.mems
+        self.constants = wb.constants
+        regs = {}
+        self.shadowed = set()
+        for name, reg in wb.regs.d.items():
+            regs[name] = CSRRegister(self.read, self.write, name, reg.addr, reg.length, reg.data_width, reg.mode)
+            if any(fnmatch.fnmatch(name, pattern) for pattern in shadowed):
+                self.shadowed.add(reg.addr)
+        self.regs = CSRElements(regs)
+
+    def open(self):
+        self.wb.open()
+
+    def close(self):
+        self.flush()
+        self.wb.close()
+
+    # stats
+
+    def scope(self, name):
+        # queued writes are flushed at scope boundaries so the wrapped client (BridgeProfiler) sees
+        # them in the scope that issued them
+        shadow = self
+        class Scope:
+            def __enter__(self):
+                shadow.flush()
+                shadow.scopes.append(name)
+            def __exit__(self, *args):
+                shadow.flush()
+                shadow.scopes.pop()
+        return Scope()
+
+    def count(self, kind, n=1):
+        stats = self.stats.setdefault(self.scopes[-1], {"reads": 0, "writes": 0, "dropped": 0})
+        stats[kind] += n
+
+    def report(self):
+        print("{:<28s} {:>8s} {:>8s} {:>8s}".format("helper", "reads", "writes", "dropped"))
+        for name, stats in self.stats.items():
+            print("{:<28s} {:8d} {:8d} {:8d}".format(name, stats["reads"], stats["writes"], stats["dropped"]))
+
+    # bus
+
+    def invalidate(self):
+        self.shadow = {}
+
+    def read(self, addr, length=None):
+        self.flush()
+        self.count("reads")
+        return self.wb.read(addr, length)
+
+    def gather(self, reads):
+        self.flush()
+        self.count("reads", len(reads))
+        if hasattr(self.wb, "gather"):
+            return self.wb.gather(reads)
+        return [read_addrs(self.wb, addrs) for addrs in reads]
+
+    def write_reads(self, records):
+        # write+reads records (strobe then sample): never shadowed, queued writes go first
+        self.flush()
+        self.count("writes", len(records))
+        self.count("reads", len(records))
+        return write_reads(self.wb, records)
+
+    def write(self, addr, datas):
+        datas = datas if isinstance(datas, list) else [datas]
+        if addr in self.shadowed:
+            if self.shadow.get(addr, None) == datas:
+                self.count("dropped")
+                return
+            self.shadow[addr] = datas
+        self.count("writes")
+        self.queue.append((addr, datas))
+        if len(self.queue) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if not self.queue:
+            return
+        send_writes(self.wb, self.queue)
+        self.queue = []
+
+def counted(fn):
+    # account the transactions of a helper to its name when called with a CSRShadow/BridgeProfiler
+    @functools.wraps(fn)
+    def wrapper(wb, *args, **kwargs):
+        with scope(wb, fn.__name__):
+            return fn(wb, *args, **kwargs)
+    return wrapper
+
+def scope(wb, name):
+    # enters name on every wrapper of the client that tracks scopes, innermost first so the outer
+    # ones (CSRShadow flushing its queue) leave first
+    wrappers = []
+    while wb is not None:
+        if hasattr(wb, "scope"):
+            wrappers.append(wb)
+        wb = getattr(wb, "wb", None)
+    stack = contextlib.ExitStack()
+    for wb in reversed(wrappers):
+        stack.enter_context(wb.scope(name))
+    return stack
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+import time
+import queue
+import socket
+import argparse
+import threading
+
+from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord, EtherboneWrites
+from litex.tools.remote.etherbone import EtherboneIPC
+
+# Fake Bridge --------------------------------------------------------------------------------------
+
+# Stand-in for litex_server + board: serves Etherbone over TCP from a local memory and optionally
+# models the wire time of the UARTWishboneBridge (cmd, length, address, then 4 bytes per word).
+# latency is added to each transaction; when pipelined, it is a transport delay instead: replies
+# leave latency seconds after their request arrived, with later requests already being served.
+
+class FakeBridge(EtherboneIPC):
+    def __init__(self, host="localhost", port=1234, baudrate=None, latency=0.0, pipelined=False):
+        self.host = host
+        self.port = port
+        self.baudrate = baudrate
+        self.latency = latency
+        self.pipelined = pipelined
+        self.mem = {}
+        self.transactions = 0
+
+    def delay(self, nbytes):
+        self.transactions += 1
+        t = 0.0 if self.pipelined else self.latency
+        if self.baudrate is not None:
+            t += 10*nbytes/self.baudrate
+        if t:
+            time.sleep(t)
+
+    def handle(self, record):
+        if record.writes is not None:
+            base = record.writes.base_addr
+            datas = record.writes.get_datas()
+            for i, data in enumerate(datas):
+                self.mem[base + 4*i] = data
+            self.delay(6 + 4*len(datas))
+        if record.reads is not None:
+            addrs = record.reads.get_addrs()
+            self.delay(6 + 4*len(addrs))
+            record = EtherboneRecord()
+            record.writes = EtherboneWrites(datas=[self.mem.get(addr, 0) for addr in addrs])
+            record.wcount = len(record.writes)
+            packet = EtherbonePacket()
+            packet.records = [record]
+            packet.encode()
+            return packet
+        return None
+
+    def serve(self, client_socket):
+        if self.pipelined:
+            replies = queue.Queue()
+            sender = threading.Thread(target=self.send_replies, args=(client_socket, replies), daemon=True)
+            sender.start()
+        while True:
+            packet = self.receive_packet(client_socket)
+            if packet == 0:
+                break
+            arrival = time.time()
+            packet = EtherbonePacket(packet)
+            packet.decode()
+            reply = self.handle(packet.records.pop())
+            if reply is None:
+                continue
+            if self.pipelined:
+                replies.put((arrival + self.latency, reply))
+            else:
+                self.send_packet(client_socket, reply)
+        if self.pipelined:
+            replies.put(None)
+            sender.join()
+        client_socket.close()
+
+    def send_replies(self, client_socket, replies):
+        while True:
+            item = replies.get()
+            if item is None:
+                break
+            due, reply = item
+            time.sleep(max(0.0, due - time.time()))
+            try:
+                self.send_packet(client_socket, reply)
+            except OSError:
+                break
+
+    def open(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((self.host, self.port))
+        self.socket.listen(1)
+
+    def accept(self):
+        while True:
+            try:
+                client_socket, addr = self.socket.accept()
+            except OSError:
+                break
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.serve(client_socket)
+
+    def start(self):
+        self.open()
+        self.thread = threading.Thread(target=self.accept, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.socket.close()
+
+# Fake Etherbone UDP -------------------------------------------------------------------------------
+
+# Stand-in for the EtherboneTestSoC: Etherbone packets over UDP, replies sent back to the sender.
+
+class FakeEtherboneUDP(FakeBridge):
+    def open(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((self.host, self.port))
+
+    def accept(self):
+        while True:
+            try:
+                datas, addr = self.socket.recvfrom(8192)
+            except OSError:
+                break
+            packet = EtherbonePacket(datas)
+            packet.decode()
+            for record in packet.records:
+                reply = self.handle(record)
+                if reply is not None:
+                    self.socket.sendto(reply.bytes, addr)
+
+# CSR map used when no build is available: only the main_ram region is needed for memory traffic.
+def write_csr_csv(filename, main_ram_base=0x40000000, main_ram_size=0x10000000):
+    f = open(filename, "w")
+    f.write("constant,config_csr_data_width,32,,\n")
+    f.write("memory_region,main_ram,0x{:08x},{},cached\n".format(main_ram_base, main_ram_size))
+    f.close()
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Etherbone bridge server")
+    parser.add_argument("--host", default="localhost", help="bind address")
+    parser.add_argument("--port", default=1234, type=int, help="bind port")
+    parser.add_argument("--udp", action="store_true", help="serve Etherbone over UDP instead of TCP")
+    parser.add_argument("--baudrate", default=None, type=int, help="model a UART bridge at this baudrate")
+    parser.add_argument("--latency", default=0.0, type=float, help="extra latency per transaction (s)")
+    parser.add_argument("--pipelined", action="store_true", help="latency overlaps between transactions")
+    args = parser.parse_args()
+
+    if args.udp:
+        bridge = FakeEtherboneUDP(args.host, args.port, args.baudrate, args.latency)
+    else:
+        bridge = FakeBridge(args.host, args.port, args.baudrate, args.latency, args.pipelined)
+    bridge.open()
+    print("Fake bridge listening on {}:{}".format(args.host, args.port))
+    try:
+        bridge.accept()
+    except KeyboardInterrupt:
+        pass
+    bridge.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+
+from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord, EtherboneReads
+
+# Runs identification, DRAM training + pattern test (test_sdram.py) and BIST (bist.py) on several
+# boards concurrently: one subprocess per step, steps of a board in sequence, boards in parallel.
+# Each board gets its own log, calibration cache and CSR map argument.
+
+# Boards -------------------------------------------------------------------------------------------
+
+def parse_board(spec):
+    # udp:<ip>[:port] (Etherbone) or [uart:]<host>:<port> (litex_server)
+    parts = spec.split(":")
+    if parts[0] == "udp":
+        ip, port = parts[1], int(parts[2]) if len(parts) > 2 else 1234
+        return {"name": "udp:{}:{}".format(ip, port), "args": ["--transport", "udp", "--ip", ip, "--port", str(port)]}
+    if parts[0] == "uart":
+        parts = parts[1:]
+    host, port = (parts[0], int(parts[1])) if len(parts) > 1 else ("localhost", int(parts[0]))
+    return {"name": "uart:{}:{}".format(host, port), "args": ["--host", host, "--port", str(port)]}
+
+def expand_range(spec):
+    # 192.168.1.50-59 or 1234-1240
+    head, sep, last = spec.rpartition("-")
+    if not sep:
+        return [spec]
+    prefix, dot, first = head.rpartition(".")
+    return ["{}{}{:d}".format(prefix, dot, n) for n in range(int(first), int(last) + 1)]
+
+def discover_udp(ips, port=1234, timeout=0.5):
+    # Etherbone boards answering a read (any address) within timeout
+    record = EtherboneRecord()
+    record.reads = EtherboneReads(addrs=[0])
+    record.rcount = 1
+    packet = EtherbonePacket()
+    packet.records = [record]
+    packet.encode()
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    s.bind(("", port))
+    for ip in ips:
+        s.sendto(packet.bytes, (ip, port))
+    found = set()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        s.settimeout(max(deadline - time.time(), 1e-3))
+        try:
+            data, (ip, dummy) = s.recvfrom(8192)
+        except socket.timeout:
+            break
+        if ip in ips:
+            found.add(ip)
+    s.close()
+    return ["udp:{}:{:d}".format(ip, port) for ip in ips if ip in found]
+
+def discover_tcp(host, ports, timeout=0.2):
+    # litex_server instances listening on host
+    found = []
+    for port in ports:
+        try:
+            socket.create_connection((host, port), timeout).close()
+            found.append("uart:{}:{:d}".format(host, port))
+        except OSError:
+            pass
+    return found
+
+# Steps --------------------------------------------------------------------------------------------
+
+def parse_identify(output):
+    m = re.search(r"fpga_id: (.*)", output)
+    return {"ident": m.group(1).strip() if m else None}
+
+def parse_sdram(output):
+    m = re.findall(r"^(\d+) errors", output, re.M)
+    return {"errors": int(m[-1]) if m else None}
+
+def parse_bist(output):
+    try:
+        results = json.loads(output)
+    except ValueError:
+        return {"errors": None}
+    return {
+        "errors":  sum(r["errors"] for r in results),
+        "wr_mbps": min(r["wr_mbps"] for r in results),
+        "rd_mbps": min(r["rd_mbps"] for r in results),
+    }
+
+steps = {
+    "identify": (["test_identifier.py"], parse_identify),
+    "sdram":    (["test_sdram.py"], parse_sdram),
+    "bist":     (["bist.py", "--format", "json", "--burst-lengths", "128", "--addressing", "linear,random"], parse_bist),
+}
+
+async def run_step(board, name, common, log_dir, timeout):
+    script, parse = steps[name]
+    cmd = [sys.executable] + script + board["args"] + common + ["--board", board["name"]]
+    if name == "sdram":
+        cmd += ["--cache-file", os.path.join(log_dir, board["id"] + "_calibration.json")]
+    start = time.time()
+    proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT if name != "bist" else asyncio.subprocess.PIPE)
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        returncode = proc.returncode
+    except asyncio.TimeoutError:
+        proc.kill()
+        stdout, stderr = await proc.communicate()
+        returncode = None
+    output = stdout.decode(errors="replace")
+    with open(os.path.join(log_dir, "{}_{}.log".format(board["id"], name)), "w") as f:
+        f.write(output + (stderr.decode(errors="replace") if stderr else ""))
+    result = dict(parse(output), step=name, returncode=returncode, time=time.time() - start)
+    result["passed"] = returncode == 0 and result.get("errors", 0) == 0 and \
+        (name != "identify" or bool(result["ident"]))
+    return result
+
+async def run_board(board, names, common, log_dir, timeout, slots):
+    async with slots:
+        start = time.time()
+        results = []
+        for name in names:
+            results.append(await run_step(board, name, common, log_dir, timeout))
+            if not results[-1]["passed"]:
+                break
+        passed = len(results) == len(names) and all(r["passed"] for r in results)
+        print("{}: {}".format(board["name"], "PASS" if passed else "FAIL"), file=sys.stderr)
+        return {"board": board["name"], "passed": passed, "time": time.time() - start, "steps": results}
+
+async def run_all(boards, names, common, log_dir, timeout, jobs):
+    slots = asyncio.Semaphore(jobs or len(boards))
+    return await asyncio.gather(*[run_board(board, names, common, log_dir, timeout, slots) for board in boards])
+
+# Report -------------------------------------------------------------------------------------------
+
+def report(results, names, wall_time):
+    print("{:<28s} {:>6s} {:>8s}  {}".format("board", "result", "time(s)", "  ".join(
+        "{:>14s}".format(n) for n in names)))
+    for r in results:
+        cells = []
+        for name in names:
+            step = next((s for s in r["steps"] if s["step"] == name), None)
+            if step is None:
+                cells.append("{:>14s}".format("-"))
+                continue
+            detail = "" if step.get("errors") in (None, 0) else " {}err".format(step["errors"])
+            cells.append("{:>14s}".format("{}{} {:.0f}s".format(
+                "ok" if step["passed"] else "FAIL", detail, step["time"])))
+        print("{:<28s} {:>6s} {:8.1f}  {}".format(r["board"], "PASS" if r["passed"] else "FAIL",
+            r["time"], "  ".join(cells)))
+    npassed = sum(r["passed"] for r in results)
+    print("{:d}/{:d} boards passed, wall time {:.1f}s (sum of board times {:.1f}s)".format(
+        npassed, len(results), wall_time, sum(r["time"] for r in results)))
+
+# Run ----------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the board tests on several boards concurrently")
+    parser.add_argument("boards", nargs="*", help="udp:<ip>[:port] or [uart:]<host>:<port> endpoints")
+    parser.add_argument("--boards-file", default=None, help="file with one endpoint per line")
+    parser.add_argument("--discover-ips", default=None, help="probe Etherbone boards, e.g. 192.168.1.50-59")
+    parser.add_argument("--discover-ports", default=None, help="probe litex_server ports on localhost, e.g. 1234-1250")
+    parser.add_argument("--steps", default="identify,sdram,bist", help="comma separated: identify, sdram, bist")
+    parser.add_argument("--jobs", default=None, type=int, help="boards tested in parallel (default: all)")
+    parser.add_argument("--timeout", default=600, type=float, help="per step timeout (s)")
+    parser.add_argument("--csr-csv", default="csr.csv", help="CSR map of the loaded bitstream")
+    parser.add_argument("--window", default=0, type=int, help="pipelined client window for uart boards")
+    parser.add_argument("--log-dir", default="orchestrate", help="per board logs and calibration caches")
+    parser.add_argument("--json", default=None, help="also write the results to a JSON file")
+    args = parser.parse_args()
+
+    specs = list(args.boards)
+    if args.boards_file is not None:
+        with open(args.boards_file) as f:
+            specs += [l.strip() for l in f if l.strip() and not l.startswith("#")]
+    if args.discover_ips is not None:
+        specs += discover_udp(expand_range(args.discover_ips))
+    if args.discover_ports is not None:
+        specs += discover_tcp("localhost", [int(p) for p in expand_range(args.discover_ports)])
+    boards = list({board["name"]: board for board in map(parse_board, specs)}.values())
+    if not boards:
+        print("no boards")
+        exit(1)
+    for board in boards:
+        board["id"] = re.sub(r"[^\w.-]", "_", board["name"])
+    names = args.steps.split(",")
+    for name in names:
+        if name not in steps:
+            print("unknown step {}, supported: ({})".format(name, ", ".join(steps.keys())))
+            exit(1)
+
+    os.makedirs(args.log_dir, exist_ok=True)
+    common = ["--csr-csv", args.csr_csv] + (["--window", str(args.window)] if args.window else [])
+    start = time.time()
+    results = asyncio.get_event_loop().run_until_complete(
+        run_all(boards, names, common, args.log_dir, args.timeout, args.jobs))
+    wall_time = time.time() - start
+
+    report(results, names, wall_time)
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump({"wall_time": wall_time, "boards": results}, f, indent=4)
+    exit(0 if all(r["passed"] for r in results) else 1)
+
+if __name__ == "__main__":
+    main()
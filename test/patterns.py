@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+from bulk import bulk_read, bulk_write
+from bridge import add_bridge_args, get_bridge
+from sdram_cores import SDRAMCore
+
+# SDRAM pattern tests: March C-, walking ones/zeros, address-in-address and checkerboard, run either
+# by the PatternEngine of the bist_test SoC (one March element per start) or from the host with
+# bulk transfers.
+
+# Generators ---------------------------------------------------------------------------------------
+
+# Same data as PatternData in versa_ecp5.py: a port word of dw bits is dw//32 bus words, bus word w
+# (w: 32-bit word offset from the start of the DRAM) is lane w % lanes of port word w // lanes.
+
+pattern_modes = {
+    "solid":        0,
+    "walking":      1,
+    "address":      2,
+    "checkerboard": 3,
+}
+
+def pattern_words(mode, offsets, phase=0, invert=False, dw=32):
+    w = np.asarray(offsets, dtype=np.int64)
+    lanes = dw//32
+    a = w//lanes
+    if mode == "solid":
+        data = np.zeros(len(w), dtype=np.uint32)
+    elif mode == "walking":
+        bit = (a + phase) % dw
+        data = np.where(bit//32 == w % lanes, np.left_shift(1, bit % 32), 0).astype(np.uint32)
+    elif mode == "address":
+        data = (4*w).astype(np.uint32)
+    elif mode == "checkerboard":
+        data = np.where(a & 1, 0xaaaaaaaa, 0x55555555).astype(np.uint32)
+    else:
+        raise ValueError(mode)
+    return ~data if invert else data
+
+# Tests --------------------------------------------------------------------------------------------
+
+# Elements: (mode, phase, descending, read, write), read/write are None (no access) or the inversion
+# of the pattern. March C-: up(w0); up(r0,w1); up(r1,w0); down(r0,w1); down(r1,w0); up(r0).
+
+def march_cm(phases):
+    return [("solid", 0, d, r, w) for d, r, w in [
+        (False, None,  False),
+        (False, False, True),
+        (False, True,  False),
+        (True,  False, True),
+        (True,  True,  False),
+        (False, False, None)]]
+
+def walking(invert):
+    def elements(phases):
+        return sum([[("walking", p, False, None, invert), ("walking", p, False, invert, None)]
+            for p in range(phases)], [])
+    return elements
+
+def write_read(mode):
+    def elements(phases):
+        return [(mode, 0, False, None, False), (mode, 0, False, False, None),
+                (mode, 0, False, None, True),  (mode, 0, False, True,  None)]
+    return elements
+
+tests = {
+    "march_cm":      march_cm,
+    "walking_ones":  walking(False),
+    "walking_zeros": walking(True),
+    "address":       write_read("address"),
+    "checkerboard":  write_read("checkerboard"),
+}
+
+# Hardware -----------------------------------------------------------------------------------------
+
+class PatternEngine(SDRAMCore):
+    def __init__(self, wb):
+        SDRAMCore.__init__(self, wb, "sdram_pattern")
+        self.dw = wb.constants.sdram_pattern_data_width
+
+    def element(self, offset, length, mode, phase, descending, read, write):
+        # offset/length in bytes, returns (errors, ticks)
+        nbytes = self.dw//8
+        self.reg("mode").write(pattern_modes[mode])
+        self.reg("phase").write(phase)
+        self.reg("base").write(offset//nbytes)
+        self.reg("length").write(length//nbytes)
+        self.reg("descending").write(int(descending))
+        self.reg("read").write(0 if read is None else 1 | (int(read) << 1))
+        self.reg("write").write(0 if write is None else 1 | (int(write) << 1))
+        self.execute()
+        return self.reg("errors").read(), self.reg("ticks").read()
+
+# Host ---------------------------------------------------------------------------------------------
+
+def host_element(wb, offset, length, mode, phase, descending, read, write, dw=32, chunk=16384):
+    # chunks are visited in order, the words of a chunk are read then written: coarser than the
+    # hardware engine (read and write of a word are not back to back)
+    base = wb.mems.main_ram.base
+    starts = list(range(offset//4, (offset + length)//4, chunk))
+    if descending:
+        starts.reverse()
+    errors = 0
+    for start in starts:
+        n = min(chunk, (offset + length)//4 - start)
+        offsets = np.arange(start, start + n)
+        if read is not None:
+            datas = bulk_read(wb, base + 4*start, n)
+            errors += int(np.count_nonzero(datas != pattern_words(mode, offsets, phase, read, dw)))
+        if write is not None:
+            bulk_write(wb, base + 4*start, pattern_words(mode, offsets, phase, write, dw))
+    return errors
+
+# Run ----------------------------------------------------------------------------------------------
+
+# SoCs with a CPU (bist) run their firmware from the start of main_ram: kept out of the tests.
+FIRMWARE_RESERVED = 0x00100000
+
+def reserved_bytes(wb):
+    return FIRMWARE_RESERVED if hasattr(wb.mems, "rom") else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="SDRAM pattern tests (hardware engine or host)")
+    add_bridge_args(parser)
+    parser.add_argument("--tests", default="march_cm,walking_ones,walking_zeros,address,checkerboard",
+        help="comma separated: {}".format(", ".join(tests.keys())))
+    parser.add_argument("--offset", default=None, type=lambda s: int(s, 0),
+        help="first byte tested (default: 0, past the firmware on SoCs with a CPU)")
+    parser.add_argument("--length", default=None, type=lambda s: int(s, 0), help="bytes tested (default: whole SDRAM)")
+    parser.add_argument("--phases", default=None, type=int,
+        help="walking bit positions per word (default: all, the port data width)")
+    parser.add_argument("--host-driven", action="store_true", help="run from the host with bulk transfers")
+    parser.add_argument("--json", default=None, help="also write the results to a JSON file")
+    args = parser.parse_args()
+
+    wb = get_bridge(args)
+    wb.open()
+
+    reserved = reserved_bytes(wb)
+    offset = args.offset if args.offset is not None else reserved
+    length = args.length if args.length is not None else wb.mems.main_ram.size - offset
+    if offset < reserved or offset + length > wb.mems.main_ram.size:
+        print("0x{:08x}-0x{:08x} overlaps the firmware (0x00000000-0x{:08x}) or is outside main_ram".format(
+            offset, offset + length - 1, reserved - 1))
+        exit(1)
+    engine = None if args.host_driven else PatternEngine(wb)
+    dw = engine.dw if engine is not None else getattr(wb.constants, "sdram_pattern_data_width", 32)
+    phases = dw if args.phases is None else args.phases
+    results = []
+    print("{:<14s} {:>8s} {:>10s} {:>8s} {:>10s}".format("test", "elements", "errors", "time(s)", "MB/s"))
+    for name in args.tests.split(","):
+        start = time.time()
+        errors = 0
+        accessed = 0
+        for mode, phase, descending, read, write in tests[name](phases):
+            if engine is not None:
+                e, ticks = engine.element(offset, length, mode, phase, descending, read, write)
+            else:
+                e = host_element(wb, offset, length, mode, phase, descending, read, write, dw)
+            errors += e
+            accessed += length*((read is not None) + (write is not None))
+        duration = time.time() - start
+        r = {"test": name, "elements": len(tests[name](phases)), "errors": errors,
+             "duration": duration, "mbps": accessed/(duration*1e6)}
+        results.append(r)
+        print("{:<14s} {:8d} {:10d} {:8.1f} {:10.1f}".format(name, r["elements"], errors, duration, r["mbps"]))
+        sys.stdout.flush()
+
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump({"offset": offset, "length": length, "host_driven": args.host_driven, "results": results}, f, indent=4)
+
+    wb.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import json
+import time
+import math
+import bisect
+from collections import OrderedDict
+
+from bulk import read_addrs, send_writes, write_reads
+
+from litex.tools.remote.csr_builder import CSRElements, CSRRegister
+
+# Bridge Profiler ----------------------------------------------------------------------------------
+
+# Wraps the bridge client (below CSRShadow, so only what reaches the bridge is seen) and accounts
+# every transaction to the current phase stack (scope(wb, name) from csr_shadow, @counted helpers)
+# and to the register or memory region it targets: count, bytes, time and a log2 latency histogram.
+
+class BridgeProfiler:
+    def __init__(self, wb):
+        self.wb = wb
+        self.phases = ["root"]
+        self.stats = OrderedDict()
+        self.start = None
+
+        self.bases = wb.bases
+        self.mems = wb.mems
+        self.constants = wb.constants
+        regs = {}
+        ranges = []
+        for name, reg in wb.regs.d.items():
+            regs[name] = CSRRegister(self.read, self.write, name, reg.addr, reg.length, reg.data_width, reg.mode)
+            ranges.append((reg.addr, 4*reg.length, name))
+        for name, mem in wb.mems.__dict__.items():
+            ranges.append((mem.base, mem.size, name))
+        self.ranges = sorted(ranges)
+        self.regs = CSRElements(regs)
+
+    def open(self):
+        self.wb.open()
+        self.start = time.time()
+
+    def close(self):
+        self.wb.close()
+
+    # accounting
+
+    def scope(self, name):
+        profiler = self
+        class Scope:
+            def __enter__(self):
+                profiler.phases.append(name)
+            def __exit__(self, *args):
+                profiler.phases.pop()
+        return Scope()
+
+    def target(self, addr):
+        i = bisect.bisect_right(self.ranges, (addr, float("inf"), "")) - 1
+        if i >= 0:
+            base, size, name = self.ranges[i]
+            if addr < base + size:
+                return name
+        return "0x{:08x}".format(addr)
+
+    def account(self, kind, addr, nwords, duration, transactions=1):
+        key = (tuple(self.phases), self.target(addr))
+        stats = self.stats.setdefault(key, {"reads": 0, "writes": 0, "bytes_read": 0,
+            "bytes_written": 0, "time": 0.0, "latency": {}})
+        stats[kind + "s"] += transactions
+        stats["bytes_read" if kind == "read" else "bytes_written"] += 4*nwords
+        stats["time"] += duration
+        bucket = "{:d}us".format(2**max(0, int(math.log2(max(duration*1e6, 1)))))
+        stats["latency"][bucket] = stats["latency"].get(bucket, 0) + 1
+
+    # bus
+
+    def read(self, addr, length=None):
+        start = time.time()
+        datas = self.wb.read(addr, length)
+        self.account("read", addr, 1 if length is None else length, time.time() - start)
+        return datas
+
+    def write(self, addr, datas):
+        start = time.time()
+        self.wb.write(addr, datas)
+        self.account("write", addr, len(datas) if isinstance(datas, list) else 1, time.time() - start)
+
+    def gather(self, reads):
+        start = time.time()
+        if hasattr(self.wb, "gather"):
+            results = self.wb.gather(reads)
+        else:
+            results = [read_addrs(self.wb, addrs) for addrs in reads]
+        if reads:
+            self.account("read", reads[0][0], sum(len(addrs) for addrs in reads), time.time() - start,
+                len(reads))
+        return results
+
+    def gather_writes(self, writes):
+        start = time.time()
+        send_writes(self.wb, writes)
+        if writes:
+            self.account("write", writes[0][0], sum(len(datas) for addr, datas in writes),
+                time.time() - start, len(writes))
+
+    def write_reads(self, records):
+        start = time.time()
+        results = write_reads(self.wb, records)
+        if records:
+            self.account("read", records[0][2][0], sum(len(addrs) for addr, datas, addrs in records),
+                time.time() - start, len(records))
+        return results
+
+    # export
+
+    def phase_totals(self):
+        totals = OrderedDict()
+        for (phases, target), stats in self.stats.items():
+            for i in range(1, len(phases) + 1):
+                total = totals.setdefault(";".join(phases[:i]), {"reads": 0, "writes": 0,
+                    "bytes_read": 0, "bytes_written": 0, "time": 0.0})
+                for k in total.keys():
+                    total[k] += stats[k]
+        return totals
+
+    def to_dict(self):
+        return {
+            "wall_time": 0.0 if self.start is None else time.time() - self.start,
+            "phases": self.phase_totals(),
+            "registers": [dict(stats, phase=";".join(phases), target=target)
+                for (phases, target), stats in self.stats.items()],
+        }
+
+    def save_json(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    def save_folded(self, filename):
+        # flamegraph.pl / speedscope folded stacks, weighted by bridge time in microseconds
+        with open(filename, "w") as f:
+            for (phases, target), stats in self.stats.items():
+                f.write("{};{} {:d}\n".format(";".join(phases), target, int(stats["time"]*1e6)))
+
+    def report(self):
+        print("{:<48s} {:>8s} {:>8s} {:>10s} {:>10s} {:>10s}".format(
+            "phase", "reads", "writes", "rd bytes", "wr bytes", "time(ms)"))
+        for phase, total in self.phase_totals().items():
+            print("{:<48s} {:8d} {:8d} {:10d} {:10d} {:10.1f}".format(
+                "  "*phase.count(";") + phase.split(";")[-1], total["reads"], total["writes"],
+                total["bytes_read"], total["bytes_written"], 1e3*total["time"]))
@@ -0,0 +1,49 @@
+import os
+import json
+import time
+import hashlib
+
+from sdram_helpers import *
+
+# Calibration Cache --------------------------------------------------------------------------------
+
+# Calibration results stored on disk, keyed by board, FPGA identifier and CSR map hash, so a board
+# power-cycled on the same bitstream can skip training.
+
+class CalibrationCache:
+    def __init__(self, filename="calibration.json"):
+        self.filename = filename
+        self.entries = {}
+        if os.path.exists(filename):
+            with open(filename) as f:
+                self.entries = json.load(f)
+
+    def key(self, board, ident, csr_csv):
+        with open(csr_csv, "rb") as f:
+            csr_hash = hashlib.sha256(f.read()).hexdigest()
+        return hashlib.sha256("\0".join([board, ident, csr_hash]).encode()).hexdigest()[:16]
+
+    def get(self, key):
+        return self.entries.get(key, None)
+
+    def put(self, key, calibration):
+        calibration = dict(calibration, timestamp=time.time())
+        self.entries[key] = calibration
+        self.save()
+
+    def remove(self, key):
+        if self.entries.pop(key, None) is not None:
+            self.save()
+
+    def save(self):
+        tmp = self.filename + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f, indent=4)
+        os.replace(tmp, self.filename)
+
+def ddram_apply_calibration(wb, calibration):
+    write_leveling = calibration.get("write_leveling", []) if ddram_has_wlevel(wb) else []
+    for i, group in enumerate(write_leveling):
+        ddram_set_group_wdelay(wb, i, group["wdelay"], group["dqs_taps"])
+    for i, group in enumerate(calibration["read_leveling"]):
+        ddram_set_group_rdelay(wb, i, group["bitslip"], group["rdelay"])
@@ -0,0 +1,78 @@
+# Host-driven SDRAM cores --------------------------------------------------------------------------
+
+# The SDRAM cores of the bist_test SoC (LiteDRAMBISTGenerator/Checker, PatternEngine, SDRAMTraffic)
+# are driven the same way from the host: parameters in <prefix>_<name> CSRs, a start strobe, a done
+# poll, tick counters turned into bandwidth. They access the SDRAM through the controller, so it must
+# be initialized first (test_sdram.py leaves it under hardware control).
+
+class SDRAMCore:
+    def __init__(self, wb, prefix):
+        self.wb = wb
+        self.prefix = prefix
+
+    def reg(self, name):
+        return getattr(self.wb.regs, self.prefix + "_" + name)
+
+    def start(self):
+        self.reg("start").write(1)
+
+    def wait(self):
+        while self.reg("done").read() == 0:
+            pass
+
+    def execute(self):
+        self.start()
+        self.wait()
+
+def bandwidth_mbps(length, ticks, clk_freq):
+    # length bytes moved in ticks cycles of clk_freq
+    return 8*length*clk_freq/(1e6*ticks) if ticks else 0.0
+
+# BIST addressing ----------------------------------------------------------------------------------
+
+# sdram_bist_loop of firmware/sdram_bist.c: 128 bursts per loop, at consecutive or pseudo-random
+# bases (same table as the firmware).
+
+TEST_BASE       = 0x00010000
+TEST_DATA_BYTES = 4 # sdram_dfii_pi0_rddata width, as in firmware/sdram_bist.c
+
+pseudo_random_bases = [
+    0x000e4018, 0x0003338d, 0x00233429, 0x001f589d,
+    0x001c922b, 0x0011dc60, 0x000d1e8f, 0x000b20cf,
+    0x00360188, 0x00041174, 0x0003d065, 0x000bfe34,
+    0x001bfc54, 0x001dc7d5, 0x00036587, 0x00197383,
+    0x0035b2d3, 0x001c3765, 0x00397fae, 0x00239bc0,
+    0x0000d4f3, 0x00146fb7, 0x0036183a, 0x002b8d54,
+    0x00239149, 0x0013e6c0, 0x001b8f66, 0x002b1587,
+    0x000d1539, 0x000bdf18, 0x0030a175, 0x000c6133,
+    0x002df309, 0x002c06bd, 0x0021dbd1, 0x00058fc8,
+    0x003ace6f, 0x000ffa4d, 0x003073d0, 0x000a161f,
+    0x002586dd, 0x002e4a0e, 0x00189ce9, 0x0008e72e,
+    0x0005dd92, 0x001d2bc5, 0x00250aaa, 0x000a369f,
+    0x001dcc17, 0x000ced9d, 0x0030a7f9, 0x002394a3,
+    0x003a0959, 0x002eb2d2, 0x0014d1d9, 0x002f6217,
+    0x002d7982, 0x001ad120, 0x00222c54, 0x000923b7,
+    0x0015e7df, 0x001f55f6, 0x0014ea5f, 0x003b2b57,
+    0x003091fe, 0x00228da6, 0x001c1c59, 0x00298218,
+    0x000728f9, 0x001d5172, 0x00041bdc, 0x002860c3,
+    0x0033595e, 0x00224555, 0x000878de, 0x001b017c,
+    0x0028475d, 0x001b3758, 0x003fe6cf, 0x0032a410,
+    0x003abba8, 0x0012499d, 0x0021e797, 0x0011df68,
+    0x001f917d, 0x0021a184, 0x0036d6eb, 0x00331f8e,
+    0x002e55e6, 0x001c12b3, 0x0011b4da, 0x003f2b86,
+    0x000ba2eb, 0x000607e8, 0x000e08fb, 0x0013904d,
+    0x00147a4a, 0x00360956, 0x000821ad, 0x0031400e,
+    0x0030d8e6, 0x003be90f, 0x00202e56, 0x00017835,
+    0x000ea9a1, 0x00222753, 0x002b8ade, 0x000e4757,
+    0x00259169, 0x0037a663, 0x00143e83, 0x003a139e,
+    0x00006a57, 0x0021b6bb, 0x0016de10, 0x000d9ede,
+    0x00263370, 0x001975eb, 0x0013903c, 0x002fdc68,
+    0x0014ada3, 0x000012bd, 0x00297df2, 0x003e8aa1,
+    0x00027e36, 0x000e51ae, 0x002e7627, 0x00275c9f,
+]
+
+def bist_base(n, random):
+    if random:
+        return TEST_BASE + pseudo_random_bases[n%128]*TEST_DATA_BYTES
+    else:
+        return TEST_BASE + (n%128)*TEST_DATA_BYTES
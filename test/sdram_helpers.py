@@ -0,0 +1,155 @@
+import time
+
+from sdram_init import *
+
+from csr_shadow import counted
+
+# Parameters----------------------------------------------------------------------------------------
+
+N_BYTE_GROUPS = 2
+NDELAYS       = 8
+NBITSLIPS     = 4
+
+# MPR
+MPR_PATTERN = 0b01010101
+
+# MR1
+MR1_WLEVEL = (1<<7)
+
+# MR3
+MPR_SEL   = (0b00<<0)
+MPR_ENABLE = (1<<2)
+
+# Software helpers/models---------------------------------------------------------------------------
+
+@counted
+def ddram_software_control(wb, initialized=False):
+    # once initialized, keep the DRAM out of reset with CKE/ODT asserted
+    if initialized:
+        wb.regs.sdram_dfii_control.write(dfii_control_cke | dfii_control_odt | dfii_control_reset_n)
+    else:
+        wb.regs.sdram_dfii_control.write(0)
+
+@counted
+def ddram_hardware_control(wb):
+    wb.regs.sdram_dfii_control.write(dfii_control_sel)
+
+@counted
+def ddram_mr_write(wb, reg, value):
+    wb.regs.sdram_dfii_pi0_baddress.write(reg)
+    wb.regs.sdram_dfii_pi0_address.write(value)
+    wb.regs.sdram_dfii_pi0_command.write(dfii_command_ras | dfii_command_cas | dfii_command_we | dfii_command_cs)
+    wb.regs.sdram_dfii_pi0_command_issue.write(1)
+
+# The delay helpers apply the same setting to every byte group: select them all at once instead of
+# repeating the sequence for each group.
+DLY_SEL_ALL = 2**N_BYTE_GROUPS - 1
+
+@counted
+def ddram_reset_wdelays(wb):
+    wb.regs.ddrphy_dly_sel.write(DLY_SEL_ALL)
+    wb.regs.ddrphy_wdly_dqs_rst.write(1)
+    wb.regs.ddrphy_dly_sel.write(0)
+
+@counted
+def ddram_reset_rdelays(wb):
+    wb.regs.ddrphy_dly_sel.write(DLY_SEL_ALL)
+    wb.regs.ddrphy_rdly_dq_rst.write(1)
+    wb.regs.ddrphy_dly_sel.write(0)
+
+@counted
+def ddram_set_bitslip(wb, bitslip):
+    wb.regs.ddrphy_dly_sel.write(DLY_SEL_ALL)
+    wb.regs.ddrphy_rdly_dq_bitslip_rst.write(1)
+    for i in range(bitslip):
+        wb.regs.ddrphy_rdly_dq_bitslip.write(1)
+    wb.regs.ddrphy_dly_sel.write(0)
+
+@counted
+def ddram_set_rdelay(wb, rdelay):
+    wb.regs.ddrphy_dly_sel.write(DLY_SEL_ALL)
+    wb.regs.ddrphy_rdly_dq_rst.write(1)
+    for i in range(rdelay):
+        wb.regs.ddrphy_rdly_dq_inc.write(1)
+    wb.regs.ddrphy_dly_sel.write(0)
+
+@counted
+def ddram_set_group_rdelay(wb, group, bitslip, rdelay):
+    wb.regs.ddrphy_dly_sel.write(1<<group)
+    wb.regs.ddrphy_rdly_dq_bitslip_rst.write(1)
+    for i in range(bitslip):
+        wb.regs.ddrphy_rdly_dq_bitslip.write(1)
+    wb.regs.ddrphy_rdly_dq_rst.write(1)
+    for i in range(rdelay):
+        wb.regs.ddrphy_rdly_dq_inc.write(1)
+    wb.regs.ddrphy_dly_sel.write(0)
+
+def ddram_has_wlevel(wb):
+    # write leveling CSRs, only present on PHYs with write leveling (not on ECP5DDRPHY)
+    return all(hasattr(wb.regs, "ddrphy_" + name) for name in ["wlevel_en", "wlevel_strobe",
+        "wdly_dq_rst", "wdly_dqs_rst", "wdly_dq_inc", "wdly_dqs_inc", "wdly_dqs_taps"])
+
+@counted
+def ddram_set_group_wdelay(wb, group, wdelay, dqs_taps=0):
+    # dqs_taps: initial DQS delay of the PHY (ddrphy_wdly_dqs_taps), needed on Ultrascale
+    wb.regs.ddrphy_dly_sel.write(1<<group)
+    wb.regs.ddrphy_wdly_dq_rst.write(1)
+    wb.regs.ddrphy_wdly_dqs_rst.write(1)
+    for i in range(dqs_taps):
+        wb.regs.ddrphy_wdly_dqs_inc.write(1)
+    for i in range(wdelay):
+        wb.regs.ddrphy_wdly_dq_inc.write(1)
+        wb.regs.ddrphy_wdly_dqs_inc.write(1)
+    wb.regs.ddrphy_dly_sel.write(0)
+
+def ddram_wait(wb, cycles):
+    # cycles of sys_clk after the previous writes: reading back makes sure they reached the
+    # controller (CSRShadow queues writes, the bridges post them) before the wait starts
+    wb.regs.sdram_dfii_control.read()
+    time.sleep(cycles/wb.constants.system_clock_frequency)
+
+@counted
+def ddram_init(wb):
+    for i, (comment, a, ba, cmd, delay) in enumerate(init_sequence):
+        print(comment)
+        wb.regs.sdram_dfii_pi0_address.write(a)
+        wb.regs.sdram_dfii_pi0_baddress.write(ba)
+        if i < 2:
+            wb.regs.sdram_dfii_control.write(cmd)
+        else:
+            wb.regs.sdram_dfii_pi0_command.write(cmd)
+            wb.regs.sdram_dfii_pi0_command_issue.write(1)
+        if delay:
+            ddram_wait(wb, delay)
+
+# PHY DATA mapping:
+# 8 bit module:
+# DQ0:
+# p0 [-------1-------0]
+# p1 [-------3-------2]
+
+@counted
+def command_prd(wb, address, baddress, cmd):
+    wb.regs.sdram_dfii_pi0_address.write(address)
+    wb.regs.sdram_dfii_pi0_baddress.write(baddress)
+    wb.regs.sdram_dfii_pi0_command.write(cmd)
+    wb.regs.sdram_dfii_pi0_command_issue.write(1)
+
+@counted
+def command_pwr(wb, address, baddress, cmd):
+    wb.regs.sdram_dfii_pi1_address.write(address)
+    wb.regs.sdram_dfii_pi1_baddress.write(baddress)
+    wb.regs.sdram_dfii_pi1_command.write(cmd)
+    wb.regs.sdram_dfii_pi1_command_issue.write(1)
+
+def dq_beats(p0, p1, j):
+    # the 4 beats of DQ j captured in one cycle, first beat in bit 0
+    dq = 0
+    dq |= (p1 >> (16 + j)) & 0b1
+    dq <<= 1
+    dq |= (p1 >> (0 + j)) & 0b1
+    dq <<= 1
+    dq |= (p0 >> (16 + j)) & 0b1
+    dq <<= 1
+    dq |= (p0 >> (0 + j)) & 0b1
+    return dq
@@ -0,0 +1,218 @@
+import sys
+import time
+
+from bulk import read_addrs, write_reads
+from sdram_helpers import *
+from csr_shadow import scope
+
+# DDRAM Read Leveling-------------------------------------------------------------------------------
+
+# The MPR pattern is sent MSB first: the 4 beats captured in one cycle for every DQ must read as
+# the first 4 bits of MPR_PATTERN (first beat in bit 0, as returned by dq_beats).
+MPR_BEATS = sum(((MPR_PATTERN >> (7 - k)) & 0b1) << k for k in range(4))
+
+def widest_window(scan):
+    # (start, width) of the longest run of passing taps
+    best_start, best_width = 0, 0
+    start = None
+    for i, ok in enumerate(scan + [False]):
+        if ok and start is None:
+            start = i
+        elif not ok and start is not None:
+            if i - start > best_width:
+                best_start, best_width = start, i - start
+            start = None
+    return best_start, best_width
+
+
+def combine_regs(regs, datas):
+    # register values from the words read for them (csr_data_width words per register, MSB first)
+    values = []
+    n = 0
+    for reg in regs:
+        value = 0
+        for data in datas[n:n+reg.length]:
+            value = (value << reg.data_width) | int(data)
+        values.append(value)
+        n += reg.length
+    return values
+
+
+class DDRAMReadLeveling:
+    def __init__(self, wb, samples=1, hardware=None):
+        self.wb = wb
+        self.samples = samples
+        # on-chip scanner (ReadLevelingScanner) when the gateware has one
+        self.hardware = hasattr(wb.regs, "rdlvl_start") if hardware is None else hardware
+
+    def enable_mpr(self):
+        ddram_mr_write(self.wb, 3, MPR_SEL | MPR_ENABLE)
+
+    def disable_mpr(self):
+        ddram_mr_write(self.wb, 3, 0)
+
+    def check(self):
+        # MPR read: one bool per byte group, True when all 8 DQs return the pattern on all samples
+        wb = self.wb
+        regs = [wb.regs.sdram_dfii_pi0_rddata, wb.regs.sdram_dfii_pi1_rddata]
+        ok = [True]*N_BYTE_GROUPS
+        for k in range(self.samples):
+            command_prd(wb, 0, 0, dfii_command_cas|dfii_command_cs|dfii_command_rddata)
+            datas = read_addrs(wb, [reg.addr + 4*j for reg in regs for j in range(reg.length)])
+            p0, p1 = combine_regs(regs, datas)
+            for i in range(N_BYTE_GROUPS):
+                for j in range(8*i, 8*(i + 1)):
+                    if dq_beats(p0, p1, j) != MPR_BEATS:
+                        ok[i] = False
+        return ok
+
+    def scan(self):
+        # All byte groups are selected together so each (bitslip, rdelay) point costs one MPR read.
+        # rdelay only moves forward with rdly_dq_inc: no reset/re-increment between points.
+        wb = self.wb
+        scans = [[[False]*NDELAYS for b in range(NBITSLIPS)] for i in range(N_BYTE_GROUPS)]
+        wb.regs.ddrphy_dly_sel.write(2**N_BYTE_GROUPS - 1)
+        for b in range(NBITSLIPS):
+            wb.regs.ddrphy_rdly_dq_bitslip_rst.write(1)
+            for k in range(b):
+                wb.regs.ddrphy_rdly_dq_bitslip.write(1)
+            wb.regs.ddrphy_rdly_dq_rst.write(1)
+            for d in range(NDELAYS):
+                if d:
+                    wb.regs.ddrphy_rdly_dq_inc.write(1)
+                for i, ok in enumerate(self.check()):
+                    scans[i][b][d] = ok
+        wb.regs.ddrphy_dly_sel.write(0)
+        return scans
+
+    def hardware_scan(self):
+        # one start, one done poll and one result register per byte group
+        wb = self.wb
+        wb.regs.rdlvl_samples.write(self.samples)
+        wb.regs.rdlvl_start.write(1)
+        while not wb.regs.rdlvl_done.read():
+            pass
+        scans = []
+        for i in range(N_BYTE_GROUPS):
+            result = getattr(wb.regs, "rdlvl_result_m{}".format(i)).read()
+            scans.append([[bool((result >> (b*NDELAYS + d)) & 0b1) for d in range(NDELAYS)]
+                for b in range(NBITSLIPS)])
+        return scans
+
+    def run(self):
+        print("Read leveling...")
+        with scope(self.wb, "DDRAMReadLeveling.scan"):
+            self.enable_mpr()
+            scans = self.hardware_scan() if self.hardware else self.scan()
+            self.disable_mpr()
+
+        results = []
+        for i in range(N_BYTE_GROUPS):
+            best = (0, 0, 0) # bitslip, start, width
+            for b in range(NBITSLIPS):
+                start, width = widest_window(scans[i][b])
+                print("m{} bitslip {}: {}".format(i, b, "".join(str(int(ok)) for ok in scans[i][b])))
+                if width > best[2]:
+                    best = (b, start, width)
+            bitslip, start, width = best
+            rdelay = start + (width - 1)//2
+            if width == 0:
+                print("m{}: no passing window".format(i))
+                bitslip, rdelay = 0, 0
+            print("m{}: bitslip {} rdelay {} eye {}".format(i, bitslip, rdelay, width))
+            ddram_set_group_rdelay(self.wb, i, bitslip, rdelay)
+            results.append({"bitslip": bitslip, "rdelay": rdelay, "eye": width})
+        sys.stdout.flush()
+        return results
+
+# DDRAM Write Leveling------------------------------------------------------------------------------
+
+def last_rising_edge(scan):
+    # last tap where the scan goes from 0 to 1, None when there is none
+    edge = None
+    for j in range(1, len(scan)):
+        if not scan[j - 1] and scan[j]:
+            edge = j
+    return edge
+
+
+class DDRAMWriteLeveling:
+    def __init__(self, wb, samples=64):
+        self.wb = wb
+        self.samples = samples
+
+    def enable(self):
+        ddram_mr_write(self.wb, 1, ddrx_mr1 | MR1_WLEVEL)
+        self.wb.regs.ddrphy_wlevel_en.write(1)
+
+    def disable(self):
+        ddram_mr_write(self.wb, 1, ddrx_mr1)
+        self.wb.regs.ddrphy_wlevel_en.write(0)
+
+    def sample(self):
+        # samples strobes, each a strobe write and a rddata read in one record so the client can
+        # keep them all in flight: number of 1s seen on the prime DQ (first DQ) of each byte group
+        wb = self.wb
+        strobe = wb.regs.ddrphy_wlevel_strobe
+        rddata = wb.regs.sdram_dfii_pi0_rddata
+        addrs = [rddata.addr + 4*k for k in range(rddata.length)]
+        ones = [0]*N_BYTE_GROUPS
+        for datas in write_reads(wb, [(strobe.addr, [1], addrs)]*self.samples):
+            dq = 0
+            for data in datas:
+                dq = (dq << rddata.data_width) | int(data)
+            for i in range(N_BYTE_GROUPS):
+                ones[i] += (dq >> 8*i) & 0b1
+        return ones
+
+    def scan(self, dqs_taps=0):
+        # All byte groups are selected together so each tap costs one batch of strobes. The write
+        # delays only move forward with wdly_*_inc: no reset/re-increment between taps. DQS starts
+        # from dqs_taps, as in ddram_set_group_wdelay.
+        wb = self.wb
+        ones = [[0]*NDELAYS for i in range(N_BYTE_GROUPS)]
+        wb.regs.ddrphy_dly_sel.write(DLY_SEL_ALL)
+        wb.regs.ddrphy_wdly_dq_rst.write(1)
+        wb.regs.ddrphy_wdly_dqs_rst.write(1)
+        for i in range(dqs_taps):
+            wb.regs.ddrphy_wdly_dqs_inc.write(1)
+        for d in range(NDELAYS):
+            if d:
+                wb.regs.ddrphy_wdly_dq_inc.write(1)
+                wb.regs.ddrphy_wdly_dqs_inc.write(1)
+            for i, n in enumerate(self.sample()):
+                ones[i][d] = n
+        wb.regs.ddrphy_dly_sel.write(0)
+        return ones
+
+    def run(self):
+        print("Write leveling...")
+        if not ddram_has_wlevel(self.wb):
+            print("PHY has no write leveling")
+            return None
+        dqs_taps = self.wb.regs.ddrphy_wdly_dqs_taps.read()
+        with scope(self.wb, "DDRAMWriteLeveling.scan"):
+            start = time.time()
+            self.enable()
+            ones = self.scan(dqs_taps)
+            self.disable()
+            duration = time.time() - start
+        print("{:d} strobes per tap, {:.0f} strobes/s".format(self.samples,
+            NDELAYS*self.samples/duration))
+
+        results = []
+        for i in range(N_BYTE_GROUPS):
+            # majority vote per tap, taps with a split vote are the jitter around the edge
+            scan = [2*n > self.samples for n in ones[i]]
+            edge = last_rising_edge(scan)
+            jitter = sum(0 < n < self.samples for n in ones[i])
+            print("m{}: {} ({})".format(i, "".join(str(int(v)) for v in scan),
+                " ".join("{:d}/{:d}".format(n, self.samples) for n in ones[i])))
+            if edge is None:
+                print("m{}: no 0->1 transition".format(i))
+            wdelay = 0 if edge is None else edge
+            print("m{}: wdelay {} jitter {} taps".format(i, wdelay, jitter))
+            ddram_set_group_wdelay(self.wb, i, wdelay, dqs_taps)
+            results.append({"wdelay": wdelay, "dqs_taps": dqs_taps, "jitter": jitter, "ones": ones[i]})
+        sys.stdout.flush()
+        return results
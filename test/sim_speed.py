@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import time
+import argparse
+
+from bridge import add_bridge_args, get_bridge
+
+# Reports the simulator throughput (simulated sys_clk cycles per wall-clock second) of the
+# simulation SoC (./versa_ecp5.py sim ...).
+
+def read_cycles(wb):
+    wb.regs.sim_cycles_latch.write(1)
+    return wb.regs.sim_cycles_cycles.read()
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated cycles per second")
+    add_bridge_args(parser)
+    parser.add_argument("--duration", default=5.0, type=float, help="measurement duration (s)")
+    args = parser.parse_args()
+
+    wb = get_bridge(args)
+    wb.open()
+
+    start_cycles = read_cycles(wb)
+    start = time.time()
+    time.sleep(args.duration)
+    cycles = read_cycles(wb) - start_cycles
+    duration = time.time() - start
+    print("{:d} cycles in {:.2f} s: {:.1f} cycles/s".format(cycles, duration, cycles/duration))
+
+    wb.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
 
-from litex import RemoteClient
+import argparse
+
+from bridge import add_bridge_args, get_bridge
 
 from litescope.software.driver.analyzer import LiteScopeAnalyzerDriver
 
-wb = RemoteClient()
+parser = argparse.ArgumentParser(description="Capture DFI signals with LiteScope")
+add_bridge_args(parser)
+args = parser.parse_args()
+
+wb = get_bridge(args)
 wb.open()
 
 # # #
@@ -0,0 +1,82 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from bist_stream import *
+
+# Helpers ------------------------------------------------------------------------------------------
+
+RECORDS = [(9, 1000, 1100, 4096, 0), (19, 1010, 1090, 4096, 2), (29, 990, 1120, 4096, 0)]
+
+def loops(records):
+    return [int(loop) for loop in records["loop"]]
+
+def decode_chunks(data, chunks):
+    # decodes data received in chunks as main() does: the undecoded tail is kept for the next one
+    buf = b""
+    records = []
+    for i in range(len(chunks) - 1):
+        buf += data[chunks[i]:chunks[i + 1]]
+        r, consumed = decode(buf)
+        buf = buf[consumed:]
+        records += loops(r)
+    return records
+
+# Decode -------------------------------------------------------------------------------------------
+
+def test_decode_records():
+    records, consumed = decode(encode(RECORDS))
+    assert loops(records) == [9, 19, 29]
+    assert list(records["errors"]) == [0, 2, 0]
+    assert consumed == 3*record_dtype.itemsize
+
+def test_decode_skips_console_text():
+    data = b"sdram_bist_stream: binary records until a key is pressed\n" + encode(RECORDS[:2]) + \
+        b"\nsdram_bist_stream: end\nRUNTIME>" + encode(RECORDS[2:])
+    records, consumed = decode(data)
+    assert loops(records) == [9, 19, 29]
+    assert consumed == len(data)
+
+def test_decode_drops_corrupted_record():
+    data = bytearray(encode(RECORDS))
+    # a damaged tick count in the second record, a damaged sync word in the third
+    data[record_dtype.itemsize + 10] ^= 0x01
+    data[2*record_dtype.itemsize] ^= 0x80
+    records, consumed = decode(bytes(data))
+    assert loops(records) == [9]
+
+def test_decode_sync_inside_record():
+    # sync words in the payload of a record do not start other records
+    data = encode([(RECORD_SYNC, RECORD_SYNC, RECORD_SYNC, RECORD_SYNC, RECORD_SYNC)] + RECORDS[:1])
+    records, consumed = decode(data)
+    assert loops(records) == [RECORD_SYNC, 9]
+
+@pytest.mark.parametrize("length", [0, 3, 4, 20, 39])
+def test_decode_truncated(length):
+    # a partial record is not decoded and not consumed, the rest of it completes it
+    second = encode(RECORDS[1:2])
+    records, consumed = decode(encode(RECORDS[:1]) + second[:length])
+    assert loops(records) == [9]
+    assert consumed == record_dtype.itemsize
+    records, consumed = decode(second[:length] + second[length:])
+    assert loops(records) == [19]
+
+def test_decode_any_split():
+    # a stream cut anywhere, or byte by byte, decodes as a whole
+    data = b"text\n" + encode(RECORDS) + b"more text"
+    for split in range(len(data) + 1):
+        assert decode_chunks(data, [0, split, len(data)]) == [9, 19, 29]
+    assert decode_chunks(data, list(range(len(data) + 1))) == [9, 19, 29]
+
+# Statistics ---------------------------------------------------------------------------------------
+
+def test_stats_header_and_end():
+    stats = Stats()
+    data = encode([(RECORD_HEADER, 75000000, 128, 0, 0)] + RECORDS + [(RECORD_END, 30, 0, 3*4096, 2)])
+    records, consumed = decode(data)
+    assert loops(stats.add(records)) == [9, 19, 29]
+    assert stats.clk_freq == 75000000
+    assert stats.ended
+    assert stats.total_length == 3*4096 and stats.total_errors == 2
+    r = stats.rolling()
+    assert r["loop"] == 29 and r["errors"] == 2
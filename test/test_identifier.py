@@ -1,19 +1,20 @@
 #!/usr/bin/env python3
 
-from litex import RemoteClient
+import argparse
 
-wb = RemoteClient()
+from bridge import add_bridge_args, get_bridge, get_identifier
+
+parser = argparse.ArgumentParser(description="Read the FPGA identifier")
+add_bridge_args(parser)
+args = parser.parse_args()
+
+wb = get_bridge(args)
 wb.open()
 
 # # #
 
 # get identifier
-fpga_id = ""
-for i in range(256):
-    c = chr(wb.read(wb.bases.identifier_mem + 4*i) & 0xff)
-    fpga_id += c
-    if c == "\0":
-        break
+fpga_id = get_identifier(wb)
 print("fpga_id: " + fpga_id)
 
 # # #
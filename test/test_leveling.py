@@ -0,0 +1,123 @@
+import random
+
+import pytest
+
+# sdram_helpers needs the sdram_init.py of a versa_ecp5.py build
+pytest.importorskip("sdram_init")
+
+from sdram_helpers import N_BYTE_GROUPS
+from sdram_leveling import DDRAMWriteLeveling, last_rising_edge
+
+# Write leveling model -----------------------------------------------------------------------------
+
+# CSRs of SimDDRPHY and the DFI seen by DDRAMWriteLeveling: a DQS delay per byte group and the CK
+# level sampled on each strobe on the prime DQ of the group. Around the edge the sample is noisy:
+# ones with probability NOISE[0] on the tap before the edge, NOISE[1] on the edge tap.
+
+WLEVEL_REGS = ["ddrphy_wlevel_en", "ddrphy_wlevel_strobe", "ddrphy_wdly_dq_rst", "ddrphy_wdly_dqs_rst",
+    "ddrphy_wdly_dq_inc", "ddrphy_wdly_dqs_inc", "ddrphy_wdly_dqs_taps"]
+DFII_REGS = ["ddrphy_dly_sel", "sdram_dfii_pi0_address", "sdram_dfii_pi0_baddress",
+    "sdram_dfii_pi0_command", "sdram_dfii_pi0_command_issue", "sdram_dfii_pi0_rddata"]
+NOISE = (0.3, 0.7)
+
+class Register:
+    def __init__(self, model, name, addr):
+        self.model = model
+        self.name = name
+        self.addr = addr
+        self.length = 1
+        self.data_width = 32
+        self.mode = "rw"
+
+    def read(self):
+        return self.model.read(self.addr)
+
+    def write(self, value):
+        self.model.write(self.addr, value)
+
+class Regs:
+    def __init__(self, regs):
+        self.__dict__.update(regs)
+
+class WriteLevelingModel:
+    def __init__(self, edges, dqs_taps=0, wlevel=True, seed=0):
+        self.edges = edges
+        self.dqs_taps = dqs_taps
+        self.rng = random.Random(seed)
+        self.names = {}
+        for name in DFII_REGS + (WLEVEL_REGS if wlevel else []):
+            self.names[0xe0000000 + 4*len(self.names)] = name
+        self.regs = Regs({name: Register(self, name, addr) for addr, name in self.names.items()})
+        self.sel = 0
+        self.en = 0
+        self.dqs = [0]*N_BYTE_GROUPS
+        self.dq = [0]*N_BYTE_GROUPS
+        self.rddata = 0
+
+    def sample(self, group):
+        tap = self.dqs[group]
+        edge = self.edges[group]
+        if tap == edge - 1:
+            return int(self.rng.random() < NOISE[0])
+        if tap == edge:
+            return int(self.rng.random() < NOISE[1])
+        return int(tap > edge)
+
+    def read(self, addr, length=None):
+        name = self.names[addr]
+        if name == "sdram_dfii_pi0_rddata":
+            return self.rddata
+        if name == "ddrphy_wdly_dqs_taps":
+            return self.dqs_taps
+        return 0
+
+    def write(self, addr, datas):
+        value = datas[-1] if isinstance(datas, list) else datas
+        name = self.names[addr]
+        groups = [i for i in range(N_BYTE_GROUPS) if self.sel & (1 << i)]
+        if name == "ddrphy_dly_sel":
+            self.sel = value
+        elif name == "ddrphy_wlevel_en":
+            self.en = value
+        elif name == "ddrphy_wdly_dqs_rst":
+            for i in groups:
+                self.dqs[i] = 0
+        elif name == "ddrphy_wdly_dqs_inc":
+            for i in groups:
+                self.dqs[i] += 1
+        elif name == "ddrphy_wdly_dq_rst":
+            for i in groups:
+                self.dq[i] = 0
+        elif name == "ddrphy_wdly_dq_inc":
+            for i in groups:
+                self.dq[i] += 1
+        elif name == "ddrphy_wlevel_strobe" and self.en:
+            self.rddata = 0
+            for i in range(N_BYTE_GROUPS):
+                self.rddata |= self.sample(i) << 8*i
+
+# Tests --------------------------------------------------------------------------------------------
+
+def test_last_rising_edge():
+    assert last_rising_edge([False, True, False, False, True, True]) == 4
+    assert last_rising_edge([True, True, True]) is None
+    assert last_rising_edge([False, False]) is None
+
+@pytest.mark.parametrize("dqs_taps", [0, 2])
+def test_write_leveling_noisy_strobes(dqs_taps):
+    # edges in DQS taps past dqs_taps: the vote must land on the edge tap whatever the noise does on
+    # single strobes, and the delays are left there
+    model = WriteLevelingModel(edges=[dqs_taps + 3, dqs_taps + 5], dqs_taps=dqs_taps)
+    results = DDRAMWriteLeveling(model, samples=64).run()
+    assert [r["wdelay"] for r in results] == [3, 5]
+    assert [r["jitter"] for r in results] == [2, 2]
+    assert all(r["dqs_taps"] == dqs_taps for r in results)
+    assert model.dqs == [dqs_taps + 3, dqs_taps + 5]
+    assert model.dq == [3, 5]
+    assert model.en == 0 and model.sel == 0
+
+def test_write_leveling_without_phy_csrs():
+    # ECP5DDRPHY: no wlevel/wdly CSRs, nothing is written
+    model = WriteLevelingModel(edges=[3, 5], wlevel=False)
+    assert DDRAMWriteLeveling(model).run() is None
+    assert model.sel == 0 and model.rddata == 0
@@ -0,0 +1,79 @@
+import os
+import socket
+import argparse
+import threading
+
+import pytest
+
+from netboot import *
+
+# Helpers ------------------------------------------------------------------------------------------
+
+def free_port():
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+def load_args(target, tftp_port, force=False):
+    return argparse.Namespace(target="127.0.0.1", port=target.port, force=force, bind="127.0.0.1",
+        tftp_port=tftp_port, timeout=5.0, boot_timeout=5.0)
+
+# TFTP ---------------------------------------------------------------------------------------------
+
+@pytest.mark.parametrize("length", [0, 100, TFTP_BLOCK, 3*TFTP_BLOCK + 1])
+def test_tftp_transfer(length):
+    # final short block, empty when the image is a multiple of the block size
+    image = os.urandom(length)
+    server = TFTPServer(image, "127.0.0.1", 0)
+    clients = []
+    thread = threading.Thread(target=lambda: clients.append(server.serve(5.0)))
+    thread.start()
+    assert tftp_get(("127.0.0.1", server.port)) == image
+    thread.join()
+    server.close()
+    assert clients[0] is not None
+
+def test_tftp_file_not_found():
+    server = TFTPServer(b"image", "127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve, args=(1.0,))
+    thread.start()
+    with pytest.raises(IOError, match="file not found"):
+        tftp_get(("127.0.0.1", server.port), filename="other.bin")
+    thread.join()
+    server.close()
+
+# Load ---------------------------------------------------------------------------------------------
+
+def test_load_skips_unchanged_image(capsys):
+    tftp_port = free_port()
+    target = FakeTarget(("127.0.0.1", tftp_port))
+    target.start()
+    image = os.urandom(10*TFTP_BLOCK + 17)
+
+    assert load(image, load_args(target, tftp_port))
+    assert target.image == image
+    assert query("127.0.0.1", target.port) == image_info(image)
+    assert "target booted the new image" in capsys.readouterr().out
+
+    # same length and crc32: no reboot, no TFTP server
+    assert load(image, load_args(target, tftp_port))
+    assert "skipping upload" in capsys.readouterr().out
+
+    # changed image: the target is rebooted and fetches it
+    image = image[:-1] + bytes([image[-1] ^ 0xff])
+    assert load(image, load_args(target, tftp_port))
+    assert target.image == image
+    assert "rebooting it" in capsys.readouterr().out
+
+def test_load_force(capsys):
+    tftp_port = free_port()
+    image = os.urandom(TFTP_BLOCK)
+    target = FakeTarget(("127.0.0.1", tftp_port), image=image)
+    target.start()
+    # forced: no info request, the server waits for the BIOS request, sent here by a reboot
+    threading.Timer(0.2, reboot, args=("127.0.0.1", target.port)).start()
+    assert load(image, load_args(target, tftp_port, force=True))
+    out = capsys.readouterr().out
+    assert "skipping upload" not in out and "waiting for the BIOS netboot request" in out
@@ -0,0 +1,51 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from udp_bench import *
+
+# about 20k packets/s: no drop by the loopback interface itself
+PERIOD = 6650
+
+# Statistics ---------------------------------------------------------------------------------------
+
+def test_packet_seqs():
+    packets = make_packets(1000, 5, 64)
+    assert packets.shape == (5, 64)
+    assert packet_seqs([p.tobytes() for p in packets]) == [1000, 1001, 1002, 1003, 1004]
+    assert list(packets[0, 4:8]) == [4, 5, 6, 7]
+
+def test_sequence_stats():
+    assert sequence_stats([0, 1, 2, 3]) == {"received": 4, "unique": 4, "duplicates": 0, "lost": 0,
+        "reordered": 0}
+    # 2 and 6 lost, 4 late, 3 received twice (late, not reordered)
+    assert sequence_stats([0, 1, 3, 5, 4, 3, 7], expected=8) == {"received": 7, "unique": 6,
+        "duplicates": 1, "lost": 2, "reordered": 1}
+    assert sequence_stats([], expected=10)["lost"] == 10
+
+# Loopback -----------------------------------------------------------------------------------------
+
+@pytest.mark.parametrize("batched", [True, False])
+def test_host_to_streamer(batched):
+    streamer = LoopbackStreamer()
+    r = host_to_streamer(streamer, "127.0.0.1", 2000, 256, rate=50, batched=batched, settle=0.2)
+    assert r["received"] == 2000
+    assert r["lost"] == 0 and r["reordered"] == 0
+    assert streamer.rx()["bytes"] == 2000*256
+
+@pytest.mark.parametrize("batched", [True, False])
+def test_streamer_to_host(batched):
+    streamer = LoopbackStreamer()
+    r = streamer_to_host(streamer, "127.0.0.1", 2000, 256, PERIOD, batched=batched, idle=0.2)
+    assert r["sent"] == 2000
+    assert r["received"] == 2000 and r["unique"] == 2000
+    assert r["lost"] == 0 and r["reordered"] == 0 and r["duplicates"] == 0
+
+def test_streamer_to_host_injected():
+    # the loss and reordering injected by the streamer are the ones counted by the host
+    streamer = LoopbackStreamer(loss=0.05, reorder=0.05, seed=1)
+    r = streamer_to_host(streamer, "127.0.0.1", 2000, 256, PERIOD, idle=0.2)
+    assert streamer.injected["lost"] > 0 and streamer.injected["reordered"] > 0
+    assert r["lost"] == streamer.injected["lost"]
+    assert r["reordered"] == streamer.injected["reordered"]
+    assert r["received"] == 2000 - streamer.injected["lost"]
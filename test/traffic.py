@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import argparse
+
+from bridge import add_bridge_args, get_bridge
+from sdram_cores import SDRAMCore, bandwidth_mbps
+
+# Crossbar scaling benchmark: runs 1..N of the SDRAMTraffic generator/checker pairs of the bist_test
+# SoC together (each pair on its own crossbar port and SDRAM region) and reports per-pair and
+# aggregate bandwidth and read latency.
+
+# Traffic ------------------------------------------------------------------------------------------
+
+MODE_WRITE = 0b01
+MODE_READ  = 0b10
+
+modes = {
+    "write": MODE_WRITE,
+    "read":  MODE_READ,
+    "both":  MODE_WRITE | MODE_READ,
+}
+
+class SDRAMTraffic(SDRAMCore):
+    def __init__(self, wb, clk_freq):
+        SDRAMCore.__init__(self, wb, "sdram_traffic")
+        self.clk_freq = clk_freq
+        self.npairs = wb.constants.sdram_traffic_pairs
+        self.nbytes = wb.constants.sdram_traffic_data_width//8
+
+    def speed(self, length, ticks):
+        return bandwidth_mbps(length, ticks, self.clk_freq)
+
+    def run(self, pairs, mode, offset, length, stride=None):
+        # offset/length/stride in bytes, pair i tests [offset + i*stride, offset + i*stride + length)
+        stride = length if stride is None else stride
+        self.reg("pairs").write(pairs)
+        self.reg("mode").write(mode)
+        self.reg("base").write(offset//self.nbytes)
+        self.reg("stride").write(stride//self.nbytes)
+        self.reg("length").write(length//self.nbytes)
+        self.execute()
+        ticks = self.reg("ticks").read()
+        ports = []
+        for i in range(pairs):
+            self.reg("sel").write(i)
+            r = {n: self.reg(n).read() for n in ["wr_ticks", "rd_ticks", "errors", "latency_sum", "latency_max"]}
+            words = length//self.nbytes
+            ports.append({
+                "pair":        i,
+                "wr_mbps":     self.speed(length, r["wr_ticks"]) if mode & MODE_WRITE else None,
+                "rd_mbps":     self.speed(length, r["rd_ticks"]) if mode & MODE_READ else None,
+                "errors":      r["errors"],
+                "latency_avg": r["latency_sum"]/words if mode & MODE_READ else None,
+                "latency_max": r["latency_max"] if mode & MODE_READ else None,
+            })
+        accesses = pairs*length*((mode & MODE_WRITE != 0) + (mode & MODE_READ != 0))
+        return {
+            "pairs":    pairs,
+            "mode":     mode,
+            "length":   length,
+            "agg_mbps": self.speed(accesses, ticks),
+            "errors":   sum(p["errors"] for p in ports),
+            "ports":    ports,
+        }
+
+# Run ----------------------------------------------------------------------------------------------
+
+def fmt(value, spec):
+    return spec.format(value) if value is not None else "{:>{}s}".format("-", len(spec.format(0)))
+
+def main():
+    parser = argparse.ArgumentParser(description="SDRAM crossbar scaling benchmark")
+    add_bridge_args(parser)
+    parser.add_argument("--pairs", default=None, help="comma separated pair counts (default: 1..all)")
+    parser.add_argument("--mode", default="both", choices=modes.keys(), help="write, read or write then read")
+    parser.add_argument("--offset", default=0x00100000, type=lambda s: int(s, 0), help="first byte tested")
+    parser.add_argument("--length", default=0x00100000, type=lambda s: int(s, 0), help="bytes per pair")
+    parser.add_argument("--stride", default=None, type=lambda s: int(s, 0), help="bytes between pair regions (default: length)")
+    parser.add_argument("--sys-clk-freq", default=None, type=float, help="override the CSR map clock frequency")
+    parser.add_argument("--json", default=None, help="also write the results to a JSON file")
+    args = parser.parse_args()
+
+    wb = get_bridge(args)
+    wb.open()
+
+    clk_freq = args.sys_clk_freq or wb.constants.system_clock_frequency
+    traffic = SDRAMTraffic(wb, clk_freq)
+    counts = range(1, traffic.npairs + 1) if args.pairs is None else [int(n) for n in args.pairs.split(",")]
+    results = []
+    print("{:>5s} {:>4s} {:>12s} {:>12s} {:>10s} {:>10s} {:>8s}".format(
+        "pairs", "pair", "WR(Mbps)", "RD(Mbps)", "LAT_AVG", "LAT_MAX", "ERRORS"))
+    for pairs in counts:
+        r = traffic.run(pairs, modes[args.mode], args.offset, args.length, args.stride)
+        results.append(r)
+        for p in r["ports"]:
+            print("{:5d} {:4d} {} {} {} {} {:8d}".format(pairs, p["pair"], fmt(p["wr_mbps"], "{:12.1f}"),
+                fmt(p["rd_mbps"], "{:12.1f}"), fmt(p["latency_avg"], "{:10.1f}"),
+                fmt(p["latency_max"], "{:10d}"), p["errors"]))
+        print("{:5d} {:>4s} aggregate {:.1f} Mbps, {:.1f} ns average read latency".format(pairs, "all",
+            r["agg_mbps"], 1e9*sum(p["latency_avg"] or 0 for p in r["ports"])/(pairs*clk_freq)))
+        sys.stdout.flush()
+
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump({"clk_freq": clk_freq, "results": results}, f, indent=4)
+
+    wb.close()
+    exit(0 if all(r["errors"] == 0 for r in results) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import random
+import select
+import socket
+import ctypes
+import argparse
+import threading
+
+import numpy as np
+
+# UDP throughput benchmark for the UDPStreamer of the rgmii_test SoC (versa_ecp5.py): the host sends
+# sequence numbered packets to the streamer (loss/reordering counted by the gateware), then the
+# streamer sends to the host (counted here). Socket calls are batched with sendmmsg/recvmmsg.
+
+# Batched Sockets ----------------------------------------------------------------------------------
+
+class iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+class msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name",       ctypes.c_void_p),
+        ("msg_namelen",    ctypes.c_uint32),
+        ("msg_iov",        ctypes.POINTER(iovec)),
+        ("msg_iovlen",     ctypes.c_size_t),
+        ("msg_control",    ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags",      ctypes.c_int),
+    ]
+
+class mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", msghdr), ("msg_len", ctypes.c_uint)]
+
+MSG_DONTWAIT = 0x40
+
+try:
+    libc = ctypes.CDLL(None, use_errno=True)
+    sendmmsg = libc.sendmmsg
+    recvmmsg = libc.recvmmsg
+except (OSError, AttributeError):
+    sendmmsg = recvmmsg = None
+
+class BatchSocket:
+    # connected UDP socket sending/receiving up to batch datagrams of at most size bytes per call,
+    # one call per datagram when sendmmsg/recvmmsg are not available (or batched=False)
+    def __init__(self, sock, batch=64, size=2048, batched=True):
+        self.sock = sock
+        self.batch = batch
+        self.size = size
+        self.batched = batched and sendmmsg is not None
+        self.buf = np.zeros((batch, size), dtype=np.uint8)
+        self.iovs = (iovec*batch)()
+        self.msgs = (mmsghdr*batch)()
+        base = self.buf.ctypes.data
+        for i in range(batch):
+            self.iovs[i].iov_base = base + i*size
+            self.iovs[i].iov_len = size
+            self.msgs[i].msg_hdr.msg_iov = ctypes.pointer(self.iovs[i])
+            self.msgs[i].msg_hdr.msg_iovlen = 1
+
+    def send(self, packets, length):
+        # packets: (n, length) uint8 array, n <= batch, returns the number sent
+        n = len(packets)
+        if not self.batched:
+            for p in packets:
+                self.sock.send(p.tobytes())
+            return n
+        self.buf[:n, :length] = packets
+        for i in range(n):
+            self.iovs[i].iov_len = length
+        r = sendmmsg(self.sock.fileno(), self.msgs, n, 0)
+        if r < 0:
+            raise OSError(ctypes.get_errno(), "sendmmsg")
+        return r
+
+    def recv(self, timeout):
+        # returns a list of payloads (empty on timeout)
+        if not select.select([self.sock], [], [], timeout)[0]:
+            return []
+        if not self.batched:
+            packets = []
+            while len(packets) < self.batch:
+                try:
+                    packets.append(self.sock.recv(self.size, MSG_DONTWAIT))
+                except BlockingIOError:
+                    break
+            return packets
+        for i in range(self.batch):
+            self.iovs[i].iov_len = self.size
+        r = recvmmsg(self.sock.fileno(), self.msgs, self.batch, MSG_DONTWAIT, None)
+        if r < 0:
+            return []
+        return [self.buf[i, :self.msgs[i].msg_len].tobytes() for i in range(r)]
+
+# Statistics ---------------------------------------------------------------------------------------
+
+def sequence_stats(seqs, expected=None):
+    # seqs: received sequence numbers in arrival order, expected: packets sent (default: max + 1)
+    seqs = np.asarray(seqs, dtype=np.int64)
+    if not len(seqs):
+        return {"received": 0, "unique": 0, "duplicates": 0, "lost": expected or 0, "reordered": 0}
+    unique = len(np.unique(seqs))
+    expected = int(seqs.max()) + 1 if expected is None else expected
+    # late: arrives after a higher sequence number
+    highest = np.maximum.accumulate(seqs)
+    late = np.count_nonzero(seqs[1:] < highest[:-1])
+    return {
+        "received":   len(seqs),
+        "unique":     unique,
+        "duplicates": len(seqs) - unique,
+        "lost":       expected - unique,
+        "reordered":  int(late) - (len(seqs) - unique),
+    }
+
+def make_packets(start, n, length):
+    # n packets of length bytes, 32-bit big-endian sequence number then the byte index (as the
+    # streamer)
+    packets = np.tile(np.arange(length, dtype=np.uint32).astype(np.uint8), (n, 1))
+    seqs = np.arange(start, start + n, dtype=">u4").view(np.uint8).reshape(n, 4)
+    packets[:, :min(4, length)] = seqs[:, :min(4, length)]
+    return packets
+
+def packet_seqs(packets):
+    return [int.from_bytes(p[:4], "big") for p in packets if len(p) >= 4]
+
+# Streamers ----------------------------------------------------------------------------------------
+
+class HardwareStreamer:
+    def __init__(self, wb, clk_freq=None):
+        self.wb = wb
+        self.port = wb.constants.udp_streamer_port
+        self.clk_freq = clk_freq or wb.constants.system_clock_frequency
+
+    def reg(self, name):
+        return getattr(self.wb.regs, "udp_streamer_" + name)
+
+    def configure(self, ip, port, length, period, count):
+        self.reg("ip_address").write(int.from_bytes(socket.inet_aton(ip), "big"))
+        self.reg("dst_port").write(port)
+        self.reg("length").write(length)
+        self.reg("period").write(period)
+        self.reg("count").write(count)
+
+    def start(self):
+        self.reg("enable").write(1)
+
+    def stop(self):
+        self.reg("enable").write(0)
+
+    def sent(self):
+        return self.reg("tx_packets").read()
+
+    def clear(self):
+        self.reg("rx_clear").write(1)
+
+    def rx(self):
+        return {n: self.reg("rx_" + n).read() for n in ["packets", "bytes", "lost", "reordered"]}
+
+class LoopbackStreamer:
+    # UDPStreamer stand-in on localhost (same counters, period in cycles of clk_freq), with optional
+    # loss and reordering injected on its transmit path
+    def __init__(self, host="127.0.0.1", clk_freq=133e6, loss=0.0, reorder=0.0, seed=0):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.sock.bind((host, 0))
+        self.port = self.sock.getsockname()[1]
+        self.clk_freq = clk_freq
+        self.loss = loss
+        self.reorder = reorder
+        self.random = random.Random(seed)
+        self.config = None
+        self.tx_thread = None
+        self.enable = False
+        self.tx_packets = 0
+        self.injected = {"lost": 0, "reordered": 0}
+        self.clear()
+        threading.Thread(target=self.receive, daemon=True).start()
+
+    def configure(self, ip, port, length, period, count):
+        self.config = (ip, port, length, period, count)
+
+    def start(self):
+        self.enable = True
+        self.tx_packets = 0
+        self.tx_thread = threading.Thread(target=self.transmit, daemon=True)
+        self.tx_thread.start()
+
+    def stop(self):
+        self.enable = False
+        if self.tx_thread is not None:
+            self.tx_thread.join()
+
+    def sent(self):
+        return self.tx_packets
+
+    def clear(self):
+        self.counters = {"packets": 0, "bytes": 0, "lost": 0, "reordered": 0}
+        self.expected = 0
+
+    def rx(self):
+        return dict(self.counters)
+
+    def receive(self):
+        # sink: same checks as the gateware
+        rx = BatchSocket(self.sock)
+        while True:
+            for p in rx.recv(0.1):
+                seq = int.from_bytes(p[:4], "big")
+                self.counters["packets"] += 1
+                self.counters["bytes"] += len(p)
+                if seq >= self.expected:
+                    self.counters["lost"] += seq - self.expected
+                    self.expected = seq + 1
+                else:
+                    self.counters["reordered"] += 1
+
+    def transmit(self):
+        ip, port, length, period, count = self.config
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.connect((ip, port))
+        tx = BatchSocket(s)
+        seq = 0
+        held = None
+        start = time.time()
+        while self.enable and (count == 0 or seq < count):
+            n = tx.batch if count == 0 else min(tx.batch, count - seq)
+            packets = make_packets(seq, n, length)
+            seq += n
+            keep = []
+            for p in packets:
+                if self.random.random() < self.loss:
+                    self.injected["lost"] += 1
+                    continue
+                if held is None and self.random.random() < self.reorder:
+                    held = p
+                    continue
+                keep.append(p)
+                if held is not None:
+                    self.injected["reordered"] += 1
+                    keep.append(held)
+                    held = None
+            for i in range(0, len(keep), tx.batch):
+                tx.send(np.stack(keep[i:i + tx.batch]), length)
+            self.tx_packets = seq
+            if period:
+                delay = start + seq*period/self.clk_freq - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+        if held is not None:
+            tx.send(np.stack([held]), length)
+        s.close()
+
+# Benchmarks ---------------------------------------------------------------------------------------
+
+def host_to_streamer(streamer, ip, count, length, rate=None, batched=True, settle=0.5):
+    # host sends count packets (at rate Mbps, default: as fast as possible), streamer counts them
+    streamer.clear()
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 22)
+    s.connect((ip, streamer.port))
+    tx = BatchSocket(s, batched=batched)
+    start = time.time()
+    seq = 0
+    while seq < count:
+        n = min(tx.batch, count - seq)
+        try:
+            seq += tx.send(make_packets(seq, n, length), length)
+        except (BlockingIOError, OSError):
+            time.sleep(1e-4)
+        if rate is not None:
+            delay = start + 8*seq*length/(rate*1e6) - time.time()
+            if delay > 0:
+                time.sleep(delay)
+    duration = time.time() - start
+    s.close()
+    time.sleep(settle)
+    rx = streamer.rx()
+    return {
+        "direction":  "host->streamer",
+        "sent":       count,
+        "received":   rx["packets"],
+        # a reordered packet was also counted as lost when it was skipped
+        "lost":       count - rx["packets"],
+        "reordered":  rx["reordered"],
+        "duration":   duration,
+        "mbps":       8*count*length/(duration*1e6),
+        "rx_mbps":    8*rx["bytes"]/(duration*1e6),
+    }
+
+def streamer_to_host(streamer, local_ip, count, length, period=0, batched=True, idle=0.5):
+    # streamer sends count packets to the host, received and checked here
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 24)
+    s.bind((local_ip, 0))
+    rx = BatchSocket(s, batched=batched)
+    streamer.configure(local_ip, s.getsockname()[1], length, period, count)
+    seqs = []
+    nbytes = 0
+    first = last = None
+    streamer.start()
+    while len(seqs) < count:
+        packets = rx.recv(idle)
+        if not packets:
+            break
+        last = time.time()
+        first = first or last
+        seqs += packet_seqs(packets)
+        nbytes += sum(len(p) for p in packets)
+    streamer.stop()
+    s.close()
+    duration = max((last or 0) - (first or 0), 1e-6)
+    return dict(sequence_stats(seqs, count),
+        direction = "streamer->host",
+        sent      = streamer.sent(),
+        duration  = duration,
+        mbps      = 8*nbytes/(duration*1e6))
+
+# Run ----------------------------------------------------------------------------------------------
+
+def report(r):
+    print("{:<16s} {:>9d} {:>9d} {:>7d} {:>9d} {:>8.3f} {:>9.1f}".format(r["direction"], r["sent"],
+        r["received"], r["lost"], r["reordered"], r["duration"], r["mbps"]))
+    sys.stdout.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description="UDP streamer throughput benchmark (rgmii_test)")
+    parser.add_argument("--ip", default="192.168.1.50", help="board IP address")
+    parser.add_argument("--port", default=1234, type=int, help="Etherbone port")
+    parser.add_argument("--csr-csv", default="csr.csv", help="CSR map of the loaded bitstream")
+    parser.add_argument("--local-ip", default="192.168.1.100", help="host IP the streamer sends to")
+    parser.add_argument("--length", default=1024, type=int, help="payload bytes per packet")
+    parser.add_argument("--count", default=100000, type=int, help="packets per direction")
+    parser.add_argument("--rate", default=None, type=float, help="host send rate (Mbps, default: max)")
+    parser.add_argument("--period", default=0, type=int, help="streamer cycles between packets (0: max)")
+    parser.add_argument("--direction", default="both", choices=["tx", "rx", "both"],
+        help="tx: host->streamer, rx: streamer->host")
+    parser.add_argument("--no-batch", action="store_true", help="one socket call per packet")
+    parser.add_argument("--loopback", action="store_true", help="run against a local streamer stand-in")
+    parser.add_argument("--loss", default=0.0, type=float, help="loopback: injected loss probability")
+    parser.add_argument("--reorder", default=0.0, type=float, help="loopback: injected reorder probability")
+    args = parser.parse_args()
+
+    if args.loopback:
+        args.ip = args.local_ip = "127.0.0.1"
+        streamer = LoopbackStreamer(args.ip, loss=args.loss, reorder=args.reorder)
+    else:
+        from bridge import EtherboneUDP
+        wb = EtherboneUDP(args.ip, args.port, csr_csv=args.csr_csv)
+        wb.open()
+        streamer = HardwareStreamer(wb)
+        streamer.stop()
+
+    batched = not args.no_batch
+    print("{:<16s} {:>9s} {:>9s} {:>7s} {:>9s} {:>8s} {:>9s}".format(
+        "direction", "sent", "received", "lost", "reordered", "time(s)", "Mbps"))
+    if args.direction in ["tx", "both"]:
+        report(host_to_streamer(streamer, args.ip, args.count, args.length, args.rate, batched))
+    if args.direction in ["rx", "both"]:
+        report(streamer_to_host(streamer, args.local_ip, args.count, args.length, args.period, batched))
+        if args.loopback:
+            print("injected: {lost:d} lost, {reordered:d} reordered".format(**streamer.injected))
+
+    if not args.loopback:
+        wb.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,20 @@
 #!/usr/bin/env python3
 
+import os
+import re
 import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
 import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
 
 from migen import *
+from migen.genlib.io import CRG
+from migen.genlib.fifo import SyncFIFO
 from migen.genlib.resetsync import AsyncResetSynchronizer
 
 from litex.build.generic_platform import *
@@ -14,21 +25,44 @@ from litex.soc.integration.soc_core import *
 from litex.soc.integration.soc_sdram import *
 from litex.soc.integration.builder import *
 from litex.soc.cores.uart import UARTWishboneBridge
+from litex.soc.cores.uart import RS232PHYModel, UART, WishboneStreamingBridge
 from litex.soc.interconnect import wishbone
+from litex.soc.interconnect.csr import *
+
+from litex.build.sim import SimPlatform
+from litex.build.sim.config import SimConfig
 
 from litedram.modules import MT41K64M16
+from litedram.common import PhySettings
 from litedram.phy import ECP5DDRPHY, ECP5DDRPHYInit
+from litedram.phy import dfi
+from litedram.phy.model import SDRAMPHYModel
 from litedram.init import get_sdram_phy_py_header
 from litedram.frontend.bist import LiteDRAMBISTGenerator
 from litedram.frontend.bist import LiteDRAMBISTChecker
+from litedram.frontend.bist import Generator
+from litedram.frontend.dma import LiteDRAMDMAReader
 
 from liteeth.common import *
 from liteeth.phy.ecp5rgmii import LiteEthPHYRGMII
 from liteeth.core.mac import LiteEthMAC
 from liteeth.core import LiteEthUDPIPCore
+from liteeth.frontend.etherbone import LiteEthEtherbone
 
 from litescope import LiteScopeAnalyzer
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "test"))
+from csr_fast import write_module
+
+# Helpers ------------------------------------------------------------------------------------------
+
+def generate_sdram_phy_py_header(soc, test_dir="test"):
+    f = open(os.path.join(test_dir, "sdram_init.py"), "w")
+    f.write(get_sdram_phy_py_header(
+        soc.sdram.controller.settings.phy,
+        soc.sdram.controller.settings.timing))
+    f.close()
+
 # DDR3TestCRG --------------------------------------------------------------------------------------
 
 class DDR3TestCRG(Module):
@@ -75,19 +109,267 @@ class DDR3TestCRG(Module):
             AsyncResetSynchronizer(self.cd_sys, ~por_done | ~pll.locked | ~rst_n)
         ]
 
+# Analyzer signals ---------------------------------------------------------------------------------
+
+def analyzer_signal_sets(ddrphy):
+    # named signal sets for --analyzer-signals, the capture width (and so the EBR usage for a given
+    # depth) is the sum of the selected sets
+    sets = {
+        "datavalid": [ddrphy.datavalid],
+        "burstdet":  [ddrphy.burstdet],
+    }
+    for n, phase in enumerate(ddrphy.dfi.phases):
+        sets["dfi_p{}".format(n)] = [phase]
+        sets["dfi_cmd_p{}".format(n)] = [phase.address, phase.bank, phase.cs_n, phase.cas_n,
+            phase.ras_n, phase.we_n, phase.cke, phase.odt, phase.reset_n]
+        sets["dfi_wr_p{}".format(n)] = [phase.wrdata_en, phase.wrdata, phase.wrdata_mask]
+        sets["dfi_rd_p{}".format(n)] = [phase.rddata_en, phase.rddata, phase.rddata_valid]
+    return sets
+
+def get_analyzer_signals(ddrphy, names):
+    sets = analyzer_signal_sets(ddrphy)
+    signals = []
+    for name in names.split(","):
+        if name not in sets:
+            raise ValueError("unknown analyzer signal set {}, supported: ({})".format(
+                name, ", ".join(sorted(sets.keys()))))
+        signals += sets[name]
+    return signals
+
+# Read delay controls ------------------------------------------------------------------------------
+
+# ECP5DDRPHY read delay CSRs (private to LiteDRAM): ScannableECP5DDRPHY checks them at build time, a
+# LiteDRAM that renames them fails the build instead of leaving the read delays undriven.
+ecp5ddrphy_read_delay_csrs = [
+    ("_dly_sel",             CSRStorage),
+    ("_rdly_dq_rst",         CSR),
+    ("_rdly_dq_inc",         CSR),
+    ("_rdly_dq_bitslip_rst", CSR),
+    ("_rdly_dq_bitslip",     CSR),
+]
+
+def add_read_delay_controls(phy, ngroups):
+    # Read delay inputs of the PHYs below, ORed with the ddrphy CSRs: rdly_rst, rdly_inc, bitslip_rst
+    # and bitslip are one cycle pulses, applied to the byte groups of dly_sel when dly_sel_override
+    # is set (to those of the dly_sel CSR otherwise).
+    phy.rdly_rst = Signal()
+    phy.rdly_inc = Signal()
+    phy.bitslip_rst = Signal()
+    phy.bitslip = Signal()
+    phy.dly_sel_override = Signal()
+    phy.dly_sel = Signal(ngroups)
+
+class ScannableECP5DDRPHY(ECP5DDRPHY):
+    # ECP5DDRPHY with the read delay controls
+    def __init__(self, pads, **kwargs):
+        ECP5DDRPHY.__init__(self, pads, **kwargs)
+        for name, csr_type in ecp5ddrphy_read_delay_csrs:
+            if not isinstance(getattr(self, name, None), csr_type):
+                raise TypeError("ECP5DDRPHY has no {} {}, read delay controls not supported".format(
+                    csr_type.__name__, name))
+        add_read_delay_controls(self, len(self._dly_sel.storage))
+
+        # # #
+
+        # The PHY logic keeps the CSRs it was built with, they are replaced on the bus by CSRs of
+        # the same name and size (same CSR map) and driven from these and the inputs.
+        phy_csrs = {}
+        for name, csr_type in ecp5ddrphy_read_delay_csrs:
+            phy_csr = getattr(self, name)
+            phy_csrs[name] = phy_csr
+            setattr(self, name, csr_type(phy_csr.size, name=phy_csr.name))
+        for name, pulse in [("_rdly_dq_rst", self.rdly_rst), ("_rdly_dq_inc", self.rdly_inc),
+                            ("_rdly_dq_bitslip_rst", self.bitslip_rst), ("_rdly_dq_bitslip", self.bitslip)]:
+            self.comb += [
+                phy_csrs[name].r.eq(getattr(self, name).r),
+                phy_csrs[name].re.eq(getattr(self, name).re | pulse)
+            ]
+        self.comb += phy_csrs["_dly_sel"].storage.eq(
+            Mux(self.dly_sel_override, self.dly_sel, self._dly_sel.storage))
+
+# Read leveling scanner ----------------------------------------------------------------------------
+
+class ReadLevelingScanner(Module, AutoCSR):
+    # Registered as the SDRAM PHY in front of a PHY with read delay controls: the controller DFI is
+    # forwarded unchanged, except when a scan is running. A scan steps bitslip/rdelay of all byte
+    # groups, issues samples MPR reads per point (DRAM put in MPR mode by the host) and latches a
+    # pass/fail bitmap per byte group: bit bitslip*ndelays + rdelay of result_m<group>.
+    def __init__(self, phy, nbitslips=4, ndelays=8, mpr_pattern=0b01010101, timeout=64):
+        self.settings = phy.settings
+        self.dfi = Record(phy.dfi.layout)
+        self.dfi.phases = [getattr(self.dfi, "p{}".format(n)) for n in range(len(phy.dfi.phases))]
+        dq = len(phy.dfi.p0.rddata)//2
+        ngroups = dq//8
+        self.start = CSR()
+        self.done = CSRStatus()
+        self.samples = CSRStorage(8, reset=4)
+        for i in range(ngroups):
+            setattr(self, "result_m{}".format(i),
+                CSRStatus(nbitslips*ndelays, name="result_m{}".format(i)))
+
+        # # #
+
+        # delay controls, all byte groups while a step runs
+        sel = Signal()
+        pulses = {name: Signal() for name in ["rdly_rst", "rdly_inc", "bitslip_rst", "bitslip"]}
+        self.comb += [getattr(phy, name).eq(pulse) for name, pulse in pulses.items()]
+        self.comb += [
+            phy.dly_sel_override.eq(sel),
+            phy.dly_sel.eq(2**ngroups - 1)
+        ]
+
+        # dfi: forward, MPR read on phase 0 (as the host command_prd) when read is set
+        read = Signal()
+        for s, m in zip(self.dfi.phases, phy.dfi.phases):
+            for name, size, direction in s.layout:
+                if direction == DIR_M_TO_S:
+                    getattr(s, name).reset = getattr(m, name).reset
+                    self.comb += getattr(m, name).eq(getattr(s, name))
+                else:
+                    self.comb += getattr(s, name).eq(getattr(m, name))
+        p0 = phy.dfi.p0
+        # overrides the forwarding above (later statement wins)
+        self.comb += If(read,
+            p0.address.eq(0),
+            p0.bank.eq(0),
+            p0.cs_n.eq(0),
+            p0.cas_n.eq(0),
+            p0.ras_n.eq(1),
+            p0.we_n.eq(1),
+            p0.rddata_en.eq(1)
+        )
+
+        # MPR check: the pattern is sent MSB first, beat k of DQ j is bit (k%2)*dq + j of phase k//2
+        beats = [(mpr_pattern >> (7 - k)) & 0b1 for k in range(2*len(phy.dfi.phases))]
+        ok = Signal(ngroups)
+        for i in range(ngroups):
+            checks = []
+            for k, beat in enumerate(beats):
+                rddata = phy.dfi.phases[k//2].rddata[(k%2)*dq:(k%2 + 1)*dq]
+                checks.append(rddata[8*i:8*(i + 1)] == (0xff if beat else 0x00))
+            self.comb += ok[i].eq(Cat(*checks) == 2**len(checks) - 1)
+
+        # scan
+        bitslip = Signal(max=nbitslips)
+        rdelay = Signal(max=ndelays)
+        count = Signal(8)
+        sample = Signal(8)
+        results = [Signal(nbitslips*ndelays) for i in range(ngroups)]
+        passed = Signal(ngroups)
+        point = Signal(max=nbitslips*ndelays)
+        self.comb += point.eq(bitslip*ndelays + rdelay)
+        for i in range(ngroups):
+            self.comb += getattr(self, "result_m{}".format(i)).status.eq(results[i])
+
+        fsm = FSM(reset_state="IDLE")
+        self.submodules += fsm
+        fsm.act("IDLE",
+            self.done.status.eq(1),
+            If(self.start.re,
+                NextValue(bitslip, 0),
+                [NextValue(r, 0) for r in results],
+                NextState("BITSLIP-RST")
+            )
+        )
+        fsm.act("BITSLIP-RST",
+            sel.eq(1),
+            pulses["bitslip_rst"].eq(1),
+            NextValue(count, bitslip),
+            NextState("BITSLIP")
+        )
+        fsm.act("BITSLIP",
+            sel.eq(1),
+            If(count == 0,
+                NextState("RDELAY-RST")
+            ).Else(
+                pulses["bitslip"].eq(1),
+                NextValue(count, count - 1)
+            )
+        )
+        fsm.act("RDELAY-RST",
+            sel.eq(1),
+            pulses["rdly_rst"].eq(1),
+            NextValue(rdelay, 0),
+            NextValue(count, 16),
+            NextState("SETTLE")
+        )
+        fsm.act("SETTLE",
+            NextValue(count, count - 1),
+            If(count == 0,
+                NextValue(sample, 0),
+                NextValue(passed, 2**ngroups - 1),
+                NextState("READ")
+            )
+        )
+        fsm.act("READ",
+            read.eq(1),
+            NextValue(count, timeout),
+            NextState("WAIT")
+        )
+        fsm.act("WAIT",
+            NextValue(count, count - 1),
+            If(p0.rddata_valid,
+                NextValue(passed, passed & ok),
+                NextValue(sample, sample + 1),
+                NextValue(count, 8),
+                NextState("GAP")
+            ).Elif(count == 0,
+                NextValue(passed, 0),
+                NextState("STORE")
+            )
+        )
+        fsm.act("GAP",
+            NextValue(count, count - 1),
+            If(count == 0,
+                If(sample >= self.samples.storage,
+                    NextState("STORE")
+                ).Else(
+                    NextState("READ")
+                )
+            )
+        )
+        fsm.act("STORE",
+            [If(passed[i], NextValue(results[i], results[i] | (1 << point))) for i in range(ngroups)],
+            If(rdelay == ndelays - 1,
+                If(bitslip == nbitslips - 1,
+                    NextState("IDLE")
+                ).Else(
+                    NextValue(bitslip, bitslip + 1),
+                    NextState("BITSLIP-RST")
+                )
+            ).Else(
+                NextState("RDELAY-INC")
+            )
+        )
+        fsm.act("RDELAY-INC",
+            sel.eq(1),
+            pulses["rdly_inc"].eq(1),
+            NextValue(rdelay, rdelay + 1),
+            NextValue(count, 16),
+            NextState("SETTLE")
+        )
+
+def register_sdram_with_scanner(soc, sdram_module):
+    # soc.ddrphy behind a ReadLevelingScanner (rdlvl CSRs), as in every SDRAM SoC
+    soc.submodules.rdlvl = ReadLevelingScanner(soc.ddrphy)
+    soc.register_sdram(soc.rdlvl,
+        sdram_module.geom_settings,
+        sdram_module.timing_settings)
+
 # DDR3TestSoC --------------------------------------------------------------------------------------
 
 class DDR3TestSoC(SoCSDRAM):
     csr_map = {
         "ddrphy":    16,
-        "analyzer":  17
+        "analyzer":  17,
+        "rdlvl":     18
     }
     csr_map.update(SoCSDRAM.csr_map)
-    def __init__(self, toolchain="diamond"):
+    def __init__(self, toolchain="diamond", sys_clk_freq=int(50e6), l2_size=32,
+                 analyzer_depth=128, analyzer_signals="dfi_p0,datavalid,burstdet"):
         platform = versa_ecp5.Platform(toolchain=toolchain)
-        sys_clk_freq = int(50e6)
         SoCSDRAM.__init__(self, platform, clk_freq=sys_clk_freq,
-                          cpu_type=None, l2_size=32,
+                          cpu_type=None, l2_size=l2_size,
                           with_uart=None,
                           csr_data_width=32,
                           ident="Versa ECP5 test SoC", ident_version=True)
@@ -101,14 +383,12 @@ class DDR3TestSoC(SoCSDRAM):
         self.add_wb_master(self.bridge.wishbone)
 
         # sdram
-        self.submodules.ddrphy = ECP5DDRPHY(
+        self.submodules.ddrphy = ScannableECP5DDRPHY(
             platform.request("ddram"),
             sys_clk_freq=sys_clk_freq)
         self.comb += crg.stop.eq(self.ddrphy.init.stop)
         sdram_module = MT41K64M16(sys_clk_freq, "1:2")
-        self.register_sdram(self.ddrphy,
-            sdram_module.geom_settings,
-            sdram_module.timing_settings)
+        register_sdram_with_scanner(self, sdram_module)
 
         # led blinking
         led_counter = Signal(32)
@@ -116,23 +396,466 @@ class DDR3TestSoC(SoCSDRAM):
         self.comb += platform.request("user_led", 0).eq(led_counter[26])
 
         # analyzer
-        analyzer_signals = [
-            self.ddrphy.dfi.p0,
-            self.ddrphy.datavalid,
-            self.ddrphy.burstdet
-        ]
-        self.submodules.analyzer = LiteScopeAnalyzer(analyzer_signals, 128)
+        if analyzer_depth:
+            self.submodules.analyzer = LiteScopeAnalyzer(
+                get_analyzer_signals(self.ddrphy, analyzer_signals), analyzer_depth)
 
-    def generate_sdram_phy_py_header(self):
-        f = open("test/sdram_init.py", "w")
-        f.write(get_sdram_phy_py_header(
-            self.sdram.controller.settings.phy,
-            self.sdram.controller.settings.timing))
-        f.close()
+    def generate_sdram_phy_py_header(self, test_dir="test"):
+        generate_sdram_phy_py_header(self, test_dir)
 
-    def do_exit(self, vns):
+    def do_exit(self, vns, test_dir="test"):
         if hasattr(self, "analyzer"):
-            self.analyzer.export_csv(vns, "test/analyzer.csv")
+            self.analyzer.export_csv(vns, os.path.join(test_dir, "analyzer.csv"))
+
+# EtherboneTestSoC ---------------------------------------------------------------------------------
+
+class EtherboneTestSoC(DDR3TestSoC):
+    def __init__(self, eth_port=0, toolchain="diamond", sys_clk_freq=int(125e6), **kwargs):
+        # the 8-bit UDP/IP datapath runs in sys: below the 125 MHz RGMII rate, back to back
+        # Etherbone writes overflow the RX clock domain crossing and are silently dropped
+        if sys_clk_freq < 125e6:
+            raise ValueError("EtherboneTestSoC needs sys_clk_freq >= 125 MHz (got {:.2f} MHz)".format(
+                sys_clk_freq/1e6))
+        DDR3TestSoC.__init__(self, toolchain=toolchain, sys_clk_freq=sys_clk_freq, **kwargs)
+
+        # ethernet mac/udp/ip stack
+        ethphy = LiteEthPHYRGMII(self.platform.request("eth_clocks", eth_port),
+                        self.platform.request("eth", eth_port))
+        ethcore = LiteEthUDPIPCore(ethphy,
+                                   mac_address=0x10e2d5000000,
+                                   ip_address=convert_ip("192.168.1.50"),
+                                   clk_freq=sys_clk_freq,
+                                   with_icmp=True)
+        self.submodules += ethphy, ethcore
+
+        ethphy.crg.cd_eth_rx.clk.attr.add("keep")
+        ethphy.crg.cd_eth_tx.clk.attr.add("keep")
+        self.platform.add_period_constraint(ethphy.crg.cd_eth_rx.clk, 1e9/125e6)
+        self.platform.add_period_constraint(ethphy.crg.cd_eth_tx.clk, 1e9/125e6)
+
+        # etherbone
+        self.submodules.etherbone = LiteEthEtherbone(ethcore.udp, 1234, mode="master")
+        self.add_wb_master(self.etherbone.wishbone.bus)
+
+# BIST error capture -------------------------------------------------------------------------------
+
+def find_submodules(module, cls):
+    # (parent, submodule) of the submodules of module (at any depth) that are instances of cls, in
+    # the order they were added
+    found = []
+    for name, submodule in module._submodules:
+        if isinstance(submodule, cls):
+            found.append((module, submodule))
+        found += find_submodules(submodule, cls)
+    return found
+
+def bist_checker_core(checker):
+    # (core, dma, data_gen) of a LiteDRAMBISTChecker: the core is the module holding its DMA reader
+    # and errors counter, data_gen the first Generator of the core (data before address), whose
+    # output the core compares with dma.source.data.
+    dmas = find_submodules(checker, LiteDRAMDMAReader)
+    if len(dmas) != 1 or not isinstance(getattr(dmas[0][0], "errors", None), Signal):
+        raise TypeError("LiteDRAMBISTChecker core not found, error capture not supported")
+    core, dma = dmas[0]
+    gens = find_submodules(core, Generator)
+    if not gens:
+        raise TypeError("LiteDRAMBISTChecker data generator not found, error capture not supported")
+    return core, dma, gens[0][1]
+
+class BISTErrorCapture(Module, AutoCSR):
+    # Stores the first depth mismatches of a LiteDRAMBISTChecker in a memory on the wishbone bus:
+    # the data beats compared by the checker core (read data, output of its data generator) are
+    # recorded when its errors counter increments. A record is stride words: port address, expected
+    # data then read data (least significant word first). count keeps counting after the memory is
+    # full.
+    def __init__(self, checker, port, depth=64):
+        core, dma, data_gen = bist_checker_core(checker)
+        dw = len(port.rdata.data)
+        dwords = (dw + 31)//32
+        wshift = log2_int(1 + 2*dwords, need_pow2=False)
+        self.depth = depth
+        self.stride = stride = 2**wshift
+        self.clear = CSR()
+        self.count = CSRStatus(32)
+        self.bus = bus = wishbone.Interface()
+
+        # # #
+
+        beat = Signal()
+        self.comb += beat.eq(dma.source.valid & dma.source.ready)
+
+        # addresses of the outstanding reads, read data comes back in order
+        addr_fifo = ResetInserter()(SyncFIFO(len(port.cmd.addr), 32))
+        self.submodules += addr_fifo
+        self.comb += [
+            addr_fifo.reset.eq(checker.reset.re),
+            addr_fifo.we.eq(port.cmd.valid & port.cmd.ready & ~port.cmd.we),
+            addr_fifo.din.eq(port.cmd.addr),
+            addr_fifo.re.eq(beat)
+        ]
+
+        # last compared beat, the core errors counter increments the cycle after a mismatch
+        record = Signal(32*stride)
+        errors_d = Signal(32)
+        self.sync += [
+            If(beat,
+                record[:len(port.cmd.addr)].eq(addr_fifo.dout),
+                record[32:32+dw].eq(data_gen.o[:min(len(data_gen.o), dw)]),
+                record[32*(1+dwords):32*(1+dwords)+dw].eq(dma.source.data)
+            ),
+            errors_d.eq(core.errors)
+        ]
+
+        # records
+        error = Signal()
+        count = Signal(32)
+        self.comb += [
+            error.eq(core.errors == errors_d + 1),
+            self.count.status.eq(count)
+        ]
+        self.sync += [
+            If(self.clear.re,
+                count.eq(0)
+            ).Elif(error,
+                count.eq(count + 1)
+            )
+        ]
+        mem = Memory(32*stride, depth)
+        wr = mem.get_port(write_capable=True)
+        rd = mem.get_port()
+        self.specials += mem, wr, rd
+        self.comb += [
+            wr.adr.eq(count),
+            wr.dat_w.eq(record),
+            wr.we.eq(error & (count < depth))
+        ]
+
+        # wishbone (read-only)
+        self.comb += [
+            rd.adr.eq(bus.adr[wshift:]),
+            bus.dat_r.eq(Array(rd.dat_r[32*i:32*(i+1)] for i in range(stride))[bus.adr[:wshift]])
+        ]
+        self.sync += [
+            bus.ack.eq(0),
+            If(bus.cyc & bus.stb & ~bus.ack, bus.ack.eq(1))
+        ]
+
+def add_sdram_error_capture(soc, port, depth=64):
+    soc.submodules.sdram_errors = BISTErrorCapture(soc.sdram_checker, port, depth)
+    size = 4*soc.sdram_errors.stride*depth
+    soc.add_wb_slave(mem_decoder(soc.mem_map["sdram_errors"]), soc.sdram_errors.bus)
+    # uncached (shadow) view for the CPU, as ethmac
+    origin = soc.mem_map["sdram_errors"] | (soc.shadow_base if soc.cpu_type is not None else 0)
+    soc.add_memory_region("sdram_errors", origin, size)
+    soc.add_constant("SDRAM_ERRORS_DEPTH", depth)
+    soc.add_constant("SDRAM_ERRORS_STRIDE", soc.sdram_errors.stride)
+    soc.add_constant("SDRAM_ERRORS_DATA_WIDTH", len(port.rdata.data))
+
+# SDRAM pattern engine -----------------------------------------------------------------------------
+
+# Data of a port word at port address addr, same layout as the host generators of test/patterns.py
+# (a 32-bit lane j of port word addr is the bus word at byte offset addr*dw/8 + 4*j).
+pattern_modes = {
+    "solid":        0, # all zeros (invert: all ones), March C- data background
+    "walking":      1, # one bit set at (addr + phase) % dw (invert: walking zeros)
+    "address":      2, # each 32-bit lane holds its own byte offset (address-in-address)
+    "checkerboard": 3, # 0x55.. on even words, 0xaa.. on odd words
+}
+
+class PatternData(Module):
+    def __init__(self, mode, addr, phase, invert, dw):
+        self.data = data = Signal(dw)
+
+        # # #
+
+        bit = Signal(log2_int(dw))
+        lanes = [Signal(32) for j in range(dw//32)]
+        pattern = Signal(dw)
+        self.comb += [lane.eq(Cat(C(4*j, log2_int(dw//8)), addr)) for j, lane in enumerate(lanes)]
+        self.comb += [
+            bit.eq(addr[:len(bit)] + phase),
+            Case(mode, {
+                pattern_modes["solid"]:        pattern.eq(0),
+                pattern_modes["walking"]:      pattern.eq(C(1, dw) << bit),
+                pattern_modes["address"]:      pattern.eq(Cat(*lanes)),
+                pattern_modes["checkerboard"]: pattern.eq(Mux(addr[0],
+                    Replicate(C(0xaa, 8), dw//8), Replicate(C(0x55, 8), dw//8))),
+            }),
+            data.eq(Mux(invert, ~pattern, pattern))
+        ]
+
+class PatternEngine(Module, AutoCSR):
+    # Runs one March element per start: the port words of [base, base + length) are visited in
+    # ascending or descending order, each one is optionally read and checked against the read
+    # pattern, then optionally written with the write pattern (read/write: bit 0 enable, bit 1
+    # invert). One access at a time, slower than the LiteDRAM BIST but the read and the write of
+    # a word are back to back as March tests require. test/patterns.py sequences the elements.
+    def __init__(self, port):
+        dw = len(port.wdata.data)
+        aw = len(port.cmd.addr)
+        self.start = CSR()
+        self.done = CSRStatus()
+        self.mode = CSRStorage(2)
+        self.phase = CSRStorage(log2_int(dw))
+        self.base = CSRStorage(aw)
+        self.length = CSRStorage(aw + 1)
+        self.read = CSRStorage(2)
+        self.write = CSRStorage(2)
+        self.descending = CSRStorage()
+        self.errors = CSRStatus(32)
+        self.ticks = CSRStatus(32)
+
+        # # #
+
+        addr = Signal(aw)
+        count = Signal(aw + 1)
+        errors = Signal(32)
+        ticks = Signal(32)
+        rdata = PatternData(self.mode.storage, addr, self.phase.storage, self.read.storage[1], dw)
+        wdata = PatternData(self.mode.storage, addr, self.phase.storage, self.write.storage[1], dw)
+        self.submodules += rdata, wdata
+        self.comb += [
+            self.errors.status.eq(errors),
+            self.ticks.status.eq(ticks),
+            port.cmd.addr.eq(addr),
+            port.wdata.data.eq(wdata.data),
+            port.wdata.we.eq(2**len(port.wdata.we) - 1)
+        ]
+
+        fsm = FSM(reset_state="IDLE")
+        self.submodules += fsm
+        self.sync += [
+            If(self.start.re,
+                ticks.eq(0)
+            ).Elif(~fsm.ongoing("IDLE"),
+                ticks.eq(ticks + 1)
+            )
+        ]
+        def first():
+            return If(self.read.storage[0], NextState("READ-CMD")).Else(NextState("WRITE-CMD"))
+        fsm.act("IDLE",
+            self.done.status.eq(1),
+            If(self.start.re & (self.length.storage != 0) & (self.read.storage[0] | self.write.storage[0]),
+                NextValue(addr, Mux(self.descending.storage,
+                    self.base.storage + self.length.storage - 1, self.base.storage)),
+                NextValue(count, 0),
+                NextValue(errors, 0),
+                first()
+            )
+        )
+        fsm.act("READ-CMD",
+            port.cmd.valid.eq(1),
+            port.cmd.we.eq(0),
+            If(port.cmd.ready, NextState("READ-DATA"))
+        )
+        fsm.act("READ-DATA",
+            port.rdata.ready.eq(1),
+            If(port.rdata.valid,
+                If(port.rdata.data != rdata.data, NextValue(errors, errors + 1)),
+                If(self.write.storage[0], NextState("WRITE-CMD")).Else(NextState("NEXT"))
+            )
+        )
+        fsm.act("WRITE-CMD",
+            port.cmd.valid.eq(1),
+            port.cmd.we.eq(1),
+            If(port.cmd.ready, NextState("WRITE-DATA"))
+        )
+        fsm.act("WRITE-DATA",
+            port.wdata.valid.eq(1),
+            If(port.wdata.ready, NextState("NEXT"))
+        )
+        fsm.act("NEXT",
+            NextValue(count, count + 1),
+            NextValue(addr, Mux(self.descending.storage, addr - 1, addr + 1)),
+            If(count == self.length.storage - 1,
+                NextState("IDLE")
+            ).Else(
+                first()
+            )
+        )
+
+def add_sdram_pattern(soc):
+    port = soc.sdram.crossbar.get_port()
+    soc.submodules.sdram_pattern = PatternEngine(port)
+    soc.add_constant("SDRAM_PATTERN_DATA_WIDTH", len(port.wdata.data))
+
+# SDRAM traffic generators ------------------------------------------------------------------------
+
+class TrafficPair(Module):
+    # Generator/checker pair on its own crossbar port: writes the address-in-address pattern to
+    # [base, base + length) port words, then reads it back and checks it, with as many commands in
+    # flight as the port accepts. Read latency is measured from command acceptance to read data.
+    def __init__(self, port, start, mode, base, length, timer, fifo_depth=32):
+        dw = len(port.wdata.data)
+        aw = len(port.cmd.addr)
+        self.done = Signal()
+        self.wr_ticks = Signal(32)
+        self.rd_ticks = Signal(32)
+        self.errors = Signal(32)
+        self.latency_sum = Signal(32)
+        self.latency_max = Signal(32)
+
+        # # #
+
+        cmd_count = Signal(aw + 1)
+        data_count = Signal(aw + 1)
+        latency = Signal(32)
+        issued = SyncFIFO(32, fifo_depth)
+        rdata = PatternData(pattern_modes["address"], base + data_count, 0, 0, dw)
+        wdata = PatternData(pattern_modes["address"], base + data_count, 0, 0, dw)
+        self.submodules += issued, rdata, wdata
+        self.comb += [
+            port.cmd.addr.eq(base + cmd_count),
+            port.wdata.data.eq(wdata.data),
+            port.wdata.we.eq(2**len(port.wdata.we) - 1),
+            issued.din.eq(timer),
+            latency.eq(timer - issued.dout)
+        ]
+
+        fsm = FSM(reset_state="IDLE")
+        self.submodules += fsm
+        fsm.act("IDLE",
+            self.done.eq(1),
+            If(start & (length != 0),
+                NextValue(cmd_count, 0),
+                NextValue(data_count, 0),
+                NextValue(self.wr_ticks, 0),
+                NextValue(self.rd_ticks, 0),
+                NextValue(self.errors, 0),
+                NextValue(self.latency_sum, 0),
+                NextValue(self.latency_max, 0),
+                If(mode[0],
+                    NextState("WRITE")
+                ).Elif(mode[1],
+                    NextState("READ")
+                )
+            )
+        )
+        fsm.act("WRITE",
+            port.cmd.valid.eq(cmd_count != length),
+            port.cmd.we.eq(1),
+            If(port.cmd.valid & port.cmd.ready,
+                NextValue(cmd_count, cmd_count + 1)
+            ),
+            port.wdata.valid.eq(data_count != cmd_count),
+            If(port.wdata.valid & port.wdata.ready,
+                NextValue(data_count, data_count + 1),
+                If(data_count == length - 1,
+                    NextValue(cmd_count, 0),
+                    NextValue(data_count, 0),
+                    If(mode[1], NextState("READ")).Else(NextState("IDLE"))
+                )
+            ),
+            NextValue(self.wr_ticks, self.wr_ticks + 1)
+        )
+        fsm.act("READ",
+            port.cmd.valid.eq((cmd_count != length) & issued.writable),
+            port.cmd.we.eq(0),
+            If(port.cmd.valid & port.cmd.ready,
+                issued.we.eq(1),
+                NextValue(cmd_count, cmd_count + 1)
+            ),
+            port.rdata.ready.eq(1),
+            If(port.rdata.valid,
+                issued.re.eq(1),
+                NextValue(data_count, data_count + 1),
+                If(port.rdata.data != rdata.data,
+                    NextValue(self.errors, self.errors + 1)
+                ),
+                NextValue(self.latency_sum, self.latency_sum + latency),
+                If(latency > self.latency_max,
+                    NextValue(self.latency_max, latency)
+                ),
+                If(data_count == length - 1,
+                    NextState("IDLE")
+                )
+            ),
+            NextValue(self.rd_ticks, self.rd_ticks + 1)
+        )
+
+class SDRAMTraffic(Module, AutoCSR):
+    # TrafficPairs started together: the first `pairs` pairs run, pair i on [base + i*stride,
+    # base + i*stride + length) port words (mode: bit 0 write, bit 1 read/check). ticks counts the
+    # cycles from start until all of them are done, the per-pair results are read through sel.
+    def __init__(self, ports):
+        n = len(ports)
+        aw = len(ports[0].cmd.addr)
+        self.start = CSR()
+        self.done = CSRStatus()
+        self.pairs = CSRStorage(bits_for(n), reset=n)
+        self.mode = CSRStorage(2, reset=0b11)
+        self.base = CSRStorage(aw)
+        self.stride = CSRStorage(aw)
+        self.length = CSRStorage(aw + 1)
+        self.ticks = CSRStatus(32)
+        self.sel = CSRStorage(bits_for(n - 1))
+        self.wr_ticks = CSRStatus(32)
+        self.rd_ticks = CSRStatus(32)
+        self.errors = CSRStatus(32)
+        self.latency_sum = CSRStatus(32)
+        self.latency_max = CSRStatus(32)
+
+        # # #
+
+        timer = Signal(32)
+        ticks = Signal(32)
+        pairs = []
+        for i, port in enumerate(ports):
+            base = Signal(aw)
+            self.comb += base.eq(self.base.storage + i*self.stride.storage)
+            pair = TrafficPair(port, self.start.re & (i < self.pairs.storage),
+                self.mode.storage, base, self.length.storage, timer)
+            self.submodules += pair
+            pairs.append(pair)
+        done = Signal()
+        self.comb += [
+            done.eq(Cat(*[pair.done for pair in pairs]) == 2**n - 1),
+            self.done.status.eq(done),
+            self.ticks.status.eq(ticks)
+        ]
+        self.sync += [
+            timer.eq(timer + 1),
+            If(self.start.re,
+                ticks.eq(0)
+            ).Elif(~done,
+                ticks.eq(ticks + 1)
+            )
+        ]
+        results = ["wr_ticks", "rd_ticks", "errors", "latency_sum", "latency_max"]
+        self.comb += Case(self.sel.storage, {i: [getattr(self, r).status.eq(getattr(pair, r))
+            for r in results] for i, pair in enumerate(pairs)})
+
+def add_sdram_traffic(soc, pairs):
+    ports = [soc.sdram.crossbar.get_port() for i in range(pairs)]
+    soc.submodules.sdram_traffic = SDRAMTraffic(ports)
+    soc.add_constant("SDRAM_TRAFFIC_PAIRS", pairs)
+    soc.add_constant("SDRAM_TRAFFIC_DATA_WIDTH", len(ports[0].wdata.data))
+
+# BISTTestSoC --------------------------------------------------------------------------------------
+
+class BISTTestSoC(EtherboneTestSoC):
+    csr_map = {
+        "sdram_generator": 20,
+        "sdram_checker":   21,
+        "sdram_errors":    22,
+        "sdram_pattern":   23,
+        "sdram_traffic":   24
+    }
+    csr_map.update(EtherboneTestSoC.csr_map)
+
+    mem_map = {
+        "sdram_errors": 0x50000000,
+    }
+    mem_map.update(EtherboneTestSoC.mem_map)
+
+    def __init__(self, error_depth=64, traffic_pairs=4, **kwargs):
+        EtherboneTestSoC.__init__(self, **kwargs)
+        self.submodules.sdram_generator = LiteDRAMBISTGenerator(self.sdram.crossbar.get_port())
+        checker_port = self.sdram.crossbar.get_port()
+        self.submodules.sdram_checker = LiteDRAMBISTChecker(checker_port)
+        add_sdram_error_capture(self, checker_port, error_depth)
+        add_sdram_pattern(self)
+        add_sdram_traffic(self, traffic_pairs)
 
 # RGMIITestCRG -------------------------------------------------------------------------------------
 
@@ -164,10 +887,136 @@ class RGMIITestCRG(Module):
 
 # RGMIITestSoC -------------------------------------------------------------------------------------
 
+# UDP streamer -------------------------------------------------------------------------------------
+
+class UDPStreamer(Module, AutoCSR):
+    # Traffic generator and sink on a UDP user port (8-bit), driven by test/udp_bench.py.
+    # TX: count packets (0: until disabled) of length payload bytes to ip_address:dst_port, one
+    # every period cycles at most; the payload starts with a 32-bit big-endian sequence number.
+    # RX: packets received on the port are counted and their sequence numbers checked: a jump
+    # forward adds to lost, a packet older than expected to reordered (it was counted as lost when
+    # skipped).
+    def __init__(self, port, udp_port):
+        self.enable = CSRStorage()
+        self.ip_address = CSRStorage(32)
+        self.dst_port = CSRStorage(16)
+        self.length = CSRStorage(16, reset=1024)
+        self.period = CSRStorage(32)
+        self.count = CSRStorage(32)
+        self.tx_packets = CSRStatus(32)
+        self.rx_clear = CSR()
+        self.rx_packets = CSRStatus(32)
+        self.rx_bytes = CSRStatus(32)
+        self.rx_lost = CSRStatus(32)
+        self.rx_reordered = CSRStatus(32)
+
+        # # #
+
+        # tx
+        sink = port.sink
+        seq = Signal(32)
+        sent = Signal(32)
+        index = Signal(16)
+        timer = Signal(32)
+        start = Signal()
+        self.comb += [
+            sink.src_port.eq(udp_port),
+            sink.dst_port.eq(self.dst_port.storage),
+            sink.ip_address.eq(self.ip_address.storage),
+            sink.length.eq(self.length.storage),
+            sink.last.eq(index == self.length.storage - 1),
+            Case(index, {
+                0: sink.data.eq(seq[24:32]),
+                1: sink.data.eq(seq[16:24]),
+                2: sink.data.eq(seq[8:16]),
+                3: sink.data.eq(seq[0:8]),
+                "default": sink.data.eq(index[:8])
+            }),
+            self.tx_packets.status.eq(sent)
+        ]
+        self.sync += [
+            If(start,
+                timer.eq(0)
+            ).Elif(timer != 2**32 - 1,
+                timer.eq(timer + 1)
+            )
+        ]
+        fsm = FSM(reset_state="IDLE")
+        self.submodules += fsm
+        fsm.act("IDLE",
+            If(~self.enable.storage,
+                NextValue(seq, 0),
+                NextValue(sent, 0)
+            ).Elif((timer >= self.period.storage) &
+                   ((self.count.storage == 0) | (sent != self.count.storage)),
+                start.eq(1),
+                NextValue(index, 0),
+                NextState("SEND")
+            )
+        )
+        fsm.act("SEND",
+            sink.valid.eq(1),
+            If(sink.ready,
+                NextValue(index, index + 1),
+                If(sink.last,
+                    NextValue(seq, seq + 1),
+                    NextValue(sent, sent + 1),
+                    NextState("IDLE")
+                )
+            )
+        )
+
+        # rx
+        source = port.source
+        rx_index = Signal(16)
+        rx_seq = Signal(32)
+        expected = Signal(32)
+        packets = Signal(32)
+        nbytes = Signal(32)
+        lost = Signal(32)
+        reordered = Signal(32)
+        seq_last = Signal(32)
+        self.comb += [
+            source.ready.eq(1),
+            seq_last.eq(Mux(rx_index < 4, Cat(source.data, rx_seq[:24]), rx_seq)),
+            self.rx_packets.status.eq(packets),
+            self.rx_bytes.status.eq(nbytes),
+            self.rx_lost.status.eq(lost),
+            self.rx_reordered.status.eq(reordered)
+        ]
+        self.sync += [
+            If(self.rx_clear.re,
+                rx_index.eq(0),
+                expected.eq(0),
+                packets.eq(0),
+                nbytes.eq(0),
+                lost.eq(0),
+                reordered.eq(0)
+            ).Elif(source.valid,
+                rx_index.eq(rx_index + 1),
+                rx_seq.eq(seq_last),
+                nbytes.eq(nbytes + 1),
+                If(source.last,
+                    rx_index.eq(0),
+                    packets.eq(packets + 1),
+                    If(seq_last >= expected,
+                        lost.eq(lost + seq_last - expected),
+                        expected.eq(seq_last + 1)
+                    ).Else(
+                        reordered.eq(reordered + 1)
+                    )
+                )
+            )
+        ]
+
 class RGMIITestSoC(SoCCore):
-    def __init__(self, eth_port=0, toolchain="diamond"):
+    csr_map = {
+        "udp_streamer": 16
+    }
+    csr_map.update(SoCCore.csr_map)
+
+    def __init__(self, eth_port=0, toolchain="diamond", sys_clk_freq=int(133e6), streamer_port=8000):
         platform = versa_ecp5.Platform(toolchain=toolchain)
-        sys_clk_freq = int(133e6)
         SoCCore.__init__(self, platform, clk_freq=sys_clk_freq,
                           cpu_type=None, with_uart=False,
                           csr_data_width=32,
@@ -191,6 +1040,15 @@ class RGMIITestSoC(SoCCore):
         platform.add_period_constraint(ethphy.crg.cd_eth_rx.clk, 1e9/125e6)
         platform.add_period_constraint(ethphy.crg.cd_eth_tx.clk, 1e9/125e6)
 
+        # etherbone (CSR access for the streamer)
+        self.submodules.etherbone = LiteEthEtherbone(ethcore.udp, 1234, mode="master")
+        self.add_wb_master(self.etherbone.wishbone.bus)
+
+        # udp streamer/sink
+        self.submodules.udp_streamer = UDPStreamer(ethcore.udp.crossbar.get_port(streamer_port, dw=8),
+            streamer_port)
+        self.add_constant("UDP_STREAMER_PORT", streamer_port)
+
         # led blinking
         led_counter = Signal(32)
         self.sync += led_counter.eq(led_counter + 1)
@@ -201,11 +1059,11 @@ class RGMIITestSoC(SoCCore):
 class BaseSoC(SoCSDRAM):
     csr_map = {
         "ddrphy":    16,
+        "rdlvl":     17,
     }
     csr_map.update(SoCSDRAM.csr_map)
-    def __init__(self, toolchain="diamond", **kwargs):
+    def __init__(self, toolchain="diamond", sys_clk_freq=int(75e6), **kwargs):
         platform = versa_ecp5.Platform(toolchain=toolchain)
-        sys_clk_freq = int(75e6)
         SoCSDRAM.__init__(self, platform, clk_freq=sys_clk_freq,
                           cpu_type="vexriscv",
                           integrated_rom_size=0x8000,
@@ -219,15 +1077,13 @@ class BaseSoC(SoCSDRAM):
         self.submodules.crg = crg
 
         # sdram
-        self.submodules.ddrphy = ECP5DDRPHY(
+        self.submodules.ddrphy = ScannableECP5DDRPHY(
             platform.request("ddram"),
             sys_clk_freq=sys_clk_freq)
         self.add_constant("ECP5DDRPHY", None)
         self.comb += crg.stop.eq(self.ddrphy.init.stop)
         sdram_module = MT41K64M16(sys_clk_freq, "1:2")
-        self.register_sdram(self.ddrphy,
-            sdram_module.geom_settings,
-            sdram_module.timing_settings)
+        register_sdram_with_scanner(self, sdram_module)
 
         # led blinking
         led_counter = Signal(32)
@@ -253,9 +1109,14 @@ class EthernetSoC(BaseSoC):
     }
     mem_map.update(BaseSoC.mem_map)
 
-    def __init__(self, eth_port=0, **kwargs):
+    def __init__(self, eth_port=0, local_ip="192.168.1.50", remote_ip="192.168.1.100", **kwargs):
         BaseSoC.__init__(self, **kwargs)
 
+        # netboot addresses, BIOS (TFTP boot.bin from remote_ip) and firmware (netboot.c)
+        for name, ip in [("LOCALIP", local_ip), ("REMOTEIP", remote_ip)]:
+            for i, byte in enumerate(ip.split(".")):
+                self.add_constant(name + str(i + 1), int(byte))
+
         # ethernet mac
         self.submodules.ethphy = LiteEthPHYRGMII(
             self.platform.request("eth_clocks", eth_port),
@@ -276,43 +1137,691 @@ class EthernetSoC(BaseSoC):
 class BISTSoC(EthernetSoC):
     csr_map = {
         "sdram_generator": 20,
-        "sdram_checker":   21
+        "sdram_checker":   21,
+        "sdram_pattern":   22,
+        "sdram_traffic":   23,
+        "sdram_errors":    24
     }
     csr_map.update(EthernetSoC.csr_map)
-    def __init__(self, **kwargs):
+
+    mem_map = {
+        "sdram_errors": 0x50000000,  # (shadow @0xd0000000)
+    }
+    mem_map.update(EthernetSoC.mem_map)
+
+    def __init__(self, error_depth=64, traffic_pairs=4, **kwargs):
         EthernetSoC.__init__(self, **kwargs)
         self.submodules.sdram_generator = LiteDRAMBISTGenerator(self.sdram.crossbar.get_port())
-        self.submodules.sdram_checker = LiteDRAMBISTChecker(self.sdram.crossbar.get_port())
+        checker_port = self.sdram.crossbar.get_port()
+        self.submodules.sdram_checker = LiteDRAMBISTChecker(checker_port)
+        add_sdram_error_capture(self, checker_port, error_depth)
+        add_sdram_pattern(self)
+        add_sdram_traffic(self, traffic_pairs)
 
-# Build --------------------------------------------------------------------------------------------
+# Simulation ---------------------------------------------------------------------------------------
 
-def main():
+_sim_io = [
+    ("sys_clk", 0, Pins(1)),
+    ("sys_rst", 0, Pins(1)),
+    ("serial", 0,
+        Subsignal("source_valid", Pins(1)),
+        Subsignal("source_ready", Pins(1)),
+        Subsignal("source_data", Pins(8)),
+
+        Subsignal("sink_valid", Pins(1)),
+        Subsignal("sink_ready", Pins(1)),
+        Subsignal("sink_data", Pins(8)),
+    ),
+    ("bridge", 0,
+        Subsignal("source_valid", Pins(1)),
+        Subsignal("source_ready", Pins(1)),
+        Subsignal("source_data", Pins(8)),
+
+        Subsignal("sink_valid", Pins(1)),
+        Subsignal("sink_ready", Pins(1)),
+        Subsignal("sink_data", Pins(8)),
+    ),
+]
+
+class VersaSimPlatform(SimPlatform):
+    default_clk_name = "sys_clk"
+    default_clk_period = 1000
+
+    def __init__(self):
+        SimPlatform.__init__(self, "SIM", _sim_io)
+
+
+class SimDDRPHY(Module, AutoCSR):
+    # wlevel_edges: per byte group, (taps sampling CK high from tap 0, first tap of the 0->1 edge)
+    def __init__(self, module, settings, nbytes=2, wlevel_edges=[(0, 3), (1, 5)]):
+        self.submodules.model = SDRAMPHYModel(module, settings)
+        self.settings = settings
+        mdfi = self.model.dfi
+        self.dfi = dfi.Interface(len(mdfi.p0.address), len(mdfi.p0.bank), len(mdfi.p0.cs_n),
+            len(mdfi.p0.wrdata), len(mdfi.phases))
+        self.comb += self.dfi.connect(mdfi)
+
+        # same CSRs and read delay controls as ScannableECP5DDRPHY so the host training scripts and
+        # the scanner run unchanged, only write leveling has an effect on the model
+        self._dly_sel = CSRStorage(nbytes)
+
+        self._rdly_dq_rst = CSR()
+        self._rdly_dq_inc = CSR()
+        self._rdly_dq_bitslip_rst = CSR()
+        self._rdly_dq_bitslip = CSR()
+
+        self._burstdet_clr = CSR()
+        self._burstdet_seen = CSRStatus(nbytes)
+
+        self._wlevel_en = CSRStorage()
+        self._wlevel_strobe = CSR()
+        self._wdly_dq_rst = CSR()
+        self._wdly_dq_inc = CSR()
+        self._wdly_dqs_rst = CSR()
+        self._wdly_dqs_inc = CSR()
+        self._wdly_dqs_taps = CSRStatus(8)
+
+        add_read_delay_controls(self, nbytes)
+
+        # # #
+
+        dly_sel = Signal(nbytes)
+        self.comb += dly_sel.eq(Mux(self.dly_sel_override, self.dly_sel, self._dly_sel.storage))
+
+        # Write leveling: each strobe returns the CK level seen by the DQS of every byte group on
+        # its prime DQ (first DQ of the group) in pi0_rddata. The level depends on the wdly taps of
+        # the group and is noisy on the two taps around the edge (1 on 1/4 then 3/4 of the strobes).
+        lfsr = Signal(16, reset=1)
+        self.sync += lfsr.eq(Cat(lfsr[1:], lfsr[0] ^ lfsr[2] ^ lfsr[3] ^ lfsr[5]))
+        noise = lfsr[:2] != 0
+
+        databits = len(mdfi.p0.rddata)//2
+        sample = Signal(len(mdfi.p0.rddata))
+        sample_valid = Signal()
+        for i, (wrap, edge) in enumerate(wlevel_edges):
+            taps = Signal(8)
+            level = Signal()
+            self.sync += [
+                If(self._wdly_dqs_rst.re & dly_sel[i],
+                    taps.eq(0)
+                ).Elif(self._wdly_dqs_inc.re & dly_sel[i],
+                    taps.eq(taps + 1)
+                )
+            ]
+            self.comb += [
+                If(taps == edge - 1,
+                    level.eq(~noise)
+                ).Elif(taps == edge,
+                    level.eq(noise)
+                ).Else(
+                    level.eq((taps < wrap) | (taps > edge))
+                )
+            ]
+            self.sync += [
+                sample[8*i].eq(level),
+                sample[databits + 8*i].eq(level)
+            ]
+        self.sync += sample_valid.eq(self._wlevel_en.storage & self._wlevel_strobe.re)
+        self.comb += [
+            If(sample_valid,
+                self.dfi.phases[0].rddata.eq(sample),
+                self.dfi.phases[0].rddata_valid.eq(1)
+            )
+        ]
+
+
+class SimCycles(Module, AutoCSR):
+    def __init__(self):
+        self._latch = CSR()
+        self._cycles = CSRStatus(64)
+
+        # # #
+
+        cycles = Signal(64)
+        self.sync += [
+            cycles.eq(cycles + 1),
+            If(self._latch.re, self._cycles.status.eq(cycles))
+        ]
+
+
+class SimSoC(SoCSDRAM):
+    csr_map = {
+        "ddrphy":          16,
+        "sim_cycles":      17,
+        "rdlvl":           18,
+        "sdram_generator": 20,
+        "sdram_checker":   21,
+        "sdram_errors":    22,
+        "sdram_pattern":   23,
+        "sdram_traffic":   24
+    }
+    csr_map.update(SoCSDRAM.csr_map)
+
+    mem_map = {
+        "sdram_errors": 0x50000000,
+    }
+    mem_map.update(SoCSDRAM.mem_map)
+
+    def __init__(self, cpu_type=None, with_bist=False, traffic_pairs=2, sys_clk_freq=int(50e6), **kwargs):
+        platform = VersaSimPlatform()
+        SoCSDRAM.__init__(self, platform, clk_freq=sys_clk_freq,
+                          cpu_type=cpu_type,
+                          integrated_rom_size=0x8000 if cpu_type is not None else 0,
+                          with_uart=False,
+                          csr_data_width=8 if cpu_type is not None else 32,
+                          ident="Versa ECP5 simulation SoC", ident_version=True,
+                          **kwargs)
+
+        # crg
+        self.submodules.crg = CRG(platform.request("sys_clk"))
+
+        # uart (cpu console)
+        if cpu_type is not None:
+            self.submodules.uart_phy = RS232PHYModel(platform.request("serial"))
+            self.submodules.uart = UART(self.uart_phy)
 
-    toolchain = "diamond"
-    toolchain_path = "/usr/local/diamond/3.10_x64/bin/lin64"
-    if "trellis" in sys.argv[1:]:
-        toolchain = "trellis"
-        toolchain_path = "/usr/share/trellis"
-
-
-    if "ddr3_test" in sys.argv[1:]:
-        soc = DDR3TestSoC(toolchain=toolchain)
-    elif "rgmii_test" in sys.argv[1:]:
-        soc = RGMIITestSoC(toolchain=toolchain)
-    elif "base" in sys.argv[1:]:
-        soc = BaseSoC(toolchain=toolchain)
-    elif "ethernet" in sys.argv[1:]:
-        soc = EthernetSoC(toolchain=toolchain)
-    elif "bist" in sys.argv[1:]:
-        soc = BISTSoC(toolchain=toolchain)
+        # bridge
+        self.submodules.bridge_phy = RS232PHYModel(platform.request("bridge"))
+        self.submodules.bridge = WishboneStreamingBridge(self.bridge_phy, sys_clk_freq)
+        self.add_wb_master(self.bridge.wishbone)
+
+        # sdram: MT41K64M16 model with the ECP5DDRPHY 1:2 layout
+        sdram_module = MT41K64M16(sys_clk_freq, "1:2")
+        phy_settings = PhySettings(
+            memtype="DDR3",
+            dfi_databits=2*16,
+            nphases=2,
+            rdphase=0,
+            wrphase=1,
+            rdcmdphase=1,
+            wrcmdphase=0,
+            cl=6,
+            cwl=5,
+            read_latency=4,
+            write_latency=0
+        )
+        self.submodules.ddrphy = SimDDRPHY(sdram_module, phy_settings)
+        register_sdram_with_scanner(self, sdram_module)
+
+        # simulation speed
+        self.submodules.sim_cycles = SimCycles()
+
+        # bist
+        if with_bist:
+            self.submodules.sdram_generator = LiteDRAMBISTGenerator(self.sdram.crossbar.get_port())
+            checker_port = self.sdram.crossbar.get_port()
+            self.submodules.sdram_checker = LiteDRAMBISTChecker(checker_port)
+            add_sdram_error_capture(self, checker_port)
+            add_sdram_pattern(self)
+            add_sdram_traffic(self, traffic_pairs)
+
+def sim_main(targets):
+    # ./versa_ecp5.py sim (ddr3_test, bist_test, base, bist): the Wishbone bridge is exposed over TCP,
+    # reach it with: litex_server --uart --uart-port socket://localhost:1235
+    if "ddr3_test" in targets:
+        soc = SimSoC()
+    elif "bist_test" in targets:
+        soc = SimSoC(with_bist=True)
+    elif "base" in targets:
+        soc = SimSoC(cpu_type="vexriscv")
+    elif "bist" in targets:
+        soc = SimSoC(cpu_type="vexriscv", with_bist=True)
     else:
-        print("missing target, supported: (ddr3_test, rgmii_test, base, ethernet, bist)")
+        print("missing sim target, supported: (ddr3_test, bist_test, base, bist)")
         exit(1)
-    builder = Builder(soc, output_dir="build", csr_csv="test/csr.csv")
-    vns = builder.build(toolchain_path=toolchain_path)
+    sim_config = SimConfig(default_clk="sys_clk")
+    if soc.cpu_type is not None:
+        sim_config.add_module("serial2console", "serial")
+    sim_config.add_module("serial2tcp", "bridge", args={"port": 1235})
+    generate_sdram_phy_py_header(soc)
+    builder = Builder(soc, output_dir="build/sim", csr_csv="test/csr.csv")
+    builder.build(sim_config=sim_config)
+    write_module("test/csr.csv")
+
+# Build cache --------------------------------------------------------------------------------------
+
+# Bitstreams are cached by the hash of everything the toolchain consumes (generated Verilog, memory
+# init files, constraints, build script) plus the toolchain name and version, so unchanged designs
+# skip synthesis and place-and-route.
+
+build_cache_inputs = (".v", ".init", ".lpf", ".ldf", ".ys", ".sh", ".tcl")
+build_cache_outputs = [
+    ("gateware", "top.bit"),
+    ("gateware", "top.svf"),
+    ("gateware", "top_summary.json"),
+    ("gateware", "top.ident"),
+    ("test", "csr.csv"),
+    ("test", "csr_map.py"),
+    ("test", "sdram_init.py"),
+    ("test", "analyzer.csv"),
+]
+
+def toolchain_version(toolchain, toolchain_path):
+    if toolchain == "trellis":
+        commands = [["yosys", "-V"], ["nextpnr-ecp5", "--version"]]
+    else:
+        commands = [[os.path.join(toolchain_path, "pnmainc"), "-version"]]
+    version = [toolchain_path]
+    for command in commands:
+        try:
+            r = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=60)
+            version.append(r.stdout.decode(errors="replace").strip())
+        except (OSError, subprocess.TimeoutExpired):
+            version.append("unknown")
+    return "\n".join(version)
+
+def read_init(filename):
+    # memory init file as a list of words, None if it is not one
+    try:
+        with open(filename) as f:
+            return [int(word, 16) for word in f.read().split()]
+    except ValueError:
+        return None
+
+def build_hash(gateware_dir, toolchain, toolchain_path, seeds=1, ident_init=None, commands=None):
+    # ident_init: contents of the identifier ROM. With ident_version it holds the build date, so
+    # its init file is left out and only the ident without the date is hashed.
+    # commands: toolchain command lines not in the build script (trellis_commands).
+    h = hashlib.sha256()
+    h.update(toolchain.encode())
+    h.update(str(seeds).encode())
+    if commands is not None:
+        h.update(json.dumps(commands, sort_keys=True).encode())
+    h.update(toolchain_version(toolchain, toolchain_path).encode())
+    if ident_init is not None:
+        ident = "".join(chr(c) for c in ident_init).split("\0")[0]
+        h.update(re.sub(r" \d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$", "", ident).encode())
+    for filename in sorted(os.listdir(gateware_dir)):
+        if filename.endswith(build_cache_inputs):
+            path = os.path.join(gateware_dir, filename)
+            if ident_init is not None and filename.endswith(".init") and read_init(path) == ident_init:
+                continue
+            h.update(filename.encode())
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+class BuildCache:
+    def __init__(self, cache_dir, max_entries=4):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+
+    def restore(self, key, dirs):
+        entry = os.path.join(self.cache_dir, key)
+        if not os.path.exists(os.path.join(entry, "top.bit")):
+            return False
+        for directory, filename in build_cache_outputs:
+            src = os.path.join(entry, filename)
+            if os.path.exists(src):
+                shutil.copy(src, os.path.join(dirs[directory], filename))
+        os.utime(entry)
+        return True
+
+    def store(self, key, dirs):
+        entry = os.path.join(self.cache_dir, key)
+        tmp = entry + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for directory, filename in build_cache_outputs:
+            src = os.path.join(dirs[directory], filename)
+            if os.path.exists(src):
+                shutil.copy(src, os.path.join(tmp, filename))
+        shutil.rmtree(entry, ignore_errors=True)
+        os.rename(tmp, entry)
+        self.evict()
+
+    def evict(self):
+        # least recently used entries go first
+        entries = [os.path.join(self.cache_dir, e) for e in os.listdir(self.cache_dir) if not e.endswith(".tmp")]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for entry in entries[self.max_entries:]:
+            shutil.rmtree(entry, ignore_errors=True)
+
+# Toolchain runs -----------------------------------------------------------------------------------
+
+def parse_nextpnr_log(filename):
+    # last reported Fmax per clock (placement then routing) and device utilisation
+    fmax = {}
+    usage = {}
+    with open(filename, errors="replace") as f:
+        for line in f:
+            m = re.search(r"Max frequency for clock +'(.+)': ([\d.]+) MHz \((?:PASS|FAIL) at ([\d.]+) MHz\)", line)
+            if m:
+                fmax[m.group(1)] = (float(m.group(2)), float(m.group(3)))
+            m = re.search(r"^Info:\s+(\w+):\s+(\d+)/\s*(\d+)", line)
+            if m:
+                usage[m.group(1)] = int(m.group(2))
+    luts = usage.get("TRELLIS_COMB", 2*usage.get("TRELLIS_SLICE", 0))
+    return {"fmax": fmax, "luts": luts, "ebr": usage.get("DP16KD", 0)}
+
+def parse_diamond_reports(gateware_dir):
+    summary = {"fmax": {}, "luts": 0, "ebr": 0}
+    mrp = os.path.join(gateware_dir, "impl", "top_impl.mrp")
+    twr = os.path.join(gateware_dir, "impl", "top_impl.twr")
+    if os.path.exists(mrp):
+        with open(mrp, errors="replace") as f:
+            for line in f:
+                m = re.search(r"Number of LUT4s:\s+(\d+)", line)
+                if m:
+                    summary["luts"] = int(m.group(1))
+                m = re.search(r"Number of block RAMs:\s+(\d+)", line)
+                if m:
+                    summary["ebr"] = int(m.group(1))
+    if os.path.exists(twr):
+        with open(twr, errors="replace") as f:
+            # each "maximum frequency" line closes the FREQUENCY/PERIOD preference above it
+            preference = None
+            for n, line in enumerate(f):
+                m = re.search(r"Preference: (FREQUENCY|PERIOD) (?:NET|PORT) \"([^\"]+)\" ([\d.]+) (MHz|ns)", line)
+                if m:
+                    value = float(m.group(3))
+                    preference = (m.group(2), value if m.group(4) == "MHz" else 1e3/value)
+                    continue
+                m = re.search(r"([\d.]+)MHz is the maximum frequency for this preference", line)
+                if m:
+                    name, target = preference if preference is not None else ("preference{}".format(n), None)
+                    summary["fmax"][name] = (float(m.group(1)), target)
+                    preference = None
+    return summary
+
+def worst_clock(summary):
+    # (achieved, requested) MHz of the clock with the lowest achieved/requested ratio, or with the
+    # lowest achieved frequency when some requests are unknown
+    clocks = [tuple(clock) for clock in summary["fmax"].values()]
+    if not clocks:
+        return (0.0, None)
+    if all(target for fmax, target in clocks):
+        return min(clocks, key=lambda clock: clock[0]/clock[1])
+    return min(clocks, key=lambda clock: clock[0])
+
+def fmax_margin(summary):
+    fmax, target = worst_clock(summary)
+    return fmax/target if target else fmax
+
+# nextpnr-ecp5 device options from the platform device (LFE5UM5G-45F-8BG381C: --um5g-45k, CABGA381, 8)
+nextpnr_ecp5_packages = {"256": "CABGA256", "285": "CSFBGA285", "381": "CABGA381", "554": "CABGA554",
+    "756": "CABGA756"}
+
+def nextpnr_ecp5_device(device):
+    family, size, speed_package = device.lower().split("-")
+    variant = family[len("lfe5"):]
+    architecture = size.replace("f", "k") if variant == "u" else "{}-{}".format(variant, size.replace("f", "k"))
+    speed, package = speed_package[0], nextpnr_ecp5_packages[re.search(r"\d+", speed_package[1:]).group()]
+    return ["--" + architecture, "--package", package, "--speed", speed]
+
+def trellis_commands(device, compress=False):
+    # yosys, nextpnr-ecp5 (without its per seed outputs) and ecppack on the files generated by the
+    # Builder in gateware/. Timing is checked from the nextpnr log, failing it still gives a bitstream.
+    return {
+        "yosys":   ["yosys", "-q", "-l", "top.rpt", "top.ys"],
+        "nextpnr": ["nextpnr-ecp5", "--json", "top.json", "--lpf", "top.lpf", "--timing-allow-fail"] +
+                   nextpnr_ecp5_device(device),
+        "ecppack": ["ecppack"] + (["--compress"] if compress else []) +
+                   ["--svf", "top.svf", "top.config", "top.bit"],
+    }
+
+def run_trellis(gateware_dir, commands, seeds=1):
+    # nextpnr is started once per seed in parallel; the seed with the best Fmax margin is kept and
+    # packed.
+    if subprocess.call(commands["yosys"], cwd=gateware_dir) != 0:
+        raise OSError("yosys failed")
+    procs = []
+    for seed in range(1, seeds + 1):
+        seed_dir = "seed_{}".format(seed)
+        os.makedirs(os.path.join(gateware_dir, seed_dir), exist_ok=True)
+        cmd = commands["nextpnr"] + ["--textcfg", os.path.join(seed_dir, "top.config"),
+            "--seed", str(seed), "--log", os.path.join(seed_dir, "nextpnr.log")]
+        procs.append((seed, subprocess.Popen(cmd, cwd=gateware_dir,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)))
+    results = []
+    for seed, proc in procs:
+        seed_dir = os.path.join(gateware_dir, "seed_{}".format(seed))
+        if proc.wait() == 0:
+            results.append(dict(parse_nextpnr_log(os.path.join(seed_dir, "nextpnr.log")), seed=seed))
+    if not results:
+        raise OSError("nextpnr failed for all seeds")
+    summary = max(results, key=fmax_margin)
+    best_dir = os.path.join(gateware_dir, "seed_{}".format(summary["seed"]))
+    shutil.copy(os.path.join(best_dir, "top.config"), os.path.join(gateware_dir, "top.config"))
+    shutil.copy(os.path.join(best_dir, "nextpnr.log"), os.path.join(gateware_dir, "nextpnr.log"))
+    if subprocess.call(commands["ecppack"], cwd=gateware_dir) != 0:
+        raise OSError("ecppack failed")
+    return summary
+
+def soc_ident(soc):
+    return "".join(chr(c) for c in soc.identifier.mem.init).split("\0")[0]
+
+def build(soc, target, toolchain, toolchain_path, output_dir="build", test_dir="test", use_cache=True, seeds=1,
+          compress=False):
+    builder = Builder(soc, output_dir=output_dir, csr_csv=os.path.join(test_dir, "csr.csv"))
+    # generate verilog/constraints/build script only
+    vns = builder.build(toolchain_path=toolchain_path, run=False)
+    # precompiled CSR accessors for the test scripts (test/csr_fast.py)
+    write_module(os.path.join(test_dir, "csr.csv"))
     if isinstance(soc, DDR3TestSoC):
-        soc.do_exit(vns)
-        soc.generate_sdram_phy_py_header()
+        soc.do_exit(vns, test_dir)
+        soc.generate_sdram_phy_py_header(test_dir)
+
+    gateware_dir = os.path.join(output_dir, "gateware")
+    commands = None
+    if toolchain == "trellis":
+        # ECP5 bitstream compression (ecppack --compress): shorter JTAG loads and fewer flash sectors
+        commands = trellis_commands(soc.platform.device, compress)
+    elif compress:
+        raise ValueError("bitstream compression is only supported with trellis")
+    # read back by load_fpga.py to skip loading a bitstream the board already runs (SoCs without
+    # ident have no identifier: no top.ident, always loaded)
+    ident_file = os.path.join(gateware_dir, "top.ident")
+    if hasattr(soc, "identifier"):
+        with open(ident_file, "w") as f:
+            f.write(soc_ident(soc) + "\n")
+    elif os.path.exists(ident_file):
+        os.remove(ident_file)
+    dirs = {"gateware": gateware_dir, "test": test_dir}
+    summary_file = os.path.join(gateware_dir, "top_summary.json")
+    cache = BuildCache(os.path.join(output_dir, "cache", target))
+    ident_init = [int(c) for c in soc.identifier.mem.init] if hasattr(soc, "identifier") else None
+    key = build_hash(gateware_dir, toolchain, toolchain_path, seeds, ident_init, commands)
+    if use_cache and cache.restore(key, dirs):
+        print("Build cache hit ({}), reusing {}".format(key[:16], os.path.join(gateware_dir, "top.bit")))
+        with open(summary_file) as f:
+            return dict(json.load(f), cached=True)
+
+    if toolchain == "trellis":
+        summary = run_trellis(gateware_dir, commands, seeds)
+    else:
+        if subprocess.call(["bash", "build_top.sh"], cwd=gateware_dir) != 0:
+            raise OSError("Subprocess failed")
+        summary = parse_diamond_reports(gateware_dir)
+    with open(summary_file, "w") as f:
+        json.dump(summary, f)
+    if use_cache:
+        os.makedirs(cache.cache_dir, exist_ok=True)
+        cache.store(key, dirs)
+    return dict(summary, cached=False)
+
+# Targets ------------------------------------------------------------------------------------------
+
+targets = {
+    "ddr3_test":      DDR3TestSoC,
+    "etherbone_test": EtherboneTestSoC,
+    "bist_test":      BISTTestSoC,
+    "rgmii_test":     RGMIITestSoC,
+    "base":           BaseSoC,
+    "ethernet":       EthernetSoC,
+    "bist":           BISTSoC,
+}
+
+def build_target(target, args, output_dir, test_dir, sys_clk_freq=None):
+    start = time.time()
+    os.makedirs(test_dir, exist_ok=True)
+    kwargs = {}
+    if sys_clk_freq is not None:
+        kwargs["sys_clk_freq"] = int(sys_clk_freq)
+    if issubclass(targets[target], DDR3TestSoC):
+        kwargs["analyzer_depth"] = args.analyzer_depth
+        kwargs["analyzer_signals"] = args.analyzer_signals
+    if issubclass(targets[target], (BISTTestSoC, BISTSoC)):
+        kwargs["traffic_pairs"] = args.traffic_pairs
+    if args.l2_size is not None and issubclass(targets[target], (DDR3TestSoC, BaseSoC)):
+        kwargs["l2_size"] = args.l2_size
+    soc = targets[target](toolchain=args.toolchain, **kwargs)
+    summary = build(soc, target, args.toolchain, args.toolchain_path, output_dir, test_dir,
+        use_cache=not args.no_cache, seeds=args.seeds, compress=args.compress)
+    summary["target"] = target
+    summary["sys_clk_freq"] = soc.clk_freq
+    summary["time"] = time.time() - start
+    return summary
+
+def print_summary(summaries):
+    print("{:<16s} {:>8s} {:>10s} {:>10s} {:>8s} {:>5s} {:>5s} {:>6s}".format(
+        "target", "time(s)", "fmax(MHz)", "req(MHz)", "LUT4", "EBR", "seed", "cache"))
+    for s in summaries:
+        fmax, req = worst_clock(s)
+        print("{:<16s} {:8.1f} {:10.2f} {:>10s} {:8d} {:5d} {:>5s} {:>6s}".format(
+            s["target"], s["time"], fmax, "-" if req is None else "{:.2f}".format(req),
+            s["luts"], s["ebr"], str(s.get("seed", "-")), "hit" if s["cached"] else "miss"))
+
+# Frequency sweep ----------------------------------------------------------------------------------
+
+def timing_slack(summary):
+    # slack (ns) of the worst clock, Diamond reports only give the achieved frequency
+    fmax, req = worst_clock(summary)
+    if req is None:
+        req = summary["sys_clk_freq"]/1e6
+    if fmax == 0:
+        return None
+    return 1e3/req - 1e3/fmax
+
+def dram_peak_bandwidth(sys_clk_freq):
+    # MT41K64M16 (x16) with the 1:2 ECP5DDRPHY: 4 beats of 16 bits per sys_clk cycle
+    return 4*16*sys_clk_freq/1e6
+
+def measure_bandwidth(output_dir, test_dir, args):
+    # load the build on the board and run the host-driven BIST on it (bist_test target), from a
+    # temporary copy of the test scripts with the files generated for this build
+    generated = [filename for directory, filename in build_cache_outputs if directory == "test"]
+    subprocess.check_call([sys.executable, "load_fpga.py", os.path.join(output_dir, "gateware", "top.svf")])
+    extra_args = args.measure_args.split()
+    with tempfile.TemporaryDirectory() as tmp:
+        run_dir = os.path.join(tmp, "test")
+        shutil.copytree("test", run_dir, ignore=shutil.ignore_patterns("__pycache__", *generated))
+        for filename in generated:
+            if os.path.exists(os.path.join(test_dir, filename)):
+                shutil.copy(os.path.join(test_dir, filename), run_dir)
+        subprocess.check_call([sys.executable, "test_sdram.py", "--no-cache"] + extra_args, cwd=run_dir)
+        r = subprocess.run([sys.executable, "bist.py", "--format", "json", "--burst-lengths", "128",
+            "--addressing", "linear"] + extra_args, cwd=run_dir, stdout=subprocess.PIPE, check=True)
+    return json.loads(r.stdout.decode())[0]
+
+def sweep(target, args):
+    start, stop, step = [float(f) for f in args.sweep.split(":")]
+    freqs = []
+    while start <= stop:
+        freqs.append(int(start))
+        start += step
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = []
+        for freq in freqs:
+            output_dir = os.path.join(args.output_dir, "{}_{:g}MHz".format(target, freq/1e6))
+            futures.append((output_dir, executor.submit(build_target, target, args,
+                output_dir, os.path.join(output_dir, "test"), freq)))
+        results = []
+        for output_dir, future in futures:
+            # a frequency the PLL cannot synthesise or a toolchain failure only fails its point
+            try:
+                results.append((output_dir, future.result()))
+            except Exception as e:
+                print("{}: build failed: {}".format(output_dir, e))
+                results.append((output_dir, None))
+
+    print("{:>10s} {:>10s} {:>10s} {:>8s} {:>14s}".format("freq(MHz)", "fmax(MHz)", "slack(ns)", "timing", "peak DRAM(Mbps)"))
+    best = None
+    for (output_dir, summary), freq in zip(results, freqs):
+        if summary is None:
+            print("{:10.2f} {:>10s} {:>10s} {:>8s} {:14.0f}".format(freq/1e6, "-", "-", "error",
+                dram_peak_bandwidth(freq)))
+            continue
+        slack = timing_slack(summary)
+        met = slack is not None and slack >= 0
+        print("{:10.2f} {:10.2f} {:>10s} {:>8s} {:14.0f}".format(summary["sys_clk_freq"]/1e6,
+            worst_clock(summary)[0], "-" if slack is None else "{:.3f}".format(slack),
+            "met" if met else "failed", dram_peak_bandwidth(summary["sys_clk_freq"])))
+        if met and (best is None or summary["sys_clk_freq"] > best[1]["sys_clk_freq"]):
+            best = (output_dir, summary)
+
+    if best is None:
+        print("no frequency closes timing")
+        return
+    output_dir, summary = best
+    print("highest frequency closing timing: {:.2f} MHz ({})".format(summary["sys_clk_freq"]/1e6, output_dir))
+    if args.measure:
+        if target != "bist_test":
+            print("bandwidth measurement needs the bist_test target")
+            return
+        r = measure_bandwidth(output_dir, os.path.join(output_dir, "test"), args)
+        print("measured DRAM bandwidth: WR {:.1f} Mbps, RD {:.1f} Mbps, {} errors".format(
+            r["wr_mbps"], r["rd_mbps"], r["errors"]))
+
+# Build --------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Versa ECP5 test SoCs")
+    parser.add_argument("targets", nargs="+",
+        help="targets to build: {} (sim <target> to simulate)".format(", ".join(targets.keys())))
+    parser.add_argument("--toolchain", default="diamond", choices=["diamond", "trellis"])
+    parser.add_argument("--toolchain-path", default=None, help="toolchain installation directory")
+    parser.add_argument("--output-dir", default="build", help="output directory (one sub-directory per target when building several)")
+    parser.add_argument("--jobs", default=None, type=int, help="targets built in parallel (default: all)")
+    parser.add_argument("--seeds", default=1, type=int, help="nextpnr seeds run in parallel per target (trellis)")
+    parser.add_argument("--compress", action="store_true", help="compressed bitstreams (trellis)")
+    parser.add_argument("--no-cache", action="store_true", help="always run the toolchain")
+    parser.add_argument("--sys-clk-freq", default=None, type=float, help="system clock frequency (Hz)")
+    parser.add_argument("--sweep", default=None, help="build at start:stop:step Hz and report timing closure")
+    parser.add_argument("--measure", action="store_true", help="measure DRAM bandwidth on the board at the best sweep frequency")
+    parser.add_argument("--measure-args", default="", help="extra bridge arguments for the test scripts")
+    parser.add_argument("--analyzer-depth", default=128, type=int, help="LiteScope samples per capture (0: no analyzer)")
+    parser.add_argument("--analyzer-signals", default="dfi_p0,datavalid,burstdet",
+        help="comma separated LiteScope signal sets: datavalid, burstdet, dfi_pN, dfi_cmd_pN, dfi_wr_pN, dfi_rd_pN")
+    parser.add_argument("--l2-size", default=None, type=int, help="L2 cache size in bytes (SDRAM targets, default: per target)")
+    parser.add_argument("--traffic-pairs", default=4, type=int, help="SDRAM traffic generator/checker pairs (bist, bist_test)")
+    args = parser.parse_args()
+
+    if args.targets[0] == "sim":
+        sim_main(args.targets[1:])
+        return
+
+    # "./versa_ecp5.py <target> trellis" is still accepted
+    if "trellis" in args.targets:
+        args.targets.remove("trellis")
+        args.toolchain = "trellis"
+    if args.toolchain_path is None:
+        args.toolchain_path = {
+            "diamond": "/usr/local/diamond/3.10_x64/bin/lin64",
+            "trellis": "/usr/share/trellis",
+        }[args.toolchain]
+    for target in args.targets:
+        if target not in targets:
+            print("unknown target {}, supported: ({})".format(target, ", ".join(targets.keys())))
+            exit(1)
+
+    if args.sweep is not None:
+        for target in args.targets:
+            sweep(target, args)
+        return
+
+    if len(args.targets) == 1:
+        summaries = [build_target(args.targets[0], args, args.output_dir, "test", args.sys_clk_freq)]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            futures = []
+            for target in args.targets:
+                output_dir = os.path.join(args.output_dir, target)
+                futures.append(executor.submit(build_target, target, args,
+                    output_dir, os.path.join(output_dir, "test"), args.sys_clk_freq))
+            summaries = [future.result() for future in futures]
+    print_summary(summaries)
 
 if __name__ == "__main__":
     main()